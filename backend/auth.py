@@ -1,13 +1,19 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 from dotenv import load_dotenv
 import models, database
+from executor import PoolMetrics
 
 load_dotenv()
 
@@ -15,7 +21,23 @@ SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "300"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+# Operators allowed to use /api/admin endpoints (comma separated emails)
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+# PBKDF2 cost. Raising it makes existing hashes "need update"; they are rehashed on next login.
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+# Hashing gets its own small pool so a login burst can't occupy every IO worker
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=PASSWORD_HASH_ROUNDS
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 def verify_password(plain_password, hashed_password):
@@ -24,6 +46,55 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password, hashed_password):
+    """Returns (valid, new_hash). new_hash is set when the stored hash is below the current cost."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+class PasswordHasher:
+    """
+    Runs pbkdf2 on a dedicated thread pool (hashlib releases the GIL, so threads scale
+    across cores) behind a semaphore, so excess requests wait on the event loop instead
+    of piling up inside the executor.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS):
+        self.workers = max(workers, 1)
+        self.metrics = PoolMetrics(self.workers)
+        self._pool = None
+        self._semaphore = None
+
+    async def _run(self, fn, *args):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hash")
+            self._semaphore = asyncio.Semaphore(self.workers)
+        self.metrics.start()
+        start = time.perf_counter()
+        ok = False
+        try:
+            async with self._semaphore:
+                result = await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+            ok = True
+            return result
+        finally:
+            self.metrics.finish(fn.__name__, time.perf_counter() - start, ok)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str):
+        return await self._run(verify_and_update_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {"rounds": PASSWORD_HASH_ROUNDS, **self.metrics.snapshot()}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._semaphore = None
+
+password_hasher = PasswordHasher()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -34,7 +105,86 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+class Principal(NamedTuple):
+    """What most handlers need to know about the caller, without loading ORM rows."""
+    user_id: int
+    company_id: Optional[int]
+    is_active: bool
+    email: str
+
+class PrincipalCache:
+    """TTL map of token subject -> Principal, with explicit invalidation."""
+
+    def __init__(self, ttl: int = PRINCIPAL_CACHE_TTL, max_entries: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[Principal]:
+        entry = self._data.get(subject)
+        if entry is None:
+            return None
+        principal, expires_at = entry
+        if expires_at < time.monotonic():
+            self.invalidate(subject)
+            return None
+        return principal
+
+    def set(self, subject: str, principal: Principal):
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                # Drop expired entries first, then the oldest insertions
+                now = time.monotonic()
+                for key in [k for k, (_, exp) in self._data.items() if exp < now] or list(self._data)[:self.max_entries // 10 or 1]:
+                    self._data.pop(key, None)
+            self._data[subject] = (principal, time.monotonic() + self.ttl)
+
+    def invalidate(self, subject: str):
+        with self._lock:
+            self._data.pop(subject, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "ttl_seconds": self.ttl, "max_entries": self.max_entries}
+
+principal_cache = PrincipalCache()
+
+def create_principal_token(user_id: int, email: str, company_id: Optional[int]) -> str:
+    """Access token whose claims already carry the user and company ids."""
+    return create_access_token(data={"sub": email, "uid": user_id, "cid": company_id})
+
+def invalidate_principal(email: str):
+    """Call when a user's active flag or company changes."""
+    principal_cache.invalidate(email)
+
+async def get_current_company(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)) -> Principal:
+    return await resolve_principal(token, db)
+
+async def get_current_company_from_query(token: str = Query(...)) -> Principal:
+    """
+    For EventSource/SSE clients, which cannot send an Authorization header. Uses its own
+    short-lived session (not get_async_db, whose session would stay checked out until the
+    long-lived streaming response finishes).
+    """
+    async with database.get_async_sessionmaker()() as db:
+        return await resolve_principal(token, db)
+
+async def get_admin_principal(principal: Principal = Depends(get_current_company)) -> Principal:
+    """Callers whose email is in ADMIN_EMAILS; everyone else gets 403."""
+    if (principal.email or "").lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return principal
+
+async def resolve_principal(token: str, db: AsyncSession) -> Principal:
+    """
+    Resolves the caller's user and company ids. Served from the principal cache in the
+    common case. On a miss, tokens carrying uid/cid claims only need a primary-key probe
+    for is_active; older tokens fall back to one users/companies join by email.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,8 +197,29 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
+
+    principal = principal_cache.get(email)
+    if principal is None and payload.get("uid") is not None and "cid" in payload:
+        result = await db.execute(select(models.User.is_active).where(models.User.id == payload["uid"]))
+        row = result.first()
+        if row is None:
+            raise credentials_exception
+        principal = Principal(user_id=payload["uid"], company_id=payload["cid"], is_active=row[0] is not False, email=email)
+        principal_cache.set(email, principal)
+    elif principal is None:
+        result = await db.execute(
+            select(models.User.id, models.User.is_active, models.Company.id)
+            .outerjoin(models.Company, models.Company.user_id == models.User.id)
+            .where(models.User.email == email)
+            .order_by(models.Company.id)
+            .limit(1)
+        )
+        row = result.first()
+        if row is None:
+            raise credentials_exception
+        principal = Principal(user_id=row[0], company_id=row[2], is_active=row[1] is not False, email=email)
+        principal_cache.set(email, principal)
+
+    if not principal.is_active:
         raise credentials_exception
-    return user
+    return principal
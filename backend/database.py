@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -8,9 +8,61 @@ load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Connection pool tuning (the SQLAlchemy default of 5 + 10 overflow queues under dashboard load)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+def _pool_options(url: str) -> dict:
+    options = {"pool_pre_ping": POOL_PRE_PING, "pool_recycle": POOL_RECYCLE}
+    if url.startswith("sqlite") and ":memory:" in url:
+        return options # StaticPool/SingletonThreadPool take no sizing
+    options.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT)
+    return options
+
+def async_database_url(url: str) -> str:
+    """Maps the sync DATABASE_URL onto its async driver: asyncpg for Postgres, aiosqlite for SQLite."""
+    scheme, sep, rest = url.partition("://")
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg2"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if scheme in ("sqlite", "sqlite+pysqlite"):
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_pool_options(SQLALCHEMY_DATABASE_URL))
+
+if SQLALCHEMY_DATABASE_URL.startswith("sqlite") and ":memory:" not in SQLALCHEMY_DATABASE_URL:
+    # WAL lets readers (job status polls, dashboards) proceed while a background ingest holds the write lock
+    @event.listens_for(engine, "connect")
+    def _sqlite_wal(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine/session are created on first use so the sync-only tools don't need the async drivers
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        url = async_database_url(SQLALCHEMY_DATABASE_URL)
+        _async_engine = create_async_engine(url, **_pool_options(url))
+    return _async_engine
+
+def get_async_sessionmaker():
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        _AsyncSessionLocal = async_sessionmaker(
+            bind=get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _AsyncSessionLocal
+
 Base = declarative_base()
 
 # Dependency to get DB session
@@ -20,3 +72,15 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Async dependency: AsyncSession on asyncpg/aiosqlite. Sync helpers can still be
+# reused through `await db.run_sync(fn, *args)`, which passes them a Session.
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+def pool_status() -> dict:
+    status = {"sync": engine.pool.status()}
+    if _async_engine is not None:
+        status["async"] = _async_engine.pool.status()
+    return status
@@ -1,42 +1,207 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable
 import numpy as np
 from sklearn.ensemble import IsolationForest
 import pandas as pd
+import joblib
 
 class AnomalyDetector:
+    """
+    IsolationForest over transaction amounts. Takes column arrays {"id", "amount"[,
+    "description", "date"]} (TransactionColumns.anomaly_inputs) or a list of tx dicts
+    with 'amount' or 'debit'/'credit', converted to the same columns. Without a
+    description column, anomalies carry description None for the caller to fill in.
+    """
+
+    @staticmethod
+    def _amount(tx: dict):
+        return tx.get('amount') or tx.get('debit') or tx.get('credit') or 0
+
+    @staticmethod
+    def columns(transactions) -> dict:
+        if isinstance(transactions, dict):
+            return transactions
+        return {
+            "id": np.array([tx.get('id') for tx in transactions], dtype=object),
+            "amount": np.array([float(AnomalyDetector._amount(tx)) for tx in transactions], dtype=np.float64),
+            "description": np.array([tx.get('description') for tx in transactions], dtype=object),
+            "date": np.array([tx.get('date') for tx in transactions], dtype=object)
+        }
+
     @staticmethod
-    def detect_transaction_anomalies(transactions: list):
+    def _features(columns: dict) -> np.ndarray:
+        # Prepare features: Amount (weekday etc. can be added as extra columns)
+        return np.asarray(columns["amount"], dtype=np.float64).reshape(-1, 1)
+
+    @staticmethod
+    def _to_anomalies(columns: dict, flagged: np.ndarray) -> list:
+        """Anomaly dicts for the flagged rows only (plain Python values, JSON-ready)."""
+        anomalies = []
+        ids, descriptions, dates = columns["id"], columns.get("description"), columns.get("date")
+        for i in np.flatnonzero(flagged):
+            amt = float(columns["amount"][i])
+            anomalies.append({
+                "id": ids[i].item() if isinstance(ids[i], np.generic) else ids[i],
+                "date": dates[i] if dates is not None else None,
+                "description": descriptions[i] if descriptions is not None else None,
+                "amount": amt,
+                "reason": "Unusual amount detected for this business pattern.",
+                "severity": "high" if amt > 50000 else "medium"
+            })
+        return anomalies
+
+    @staticmethod
+    def fit(transactions) -> IsolationForest:
+        # Contamination = expected proportion of outliers (e.g. 5%)
+        model = IsolationForest(contamination=0.05, random_state=42)
+        model.fit(AnomalyDetector._features(AnomalyDetector.columns(transactions)))
+        return model
+
+    @staticmethod
+    def score(model: IsolationForest, transactions) -> list:
+        columns = AnomalyDetector.columns(transactions)
+        if not len(columns["amount"]):
+            return []
+        preds = model.predict(AnomalyDetector._features(columns))
+        return AnomalyDetector._to_anomalies(columns, preds == -1)
+
+    @staticmethod
+    def detect_transaction_anomalies(transactions):
         """
         Uses Isolation Forest to detect unusual spending patterns.
-        Input: List of dicts with 'amount' or 'debit'/'credit'
+        Input: column arrays, or a list of dicts with 'amount' or 'debit'/'credit'
         """
-        if len(transactions) < 5:
+        columns = AnomalyDetector.columns(transactions)
+        if len(columns["amount"]) < 5:
             return []
 
-        # Prepare features: Amount and weekday
-        data = []
-        for tx in transactions:
-            amt = tx.get('amount') or tx.get('debit') or tx.get('credit') or 0
-            # For demo, assume we have a date or just use amount
-            data.append([float(amt)])
-
-        X = np.array(data)
-        
-        # Contamination = expected proportion of outliers (e.g. 5%)
+        X = AnomalyDetector._features(columns)
         model = IsolationForest(contamination=0.05, random_state=42)
         preds = model.fit_predict(X)
-        
-        anomalies = []
-        for i, pred in enumerate(preds):
-            if pred == -1: # Anomaly
-                tx = transactions[i]
-                amt = tx.get('amount') or tx.get('debit') or tx.get('credit') or 0
-                anomalies.append({
-                    "id": tx.get('id'),
-                    "date": tx.get('date'),
-                    "description": tx.get('description'),
-                    "amount": amt,
-                    "reason": "Unusual amount detected for this business pattern.",
-                    "severity": "high" if amt > 50000 else "medium"
-                })
-        
+        return AnomalyDetector._to_anomalies(columns, preds == -1)
+
+class AnomalyModelStore:
+    """
+    Keeps one fitted IsolationForest per company, persisted with joblib.
+    A model is fitted once; when the company's data version moves, only transactions
+    newer than the last scored id are scored. It refits when rows were deleted, when the
+    new rows drift away from the fitted distribution, or when they outgrow it.
+    """
+    MODEL_DIR = os.getenv("ANOMALY_MODEL_DIR", "model_store")
+    DRIFT_THRESHOLD = float(os.getenv("ANOMALY_DRIFT_THRESHOLD", "0.5")) # standardized mean shift
+    REFIT_GROWTH = float(os.getenv("ANOMALY_REFIT_GROWTH", "0.25")) # new rows / fitted rows
+    MIN_DRIFT_SAMPLES = 20
+    MEMORY_SLOTS = 256
+
+    def __init__(self, model_dir: str = None):
+        self.model_dir = model_dir or self.MODEL_DIR
+        os.makedirs(self.model_dir, exist_ok=True)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.fits = 0
+        self.incremental_scores = 0
+
+    def detect(self, company_id: int, data_version: int, tx_count: int, load_transactions: Callable[[int], dict],
+               describe: Callable[[list], dict] = None) -> list:
+        """
+        Returns the company's anomalies.
+        load_transactions(after_id) must return AnomalyDetector columns (or tx dicts) for
+        the rows with id > after_id, ordered by id.
+        describe(ids), if given, returns {id: description} for flagged rows loaded without one.
+        tx_count is the company's current number of bank transactions.
+        """
+        state = self._load(company_id)
+        if state is not None and state["data_version"] == data_version:
+            return state["anomalies"]
+
+        if state is None or state["model"] is None or tx_count < state["n_seen"]:
+            state = self._refit(company_id, load_transactions(0), describe)
+        else:
+            new_txns = AnomalyDetector.columns(load_transactions(state["last_id"]))
+            if self._needs_refit(state, new_txns):
+                state = self._refit(company_id, load_transactions(0), describe)
+            else:
+                state["anomalies"] = state["anomalies"] + self._describe(AnomalyDetector.score(state["model"], new_txns), describe)
+                state["n_seen"] += len(new_txns["id"])
+                if len(new_txns["id"]):
+                    state["last_id"] = int(max(new_txns["id"]))
+                self.incremental_scores += 1
+
+        state["data_version"] = data_version
+        self._save(company_id, state)
+        return state["anomalies"]
+
+    def stats(self) -> dict:
+        return {"fits": self.fits, "incremental_scores": self.incremental_scores, "models_in_memory": len(self._memory)}
+
+    # --- Internals ---
+
+    @staticmethod
+    def _describe(anomalies: list, describe) -> list:
+        missing = [a["id"] for a in anomalies if a["description"] is None]
+        if describe is not None and missing:
+            found = describe(missing)
+            for a in anomalies:
+                if a["description"] is None:
+                    a["description"] = found.get(a["id"])
         return anomalies
+
+    def _refit(self, company_id: int, transactions, describe=None) -> dict:
+        transactions = AnomalyDetector.columns(transactions)
+        count = len(transactions["id"])
+        state = {"model": None, "anomalies": [], "n_seen": count, "n_fit": count,
+                 "last_id": int(max(transactions["id"])) if count else 0, "mean": 0.0, "std": 0.0}
+        if count >= 5:
+            model = AnomalyDetector.fit(transactions)
+            values = np.log1p(np.abs(AnomalyDetector._features(transactions)[:, 0]))
+            state.update(model=model, anomalies=self._describe(AnomalyDetector.score(model, transactions), describe),
+                         mean=float(values.mean()), std=float(values.std()))
+            self.fits += 1
+        return state
+
+    def _needs_refit(self, state: dict, new_txns: dict) -> bool:
+        count = len(new_txns["id"])
+        if not count:
+            return False
+        if count > self.REFIT_GROWTH * max(state["n_fit"], 1):
+            return True
+        if count >= self.MIN_DRIFT_SAMPLES:
+            values = np.log1p(np.abs(AnomalyDetector._features(new_txns)[:, 0]))
+            drift = abs(values.mean() - state["mean"]) / max(state["std"], 1e-9)
+            return drift > self.DRIFT_THRESHOLD
+        return False
+
+    def _path(self, company_id: int) -> str:
+        return os.path.join(self.model_dir, f"company_{company_id}.joblib")
+
+    def _load(self, company_id: int):
+        with self._lock:
+            if company_id in self._memory:
+                self._memory.move_to_end(company_id)
+                return self._memory[company_id]
+        path = self._path(company_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            state = joblib.load(path)
+        except Exception as e:
+            print(f"Anomaly model load error: {e}")
+            return None
+        self._remember(company_id, state)
+        return state
+
+    def _save(self, company_id: int, state: dict):
+        path = self._path(company_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(state, tmp_path)
+        os.replace(tmp_path, path) # Atomic swap so concurrent readers never see a partial file
+        self._remember(company_id, state)
+
+    def _remember(self, company_id: int, state: dict):
+        with self._lock:
+            self._memory[company_id] = state
+            self._memory.move_to_end(company_id)
+            while len(self._memory) > self.MEMORY_SLOTS:
+                self._memory.popitem(last=False)
@@ -1,50 +1,312 @@
+import warnings
 import numpy as np
-# from statsmodels.tsa.api import SimpleExpSmoothing (Uncomment when ready)
+
+SEASON_LENGTHS = {"month": 12, "week": 52}
+INTERVAL_Z = 1.2816 # 80% band
 
 class Forecaster:
+    """
+    Cash flow forecasting over a bucketed (monthly/weekly) history.
+
+    The target is each bucket's net flow (inflow - outflow); forecasts are rolled onto the
+    last closing balance to project the balance itself. Every model returns a "paths"
+    array, paths[t, h] = forecast of y[t + h + 1] made from y[:t + 1], so one pass yields
+    forecasts from every origin at once. Rolling-origin backtest errors over the latest
+    origins choose the model, and the same errors size the prediction band.
+
+    Inputs are plain NumPy arrays (int64 paise work as-is: the models are scale-free).
+    """
+    HW_ALPHAS = (0.1, 0.3, 0.5, 0.8)
+    HW_BETAS = (0.0, 0.05, 0.2)
+    HW_GAMMAS = (0.0, 0.1, 0.3)
+
+    @staticmethod
+    def linear(y: np.ndarray, horizon: int, window: int) -> np.ndarray:
+        """Least-squares trend over the last `window` points before each origin (rolling sums)."""
+        n = len(y)
+        x = np.arange(n, dtype=np.float64)
+        def rolling(values):
+            c = np.concatenate([[0.0], np.cumsum(values)])
+            start = np.maximum(np.arange(1, n + 1) - window, 0)
+            return c[1:] - c[start]
+        k = np.minimum(np.arange(1, n + 1), window).astype(np.float64)
+        sx, sxx, sy, sxy = rolling(x), rolling(x * x), rolling(y), rolling(x * y)
+        denom = k * sxx - sx * sx
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(denom > 0, (k * sxy - sx * sy) / denom, 0.0)
+        intercept = (sy - slope * sx) / k
+        ahead = x[:, None] + np.arange(1, horizon + 1)[None, :]
+        paths = intercept[:, None] + slope[:, None] * ahead
+        paths[:2] = np.nan # need 3 points for a trend
+        return paths
+
+    @staticmethod
+    def seasonal_naive(y: np.ndarray, horizon: int, season: int) -> np.ndarray:
+        """Each future bucket repeats the same bucket one season earlier."""
+        n = len(y)
+        h = np.arange(1, horizon + 1)
+        source = np.arange(n)[:, None] + h[None, :] - season * np.ceil(h / season).astype(int)[None, :]
+        paths = y[np.clip(source, 0, n - 1)].astype(np.float64)
+        paths[:season - 1] = np.nan # first full season ends at origin season - 1
+        return paths
+
+    @classmethod
+    def holt_winters(cls, y: np.ndarray, horizon: int, season: int, seasonal: bool = True, grid=None) -> tuple:
+        """
+        Additive Holt-Winters for the whole (alpha, beta, gamma) grid at once: the recursion
+        walks the series once with one state column per parameter set. seasonal=False drops
+        the seasonal term (Holt's linear trend) for histories too short to fit a season.
+        Returns (paths[t, g, h], grid, state) where grid[g] = (alpha, beta, gamma) and state
+        holds each column's level, trend and last `season` seasonal terms after y[-1].
+        """
+        n = len(y)
+        if grid is None:
+            gammas = cls.HW_GAMMAS if seasonal else (0.0,)
+            grid = np.array([(a, b, g) for a in cls.HW_ALPHAS for b in cls.HW_BETAS for g in gammas])
+        grid = np.asarray(grid, dtype=np.float64)
+        alpha, beta, gamma = grid[:, 0], grid[:, 1], grid[:, 2]
+        m = season if seasonal else 1
+        y = y.astype(np.float64)
+
+        seasons = np.zeros((n, len(grid)))
+        if seasonal:
+            first = y[:m].mean()
+            level = np.full(len(grid), first)
+            trend = np.full(len(grid), (y[m:2 * m].mean() - first) / m)
+            seasons[:m] = (y[:m] - first)[:, None]
+        else:
+            level = np.full(len(grid), y[0])
+            trend = np.zeros(len(grid))
+
+        h = np.arange(1, horizon + 1)
+        offsets = h - m * np.ceil(h / m).astype(int) # index back into the last season, <= 0
+        paths = np.full((n, len(grid), horizon), np.nan)
+        start = m - 1
+        for t in range(start, n):
+            if t > start:
+                s_prev = seasons[t - m] if seasonal else 0.0
+                new_level = alpha * (y[t] - s_prev) + (1 - alpha) * (level + trend)
+                trend = beta * (new_level - level) + (1 - beta) * trend
+                if seasonal:
+                    seasons[t] = gamma * (y[t] - new_level) + (1 - gamma) * s_prev
+                level = new_level
+            season_terms = seasons[t + offsets].T if seasonal else 0.0
+            paths[t] = level[:, None] + trend[:, None] * h[None, :] + season_terms
+        if seasonal:
+            paths[:2 * m - 1] = np.nan # the initial trend reads the first two seasons
+        state = {"level": level, "trend": trend, "seasons": seasons[n - m:] if seasonal else seasons[:0]}
+        return paths, grid, state
+
     @staticmethod
-    def project_cash_flow(historical_cash: list, months_ahead: int = 3):
+    def _actual(y: np.ndarray, origins: np.ndarray, horizon: int) -> np.ndarray:
+        """actual[o, h] = y[origin + h + 1]; NaN past the end of history."""
+        n = len(y)
+        target = origins[:, None] + np.arange(1, horizon + 1)[None, :]
+        return np.where(target < n, y[np.minimum(target, n - 1)], np.nan)
+
+    @classmethod
+    def forecast(cls, net_flow, last_balance: float, freq: str = "month", horizon: int = 6, backtest: int = None) -> dict:
         """
-        Calculates projection with confidence intervals (Best Case / Worst Case).
+        `net_flow`: per-bucket inflow - outflow, oldest first, gaps already zero-filled.
+        Returns the chosen model, per-model backtest MAE, the forecast net flow and balance
+        (mid/upper/lower) for the next `horizon` buckets, and the model's one-step
+        residuals (residuals[t] = y[t + 1] - its forecast from t, NaN where it can't forecast).
         """
-        if not historical_cash:
-            return {"mid": [], "upper": [], "lower": []}
-        
-        if len(historical_cash) < 2:
-            val = historical_cash[-1]
-            return {
-                "mid": [val] * months_ahead,
-                "upper": [round(val * 1.1, 2)] * months_ahead,
-                "lower": [round(val * 0.9, 2)] * months_ahead
-            }
-
-        x = np.array(range(len(historical_cash)))
-        y = np.array(historical_cash)
-        
-        # Linear Regression: y = mx + c
-        A = np.vstack([x, np.ones(len(x))]).T
-        m, c = np.linalg.lstsq(A, y, rcond=None)[0]
-        
-        # Estimate volatility for confidence intervals
-        std_dev = np.std(y) if len(y) > 0 else 0
-        
-        mid = []
-        upper = []
-        lower = []
-        
-        for i in range(1, months_ahead + 1):
-            next_x = len(historical_cash) + i - 1
-            projected_value = (m * next_x) + c
-            
-            # Confidence spreads over time
-            spread = std_dev * (i ** 0.5)
-            
-            mid.append(round(projected_value, 2))
-            upper.append(round(projected_value + spread, 2))
-            lower.append(round(projected_value - spread, 2))
-            
+        y = np.asarray(net_flow, dtype=np.float64)
+        n = len(y)
+        season = SEASON_LENGTHS[freq]
+        if n < 3:
+            # Too little history to fit anything: hold the latest flow
+            flow = np.full(horizon, y[-1] if n else 0.0)
+            balance = last_balance + np.cumsum(flow)
+            return {"model": "naive", "params": {}, "backtest": {}, "origins": 0,
+                    "net_flow": flow, "residuals": np.diff(y), "balance": {"mid": balance, "upper": balance, "lower": balance}}
+
+        # 1. Backtest origins: the latest `backtest` ones, each with a known next bucket
+        backtest = backtest or season
+        start = max(n - 1 - backtest, 2)
+        origins = np.arange(start, n - 1)
+
+        # 2. Every candidate that can forecast from all of those origins, from every origin at once
+        candidates = {"linear": (cls.linear(y, horizon, window=2 * season), {})}
+        if start >= season - 1:
+            candidates["seasonal_naive"] = (cls.seasonal_naive(y, horizon, season), {})
+        seasonal = start >= 2 * season - 1
+        hw_paths, grid, _ = cls.holt_winters(y, horizon, season, seasonal)
+        hw_name = "holt_winters" if seasonal else "holt"
+
+        # 3. Lowest backtest MAE wins: first within the Holt-Winters grid, then across models
+        scores = {}
+        best = len(grid) // 2
+        if len(origins):
+            actual = cls._actual(y, origins, horizon)
+            best = int(np.nanargmin(np.nanmean(np.abs(hw_paths[origins] - actual[:, None, :]), axis=(0, 2))))
+        candidates[hw_name] = (hw_paths[:, best, :], dict(zip(("alpha", "beta", "gamma"), grid[best].tolist())))
+        if len(origins):
+            scores = {name: float(np.nanmean(np.abs(p[origins] - actual))) for name, (p, _) in candidates.items()}
+        model = min(scores, key=scores.get) if scores else "linear"
+        paths, params = candidates[model]
+
+        # 4. Forecast from the last origin; band from the backtest's cumulative (balance) errors
+        flow = paths[-1]
+        mid = last_balance + np.cumsum(flow)
+        if len(origins):
+            cumulative = np.cumsum(paths[origins] - actual, axis=1)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning) # horizons no origin reaches are all-NaN
+                spread = np.sqrt(np.nanmean(cumulative ** 2, axis=0))
+            one_step = spread[0] if np.isfinite(spread[0]) else 0.0
+            fallback = one_step * np.sqrt(np.arange(1, horizon + 1))
+            spread = np.where(np.isfinite(spread), np.maximum(spread, fallback), fallback)
+        else:
+            spread = np.std(y) * np.sqrt(np.arange(1, horizon + 1))
+        return {
+            "model": model,
+            "params": params,
+            "backtest": {name: round(score, 2) for name, score in scores.items()},
+            "origins": int(len(origins)),
+            "net_flow": flow,
+            "residuals": y[1:] - paths[:-1, 0],
+            "balance": {"mid": mid, "upper": mid + INTERVAL_Z * spread, "lower": mid - INTERVAL_Z * spread}
+        }
+
+class IncrementalForecaster:
+    """
+    Constant-time forecasts between full Forecaster.forecast refits, from a JSON-able state:
+
+    - model, params, backtest, spread: the last full fit's choice and its per-horizon band
+    - sums: running regression sums (n, sx, sy, sxy, sxx, syy) over the trend window
+      (the last 2 seasons of buckets, x counted from the window's first bucket)
+    - recent: the window's bucket values, oldest first; recent[-1] is the current bucket
+    - level, trend, seasons: Holt(-Winters) state as of the bucket before the current one
+
+    add() changes the current bucket's value and advance() opens new buckets, each in time
+    bounded by the window; forecast() reads the state only. Results match a full refit
+    that keeps the same model and parameters.
+    """
+
+    @staticmethod
+    def _sums(values) -> dict:
+        y = np.asarray(values, dtype=np.float64)
+        x = np.arange(len(y), dtype=np.float64)
+        return {"n": float(len(y)), "sx": float(x.sum()), "sy": float(y.sum()), "sxy": float((x * y).sum()),
+                "sxx": float((x * x).sum()), "syy": float((y * y).sum())}
+
+    @classmethod
+    def fit(cls, net_flow, freq: str = "month", horizon: int = 12) -> dict:
+        """Full model selection on the bucketed history, then the online state for the winner."""
+        y = np.asarray(net_flow, dtype=np.float64)
+        result = Forecaster.forecast(y, 0.0, freq, horizon)
+        season = SEASON_LENGTHS[freq]
+        window = 2 * season
+        recent = y[-window:] if len(y) else np.zeros(1)
+        state = {
+            "freq": freq,
+            "model": result["model"],
+            "params": result["params"],
+            "backtest": result["backtest"],
+            "origins": result["origins"],
+            "spread": ((result["balance"]["upper"] - result["balance"]["mid"]) / INTERVAL_Z).tolist(),
+            "window": window,
+            "season": season,
+            "sums": cls._sums(recent),
+            "recent": recent.tolist()
+        }
+        if result["model"] in ("holt", "holt_winters"):
+            params = result["params"]
+            _, _, hw = Forecaster.holt_winters(
+                y[:-1], 1, season, result["model"] == "holt_winters",
+                grid=[[params["alpha"], params["beta"], params["gamma"]]]
+            )
+            state.update(level=float(hw["level"][0]), trend=float(hw["trend"][0]), seasons=hw["seasons"][:, 0].tolist())
+        return state
+
+    @staticmethod
+    def _hw_step(state: dict, level: float, trend: float, seasons: list, y: float) -> tuple:
+        """One Holt(-Winters) update with bucket value y; same recursion as Forecaster.holt_winters."""
+        alpha, beta, gamma = (state["params"][k] for k in ("alpha", "beta", "gamma"))
+        s_prev = seasons[0] if seasons else 0.0
+        new_level = alpha * (y - s_prev) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        if seasons:
+            seasons = seasons[1:] + [gamma * (y - new_level) + (1 - gamma) * s_prev]
+        return new_level, trend, seasons
+
+    @staticmethod
+    def add(state: dict, delta: float) -> dict:
+        """Adds `delta` to the current bucket."""
+        sums, recent = state["sums"], state["recent"]
+        x = len(recent) - 1
+        old = recent[-1]
+        recent[-1] = old + delta
+        sums["sy"] += delta
+        sums["sxy"] += x * delta
+        sums["syy"] += recent[-1] ** 2 - old ** 2
+        return state
+
+    @classmethod
+    def advance(cls, state: dict, buckets: int = 1) -> dict:
+        """Closes the current bucket and opens `buckets` new (empty) ones after it."""
+        sums, recent = state["sums"], state["recent"]
+        for _ in range(buckets):
+            if "level" in state:
+                state["level"], state["trend"], state["seasons"] = cls._hw_step(
+                    state, state["level"], state["trend"], state["seasons"], recent[-1]
+                )
+            if len(recent) >= state["window"]:
+                # Drop the oldest point (x = 0) and shift the remaining x down by one
+                dropped = recent.pop(0)
+                sums["n"] -= 1
+                sums["sy"] -= dropped
+                sums["syy"] -= dropped ** 2
+                sums["sxy"] -= sums["sy"]
+                sums["sxx"] += -2 * sums["sx"] + sums["n"]
+                sums["sx"] -= sums["n"]
+            x = sums["n"]
+            recent.append(0.0)
+            sums["n"] += 1
+            sums["sx"] += x
+            sums["sxx"] += x * x
+        return state
+
+    @classmethod
+    def forecast(cls, state: dict, last_balance: float, horizon: int) -> dict:
+        """Same result shape as Forecaster.forecast, computed from the state alone."""
+        recent, sums, model = state["recent"], state["sums"], state["model"]
+        h = np.arange(1, horizon + 1)
+        n = sums["n"]
+        denom = n * sums["sxx"] - sums["sx"] ** 2
+        slope = (n * sums["sxy"] - sums["sx"] * sums["sy"]) / denom if n >= 3 and denom > 0 else 0.0
+        intercept = (sums["sy"] - slope * sums["sx"]) / n if n else 0.0
+
+        if model == "linear" and n >= 3:
+            flow = intercept + slope * (n - 1 + h)
+        elif model == "seasonal_naive":
+            m = state["season"]
+            flow = np.asarray(recent, dtype=np.float64)[len(recent) - 1 + h - m * np.ceil(h / m).astype(int)]
+        elif model in ("holt", "holt_winters"):
+            level, trend, seasons = cls._hw_step(state, state["level"], state["trend"], list(state["seasons"]), recent[-1])
+            m = len(seasons)
+            season_terms = np.asarray(seasons)[h - m * np.ceil(h / m).astype(int) + m - 1] if m else 0.0
+            flow = level + trend * h + season_terms
+        else:
+            flow = np.full(horizon, float(recent[-1]))
+
+        spread = np.asarray(state["spread"][:horizon], dtype=np.float64)
+        if len(spread) < horizon:
+            if len(spread) and spread[0] > 0:
+                one_step = spread[0]
+            else:
+                # No backtest band yet: residual spread of the window's trend line
+                sse = sums["syy"] - intercept * sums["sy"] - slope * sums["sxy"]
+                one_step = np.sqrt(max(sse, 0.0) / max(n - 2, 1))
+            spread = np.concatenate([spread, one_step * np.sqrt(h[len(spread):])])
+        mid = last_balance + np.cumsum(flow)
         return {
-            "mid": mid,
-            "upper": upper,
-            "lower": lower
+            "model": model,
+            "params": state["params"],
+            "backtest": state["backtest"],
+            "origins": state["origins"],
+            "net_flow": np.asarray(flow, dtype=np.float64),
+            "balance": {"mid": mid, "upper": mid + INTERVAL_Z * spread, "lower": mid - INTERVAL_Z * spread}
         }
@@ -1,3 +1,43 @@
+import re
+from itertools import islice
+
+class KeywordMatcher:
+    """
+    Highest-priority keyword group occurring in a text. `groups` are keyword lists in
+    priority order; for each rank there is one compiled alternation (longest keyword
+    first) of the keywords ranked above it. The first search finds the leftmost keyword;
+    every further search resumes just after it with the pattern for the strictly
+    better-ranked groups only. So a text costs at most one search per group, however
+    many keywords it contains, with the same answer as checking `keyword in text` group
+    by group. A match also counts the keywords that are its prefixes (they occur at the
+    same position), through a precomputed keyword -> best rank map.
+    """
+
+    def __init__(self, groups):
+        rank_of = {}
+        for rank, keywords in enumerate(groups):
+            for k in keywords:
+                rank_of.setdefault(k, rank) # a keyword belongs to its best group
+        self.size = len(groups)
+        self.rank = {k: min(r for p, r in rank_of.items() if k.startswith(p)) for k in rank_of}
+        # _patterns[limit]: the keywords ranked below limit (None if there are none)
+        self._patterns = [None]
+        for limit in range(1, self.size + 1):
+            keywords = sorted((k for k, r in rank_of.items() if r < limit), key=len, reverse=True)
+            self._patterns.append(re.compile("|".join(re.escape(k) for k in keywords)) if keywords else None)
+
+    def best(self, text: str, limit: int = None):
+        """Rank of the best group with a keyword in `text`, considering only ranks below `limit`; None if none."""
+        limit = self.size if limit is None else limit
+        best, start = None, 0
+        while limit > 0 and self._patterns[limit] is not None:
+            match = self._patterns[limit].search(text, start)
+            if match is None:
+                break
+            best = limit = self.rank[match.group()]
+            start = match.start() + 1
+        return best
+
 class IndustryAnalyzer:
     # Expanded Benchmark data for 15 industries
     BENCHMARKS = {
@@ -115,76 +155,70 @@ class IndustryAnalyzer:
         }
     }
 
-    @staticmethod
-    def identify_industry(company_name: str, transactions: list) -> str:
-        name = company_name.lower()
-        
-        # Tech/IT/Services
-        if any(k in name for k in ['tech', 'soft', 'solution', 'digital', 'IT', 'cyber', 'cloud']):
-            return "Services/IT"
-        
-        # Manufacturing
-        if any(k in name for k in ['steel', 'cloth', 'factory', 'industries', 'engineering', 'chemicals']):
-            return "Manufacturing"
-        
-        # Retail
-        if any(k in name for k in ['mart', 'store', 'retail', 'shop', 'bazaar', 'kirana']):
-            return "Retail"
-        
-        # Healthcare
-        if any(k in name for k in ['hospital', 'clinic', 'medical', 'diagnostic', 'pharma', 'health']):
-            # Check if pharma specific
-            if any(k in name for k in ['pharma', 'drug', 'medicine']):
-                return "Pharma"
-            return "Healthcare"
-        
-        # Food & Beverage
-        if any(k in name for k in ['food', 'restaurant', 'cafe', 'catering', 'bakery', 'hotel']):
-            # Check if hospitality
-            if any(k in name for k in ['hotel', 'resort', 'guest']):
-                return "Hospitality"
-            return "Food & Beverage"
-        
-        # Construction
-        if any(k in name for k in ['construction', 'builder', 'infra', 'contractor']):
-            return "Construction"
-        
-        # E-commerce
-        if any(k in name for k in ['ecommerce', 'online', 'marketplace', 'e-com']):
-            return "E-commerce"
-        
-        # Education
-        if any(k in name for k in ['school', 'college', 'education', 'academy', 'coaching', 'institute']):
-            return "Education"
-        
-        # Agriculture
-        if any(k in name for k in ['agri', 'farm', 'crop', 'dairy', 'poultry']):
-            return "Agriculture"
-        
-        # Real Estate
-        if any(k in name for k in ['real estate', 'property', 'realty', 'developer']):
-            return "Real Estate"
-        
-        # Logistics
-        if any(k in name for k in ['logistics', 'transport', 'courier', 'shipping', 'freight']):
-            return "Logistics"
-        
-        # Automotive
-        if any(k in name for k in ['auto', 'motor', 'vehicle', 'garage', 'cars']):
-            return "Automotive"
-        
-        # Textiles
-        if any(k in name for k in ['textile', 'garment', 'fashion', 'apparel', 'fabric']):
-            return "Textiles"
-        
-        # Check transaction descriptions
-        all_desc = " ".join([str(t.get('description', '')).lower() for t in transactions])
-        if 'server' in all_desc or 'saas' in all_desc: return "Services/IT"
-        if 'raw material' in all_desc or 'machinery' in all_desc: return "Manufacturing"
-        if 'medicine' in all_desc or 'drug' in all_desc: return "Pharma"
-        if 'transport' in all_desc or 'delivery' in all_desc: return "Logistics"
-        
-        return "Default"
+    # Company-name keywords, in priority order: the first rule with a keyword in the
+    # (lowercased) name wins; a rule's refinement relabels it when its keywords also occur.
+    NAME_RULES = [
+        ("Services/IT", ['tech', 'soft', 'solution', 'digital', 'cyber', 'cloud'], None),
+        ("Manufacturing", ['steel', 'cloth', 'factory', 'industries', 'engineering', 'chemicals'], None),
+        ("Retail", ['mart', 'store', 'retail', 'shop', 'bazaar', 'kirana'], None),
+        ("Healthcare", ['hospital', 'clinic', 'medical', 'diagnostic', 'pharma', 'health'], ("Pharma", ['pharma', 'drug', 'medicine'])),
+        ("Food & Beverage", ['food', 'restaurant', 'cafe', 'catering', 'bakery', 'hotel'], ("Hospitality", ['hotel', 'resort', 'guest'])),
+        ("Construction", ['construction', 'builder', 'infra', 'contractor'], None),
+        ("E-commerce", ['ecommerce', 'online', 'marketplace', 'e-com'], None),
+        ("Education", ['school', 'college', 'education', 'academy', 'coaching', 'institute'], None),
+        ("Agriculture", ['agri', 'farm', 'crop', 'dairy', 'poultry'], None),
+        ("Real Estate", ['real estate', 'property', 'realty', 'developer'], None),
+        ("Logistics", ['logistics', 'transport', 'courier', 'shipping', 'freight'], None),
+        ("Automotive", ['auto', 'motor', 'vehicle', 'garage', 'cars'], None),
+        ("Textiles", ['textile', 'garment', 'fashion', 'apparel', 'fabric'], None),
+    ]
+    # Bank description keywords, in priority order, when the name says nothing
+    DESCRIPTION_RULES = [
+        ("Services/IT", ['server', 'saas']),
+        ("Manufacturing", ['raw material', 'machinery']),
+        ("Pharma", ['medicine', 'drug']),
+        ("Logistics", ['transport', 'delivery']),
+    ]
+    DESCRIPTION_BATCH = 5000 # descriptions lowercased and scanned per regex pass
+
+    _name_matcher = KeywordMatcher([keywords for _, keywords, _ in NAME_RULES])
+    _name_refiners = {rank: KeywordMatcher([refine[1]]) for rank, (_, _, refine) in enumerate(NAME_RULES) if refine}
+    _description_matcher = KeywordMatcher([keywords for _, keywords in DESCRIPTION_RULES])
+
+    @classmethod
+    def industry_from_name(cls, company_name: str):
+        """Industry implied by the company name, or None."""
+        name = (company_name or "").lower()
+        rank = cls._name_matcher.best(name)
+        if rank is None:
+            return None
+        industry, _, refine = cls.NAME_RULES[rank]
+        if rank in cls._name_refiners and cls._name_refiners[rank].best(name) is not None:
+            return refine[0]
+        return industry
+
+    @classmethod
+    def industry_from_descriptions(cls, descriptions):
+        """
+        Industry implied by bank descriptions, or None. Streams them in batches (one
+        newline-joined, lowercased text each); once a rule matches, later batches are
+        only searched for better-ranked rules, and the scan stops when the top rule matches.
+        """
+        best = len(cls.DESCRIPTION_RULES)
+        descriptions = iter(descriptions)
+        while best > 0:
+            batch = list(islice(descriptions, cls.DESCRIPTION_BATCH))
+            if not batch:
+                break
+            rank = cls._description_matcher.best("\n".join(str(d) for d in batch if d).lower(), best)
+            if rank is not None:
+                best = rank
+        return cls.DESCRIPTION_RULES[best][0] if best < len(cls.DESCRIPTION_RULES) else None
+
+    @classmethod
+    def identify_industry(cls, company_name: str, descriptions=()) -> str:
+        """`descriptions`: bank transaction descriptions (array, or any iterable such as a stream of them)."""
+        return cls.industry_from_name(company_name) or cls.industry_from_descriptions(descriptions) or "Default"
 
     @classmethod
     def get_comparison(cls, industry: str, user_metrics: dict):
@@ -34,3 +34,73 @@ class FinancialMetrics:
         if total_debt_service == 0:
             return 999.0 # No debt
         return round(net_operating_income / total_debt_service, 2)
+
+    @staticmethod
+    def headline_ratios(sales, expenses, inventory, balance):
+        """
+        Dashboard ratios from the aggregate totals (simplified balance sheet for demo data).
+        Shared by the dashboard and the insights batch so both send the LLM the same metrics.
+        """
+        total_assets = inventory + balance + 1000 # Adding a buffer for fixed assets
+        total_liabilities = expenses * 0.5 # Simplified ratio for demo
+        ebit = sales - expenses
+
+        z_score = FinancialMetrics.calculate_altman_z_score(
+            working_capital=(balance + inventory - total_liabilities),
+            retained_earnings=(sales - expenses), # Approximation
+            ebit=ebit,
+            market_cap=(total_assets - total_liabilities), # Book value
+            total_liabilities=max(total_liabilities, 1),
+            total_assets=max(total_assets, 1)
+        )
+        dscr = FinancialMetrics.calculate_dscr(net_operating_income=ebit, total_debt_service=expenses * 0.1)
+        return {
+            "total_assets": total_assets,
+            "total_liabilities": total_liabilities,
+            "ebit": ebit,
+            "z_score": z_score,
+            "dscr": dscr
+        }
+
+    @staticmethod
+    def insight_summary(sales, expenses, balance, ratios: dict) -> dict:
+        """The metrics the LLM alerts are generated (and cached) from."""
+        return {
+            "sales": int(sales),
+            "expenses": int(expenses),
+            "bank_balance": int(balance),
+            "z_score": round(ratios["z_score"], 2),
+            "ebit": int(ratios["ebit"]),
+            "dscr": round(ratios["dscr"], 2)
+        }
+
+    @staticmethod
+    def health_score(z_score) -> dict:
+        """0-100 display score from the Altman Z'' score, with its label and colour."""
+        if z_score >= 3:
+            display_score = 90 + min(z_score, 10)
+        elif z_score >= 1.8:
+            display_score = 60 + (z_score - 1.8) * 20
+        else:
+            display_score = max(z_score * 30, 10)
+        display_score = min(int(display_score), 100)
+        return {
+            "value": display_score,
+            "label": "Strong" if display_score > 80 else "Good" if display_score > 50 else "Weak",
+            "color": "green" if display_score > 80 else "yellow" if display_score > 50 else "red"
+        }
+
+    @staticmethod
+    def cash_flow_summary(sales, expenses, balance, expense_categories: dict) -> dict:
+        """Inflow/outflow/runway totals; outflow is the categorised spend, else total expenses."""
+        category_totals = [int(val) for cat, val in (expense_categories or {}).items() if cat]
+        total_outflow = sum(category_totals) if category_totals else int(expenses)
+        inflow = int(sales) # whole rupees, so net always equals inflow - outflow as displayed
+        return {
+            "inflow": inflow,
+            "outflow": int(total_outflow),
+            "net": inflow - int(total_outflow),
+            # Burn Rate (Average monthly outflow - for demo assuming this is the monthly data)
+            "burn_rate": int(total_outflow),
+            "survival_months": round(balance / total_outflow, 1) if total_outflow > 0 else 99
+        }
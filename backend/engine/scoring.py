@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+class PortfolioScorer:
+    """
+    Vectorized counterparts of FinancialMetrics.headline_ratios / health_score and
+    LendingEngine.calculate_credit_score: one NumPy pass over per-company column arrays
+    instead of a Python loop per company. Results match the scalar engines.
+    """
+    COLUMNS = ("sales", "expenses", "inventory", "balance")
+
+    @staticmethod
+    def altman_z_score(working_capital, retained_earnings, ebit, market_cap, total_liabilities, total_assets):
+        """Z'' = 6.56X1 + 3.26X2 + 6.72X3 + 1.05X4, rounded to 2 places; 0 where total_assets is 0."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (6.56 * working_capital / total_assets + 3.26 * retained_earnings / total_assets
+                 + 6.72 * ebit / total_assets + 1.05 * market_cap / total_liabilities)
+        return np.where(total_assets == 0, 0.0, np.round(z, 2))
+
+    @staticmethod
+    def dscr(net_operating_income, total_debt_service):
+        """999.0 (no debt) where debt service is 0."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.round(net_operating_income / total_debt_service, 2)
+        return np.where(total_debt_service == 0, 999.0, ratio)
+
+    @staticmethod
+    def credit_score(dscr, z_score, net_margin):
+        """300-900, same bands as LendingEngine.calculate_credit_score."""
+        score = 300 + np.select([dscr > 2.0, dscr > 1.25, dscr > 1.0], [300, 200, 100], 0)
+        score += np.select([z_score > 3.0, z_score > 1.8], [200, 100], 0)
+        score += np.select([net_margin > 0.2, net_margin > 0.1], [100, 50], 0)
+        return np.minimum(score, 900)
+
+    @staticmethod
+    def health_score(z_score):
+        """(value, label, colour) arrays, same bands as FinancialMetrics.health_score."""
+        raw = np.select(
+            [z_score >= 3, z_score >= 1.8],
+            [90 + np.minimum(z_score, 10), 60 + (z_score - 1.8) * 20],
+            np.maximum(z_score * 30, 10)
+        )
+        value = np.minimum(np.trunc(raw), 100).astype(np.int64)
+        label = np.select([value > 80, value > 50], ["Strong", "Good"], "Weak")
+        color = np.select([value > 80, value > 50], ["green", "yellow"], "red")
+        return value, label, color
+
+    @classmethod
+    def score(cls, data) -> pd.DataFrame:
+        """
+        `data`: DataFrame or mapping of equal-length arrays with sales, expenses, inventory
+        and balance (plus any id columns, which are carried through). Returns a DataFrame
+        with z_score, dscr, net_margin, credit_score, health_score, health_label, health_color.
+        """
+        frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        sales, expenses, inventory, balance = (
+            frame[c].fillna(0).to_numpy(dtype=np.float64) for c in cls.COLUMNS
+        )
+
+        # Same simplified balance sheet as FinancialMetrics.headline_ratios
+        total_assets = inventory + balance + 1000
+        total_liabilities = expenses * 0.5
+        ebit = sales - expenses
+        z_score = cls.altman_z_score(
+            working_capital=balance + inventory - total_liabilities,
+            retained_earnings=sales - expenses,
+            ebit=ebit,
+            market_cap=total_assets - total_liabilities,
+            total_liabilities=np.maximum(total_liabilities, 1),
+            total_assets=np.maximum(total_assets, 1)
+        )
+        dscr = cls.dscr(ebit, expenses * 0.1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            net_margin = np.where(sales > 0, ebit / sales, 0.0)
+        value, label, color = cls.health_score(z_score)
+
+        result = frame.drop(columns=list(cls.COLUMNS))
+        result["z_score"] = z_score
+        result["dscr"] = dscr
+        result["net_margin"] = np.round(net_margin, 2)
+        result["credit_score"] = cls.credit_score(dscr, z_score, net_margin)
+        result["health_score"] = value
+        result["health_label"] = label
+        result["health_color"] = color
+        return result
+
+    @staticmethod
+    def summary(scored: pd.DataFrame) -> dict:
+        """Portfolio-level distribution for screening dashboards."""
+        if scored.empty:
+            return {"companies": 0}
+        credit = scored["credit_score"].to_numpy()
+        return {
+            "companies": int(len(scored)),
+            "health_labels": {k: int(v) for k, v in scored["health_label"].value_counts().items()},
+            "credit_score": {
+                "mean": round(float(credit.mean()), 1),
+                "p10": float(np.percentile(credit, 10)),
+                "p50": float(np.percentile(credit, 50)),
+                "p90": float(np.percentile(credit, 90))
+            },
+            "distressed": int((scored["z_score"] < 1.8).sum())
+        }
@@ -0,0 +1,134 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class PoolMetrics:
+    """Queue depth and per-task latency for one pool."""
+
+    def __init__(self, workers: int, samples: int = 500):
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self._latencies = {} # task name -> deque of recent seconds
+        self._samples = samples
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.submitted += 1
+
+    def finish(self, name: str, seconds: float, ok: bool):
+        with self._lock:
+            self.completed += 1
+            if not ok:
+                self.failed += 1
+            self._latencies.setdefault(name, deque(maxlen=self._samples)).append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            in_flight = self.submitted - self.completed
+            tasks = {}
+            for name, values in self._latencies.items():
+                ordered = sorted(values)
+                tasks[name] = {
+                    "count": len(ordered),
+                    "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+                    "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 2),
+                    "max_ms": round(ordered[-1] * 1000, 2)
+                }
+            return {
+                "workers": self.workers,
+                "in_flight": in_flight,
+                "queue_depth": max(in_flight - self.workers, 0),
+                "submitted": self.submitted,
+                "failed": self.failed,
+                "tasks": tasks
+            }
+
+class ExecutionLayer:
+    """
+    Keeps blocking work off the asyncio event loop.
+    run_cpu -> ProcessPoolExecutor for CPU-bound engine calls (sklearn, NumPy, reportlab).
+    run_io  -> ThreadPoolExecutor for blocking DB / file IO.
+    CPU work must be a picklable module-level function (or class staticmethod).
+    With cpu_workers=0 CPU work falls back to the thread pool (handy for dev/tests).
+    """
+
+    def __init__(self, cpu_workers: int = None, io_workers: int = 32, start_method: str = "spawn"):
+        self.cpu_workers = (os.cpu_count() or 1) if cpu_workers is None else cpu_workers
+        self.io_workers = io_workers
+        self.start_method = start_method
+        self._cpu_pool = None
+        self._io_pool = None
+        self.cpu_metrics = PoolMetrics(self.cpu_workers or io_workers)
+        self.io_metrics = PoolMetrics(io_workers)
+
+    @classmethod
+    def from_env(cls):
+        cpu = os.getenv("EXECUTOR_CPU_WORKERS")
+        return cls(
+            cpu_workers=int(cpu) if cpu is not None else None,
+            io_workers=int(os.getenv("EXECUTOR_IO_WORKERS", "32")),
+            start_method=os.getenv("EXECUTOR_START_METHOD", "spawn")
+        )
+
+    def _io_executor(self):
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="io")
+        return self._io_pool
+
+    def _cpu_executor(self):
+        if self.cpu_workers <= 0:
+            return self._io_executor()
+        if self._cpu_pool is None:
+            # Created lazily so importing the app never forks
+            self._cpu_pool = ProcessPoolExecutor(
+                max_workers=self.cpu_workers,
+                mp_context=multiprocessing.get_context(self.start_method)
+            )
+        return self._cpu_pool
+
+    async def run_cpu(self, fn, *args, **kwargs):
+        return await self._run(self._cpu_executor(), self.cpu_metrics, fn, *args, **kwargs)
+
+    async def run_io(self, fn, *args, **kwargs):
+        return await self._run(self._io_executor(), self.io_metrics, fn, *args, **kwargs)
+
+    async def _run(self, pool, metrics: PoolMetrics, fn, *args, **kwargs):
+        name = getattr(fn, "__qualname__", None) or getattr(fn, "__name__", "task")
+        call = functools.partial(fn, *args, **kwargs) if kwargs else None
+        metrics.start()
+        start = time.perf_counter()
+        ok = False
+        try:
+            loop = asyncio.get_running_loop()
+            if call is not None:
+                result = await loop.run_in_executor(pool, call)
+            else:
+                result = await loop.run_in_executor(pool, fn, *args)
+            ok = True
+            return result
+        finally:
+            metrics.finish(name, time.perf_counter() - start, ok)
+
+    def stats(self) -> dict:
+        return {"cpu": self.cpu_metrics.snapshot(), "io": self.io_metrics.snapshot()}
+
+    def shutdown(self):
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+            self._cpu_pool = None
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=False, cancel_futures=True)
+            self._io_pool = None
+
+execution = ExecutionLayer.from_env()
@@ -1,24 +1,44 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from services.parser import DocumentParser
+from services.ingest import BulkIngestor
+from services.aggregates import AggregateStore
+from services.cache import SnapshotCache
+from services.transactions import IndustryStore
+from services.report import ReportRenderer, ReportCache, REPORT_MAX_TRANSACTIONS, report_stats
+from services.report_export import ReportExporter, PortfolioLoader, REPORT_EXPORT_MAX_COMPANIES, REPORT_EXPORT_TRANSACTIONS
 from services.bookkeeper import BookkeeperAgent
 from services.banking import MockBankingAdapter
 from engine.metrics import FinancialMetrics
-from engine.forecaster import Forecaster
-from engine.anomaly import AnomalyDetector
+from engine.forecaster import Forecaster, SEASON_LENGTHS
 from engine.lender import LendingEngine
 from engine.industry import IndustryAnalyzer
 from engine.advisor import SavingsAdvisor
-from services.setu import SetuAA
-import models, auth, database
-import pandas as pd
+from engine.scoring import PortfolioScorer
+from engine.simulation import RunwaySimulator
+from services.setu import setu_client
+from services.fi_pipeline import fi_jobs
+from services.events import event_bus, configured_workers
+from services.jobs import JobQueue, JobWorker, JobResult, JOB_WORKER_ENABLED, JOB_SPOOL_DIR
+from services.insights import BatchInsightGenerator, InsightStore, schedule_batch
+from services.forecast import (
+    CashFlowHistory, ForecastStore, forecast_response, runway_response, scenario_key,
+    FORECAST_MAX_HORIZON, RUNWAY_MAX_PATHS, RUNWAY_MAX_HORIZON
+)
+import models, auth, database, tasks, migrations
+from executor import execution
+from money import rupees, paise
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from datetime import datetime
 
-# Create tables
+# Create tables, then apply schema migrations for tables that already existed
 models.Base.metadata.create_all(bind=database.engine)
+migrations.run_migrations(database.engine)
 
 app = FastAPI(
     title="Financial Health Platform API",
@@ -29,6 +49,10 @@ app = FastAPI(
 
 # Initialize Services
 bookkeeper = BookkeeperAgent()
+insight_batch = BatchInsightGenerator(bookkeeper, execution)
+snapshot_cache = SnapshotCache.from_env()
+report_cache = ReportCache()
+report_exporter = ReportExporter(execution, report_cache, report_stats)
 
 # Origins for CORS - Allow all localhost ports for development
 origins = [
@@ -58,6 +82,63 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.on_event("startup")
+async def start_job_worker():
+    await event_bus.start(database.SQLALCHEMY_DATABASE_URL, configured_workers())
+    if JOB_WORKER_ENABLED:
+        job_worker.start()
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    await job_worker.stop()
+    await event_bus.stop()
+    execution.shutdown()
+    auth.password_hasher.shutdown()
+    await setu_client.aclose()
+
+@app.get("/api/ops/stats")
+async def ops_stats(principal: auth.Principal = Depends(auth.get_admin_principal)):
+    return {
+        "snapshot_cache": snapshot_cache.stats(),
+        "report_cache": report_cache.stats(),
+        "reports": {**report_stats.stats(), "last_export": report_exporter.last_export},
+        "executor": execution.stats(),
+        "db_pool": database.pool_status(),
+        "principal_cache": auth.principal_cache.stats(),
+        "password_hashing": auth.password_hasher.stats(),
+        "setu": setu_client.stats(),
+        "fi_fetch": fi_jobs.stats(),
+        "events": event_bus.stats(),
+        "jobs": job_worker.stats(),
+        "bookkeeper_cache": bookkeeper.cache.stats(),
+        "insights_batch": insight_batch.stats()
+    }
+
+# --- Blocking DB helpers (execution.run_io on a Session, or AsyncSession.run_sync) ---
+def _get_company(db: Session, user_id: int):
+    return db.query(models.Company).filter(models.Company.user_id == user_id).first()
+
+def _get_company_by_id(db: Session, company_id: Optional[int]):
+    if company_id is None:
+        return None
+    return db.get(models.Company, company_id)
+
+def _update_company_by_id(db: Session, company_id: int, **fields):
+    db.query(models.Company).filter(models.Company.id == company_id).update(fields, synchronize_session=False)
+    db.commit()
+
+def _get_user_by_email(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def _update_password_hash(db: Session, user: models.User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+
+def _update_company(db: Session, company: models.Company, **fields):
+    for name, value in fields.items():
+        setattr(company, name, value)
+    db.commit()
+
 # --- Auth Schemas ---
 class UserSignup(BaseModel):
     email: str
@@ -76,13 +157,18 @@ async def signup(user_data: UserSignup, db: Session = Depends(database.get_db)):
         raise HTTPException(status_code=400, detail="Password cannot be empty")
 
     # Check if user exists
-    db_user = db.query(models.User).filter(models.User.email == user_data.email).first()
+    db_user = await execution.run_io(_get_user_by_email, db, user_data.email)
     if db_user:
         return JSONResponse(status_code=400, content={"detail": "Email already registered"})
     
-    # Create User
-    hashed_pwd = auth.get_password_hash(user_data.password)
+    # Create User (hashed on the dedicated hashing pool, off the event loop)
+    hashed_pwd = await auth.password_hasher.hash(user_data.password)
+    await execution.run_io(_create_user, db, user_data, hashed_pwd)
+    auth.invalidate_principal(user_data.email)
     
+    return {"message": "User created successfully"}
+
+def _create_user(db: Session, user_data: UserSignup, hashed_pwd: str):
     new_user = models.User(
         email=user_data.email,
         hashed_password=hashed_pwd,
@@ -99,20 +185,24 @@ async def signup(user_data: UserSignup, db: Session = Depends(database.get_db)):
     )
     db.add(new_company)
     db.commit()
-    
-    return {"message": "User created successfully"}
 
 @app.post("/api/auth/login")
 async def login(login_data: UserLogin, db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.email == login_data.email).first()
-    if not user or not auth.verify_password(login_data.password, user.hashed_password):
+    user = await execution.run_io(_get_user_by_email, db, login_data.email)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    valid, new_hash = await auth.password_hasher.verify_and_update(login_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash predates the current PASSWORD_HASH_ROUNDS; upgrade it transparently
+        await execution.run_io(_update_password_hash, db, user, new_hash)
     
     # Fetch user's company
-    company = db.query(models.Company).filter(models.Company.user_id == user.id).first()
+    company = await execution.run_io(_get_company, db, user.id)
     company_name = company.legal_name if company else "N/A"
     
-    access_token = auth.create_access_token(data={"sub": user.email})
+    access_token = auth.create_principal_token(user.id, user.email, company.id if company else None)
     return {
         "access_token": access_token, 
         "token_type": "bearer", 
@@ -124,16 +214,48 @@ async def login(login_data: UserLogin, db: Session = Depends(database.get_db)):
     }
 
 # --- Live Banking (Setu AA) ---
-# setu = SetuAA() # Moved inside functions as per instruction
+# setu_client is process-wide: pooled connections, shared token, circuit breaker.
+# Consent state arrives by webhook and is pushed to the browser over SSE; the status
+# endpoint only reads the DB (behind the snapshot cache) and never calls Setu inline.
+
+from fastapi import Request, Header
+from fastapi.responses import StreamingResponse
+import asyncio, hmac, os, time
+
+SETU_WEBHOOK_SECRET = os.getenv("SETU_WEBHOOK_SECRET")
+# Safety net for missed webhooks: at most one background Setu status check per company per interval (0 = off)
+SETU_STATUS_RECONCILE_SECONDS = float(os.getenv("SETU_STATUS_RECONCILE_SECONDS", "60"))
+_last_reconcile = {}
+
+def _get_company_by_consent(db: Session, consent_id: str):
+    return db.query(models.Company).filter(models.Company.setu_consent_id == consent_id).first()
 
-from fastapi import Request
+def _consent_url(consent_id: Optional[str]) -> Optional[str]:
+    if not consent_id:
+        return None
+    if consent_id.startswith("demo_"):
+        return "http://localhost:5173/setu_mock.html"
+    return f"https://bridge.setu.co/v2/account-aggregator/consent/{consent_id}"
+
+def _setu_status_payload(company) -> dict:
+    if not company or not company.setu_consent_id:
+        return {"status": "NONE"}
+    if company.setu_consent_status == "ACTIVE":
+        return {"status": "ACTIVE"}
+    return {"status": company.setu_consent_status or "PENDING", "url": _consent_url(company.setu_consent_id)}
+
+def _setu_status_changed(company_id: int, company=None, status: str = None):
+    """Drops the cached status and pushes the new state to SSE subscribers."""
+    snapshot_cache.delete(f"setu_status:{company_id}")
+    payload = _setu_status_payload(company) if company is not None else {"status": status}
+    event_bus.publish(company_id, "status", payload)
 
 @app.post("/api/banking/setu/initiate")
 async def initiate_setu_consent(
     payload: dict, 
     request: Request,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    principal: auth.Principal = Depends(auth.get_current_company)
 ):
     vua = payload.get("vua")
     if not vua:
@@ -143,16 +265,14 @@ async def initiate_setu_consent(
     
     try:
         # Get User's Company
-        company = db.query(models.Company).filter(models.Company.user_id == current_user.id).first()
+        company = await execution.run_io(_get_company_by_id, db, principal.company_id)
         company_name = company.legal_name if company else "Your Company"
 
-        setu = SetuAA()
-        result = setu.create_consent_request(vua, company_name, auth_token=auth_header)
+        result = await setu_client.create_consent_request(vua, company_name, auth_token=auth_header)
         
         if company:
-            company.setu_consent_id = result.get("id")
-            company.setu_consent_status = "PENDING"
-            db.commit()
+            await execution.run_io(_update_company, db, company, setu_consent_id=result.get("id"), setu_consent_status="PENDING")
+            _setu_status_changed(company.id, company)
             
         return {
             "consent_id": result.get("id"),
@@ -166,172 +286,197 @@ async def initiate_setu_consent(
 @app.post("/api/banking/setu/approve")
 async def approve_setu_consent(
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    principal: auth.Principal = Depends(auth.get_current_company)
 ):
-    company = db.query(models.Company).filter(models.Company.user_id == current_user.id).first()
-    if company:
-        company.setu_consent_status = "ACTIVE"
-        db.commit()
+    if principal.company_id is not None:
+        await execution.run_io(_update_company_by_id, db, principal.company_id, setu_consent_status="ACTIVE")
+        company = await execution.run_io(_get_company_by_id, db, principal.company_id)
+        _setu_status_changed(principal.company_id, company)
+        _start_fi_fetch(company)
     return {"status": "SUCCESS"}
 
+def _start_fi_fetch(company) -> bool:
+    """Kicks off the background FI data pull for a real (non-demo) ACTIVE consent."""
+    if not company or not company.setu_consent_id or company.setu_consent_id.startswith("demo_") or setu_client.demo_mode:
+        return False
+    return fi_jobs.start(setu_client, execution, company.id, company.setu_consent_id)
+
 @app.post("/api/banking/setu/reset")
 async def reset_setu_consent(
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    principal: auth.Principal = Depends(auth.get_current_company)
 ):
-    company = db.query(models.Company).filter(models.Company.user_id == current_user.id).first()
-    if company:
-        company.setu_consent_id = None
-        company.setu_consent_status = "NONE"
-        db.commit()
+    if principal.company_id is not None:
+        await execution.run_io(_update_company_by_id, db, principal.company_id, setu_consent_id=None, setu_consent_status="NONE")
+        _setu_status_changed(principal.company_id, status="NONE")
     return {"status": "SUCCESS"}
 
 @app.get("/api/banking/setu/status")
 async def check_setu_status(
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    principal: auth.Principal = Depends(auth.get_current_company)
 ):
-    company = db.query(models.Company).filter(models.Company.user_id == current_user.id).first()
-    if not company or not company.setu_consent_id:
+    """Served from the snapshot cache / DB only. Webhooks keep the DB current."""
+    if principal.company_id is None:
         return {"status": "NONE"}
-    
-    # If already active in DB, return ACTIVE
-    if company.setu_consent_status == "ACTIVE":
-        return {"status": "ACTIVE"}
-    
-    # Provide URL for pending state
-    url = None
-    if company.setu_consent_id:
-        if company.setu_consent_id.startswith("demo_"):
-            url = "http://localhost:5173/setu_mock.html"
-        else:
-            url = f"https://bridge.setu.co/v2/account-aggregator/consent/{company.setu_consent_id}"
+    cache_key = f"setu_status:{principal.company_id}"
+    cached = snapshot_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
+    company = await execution.run_io(_get_company_by_id, db, principal.company_id)
+    result = _setu_status_payload(company)
+    snapshot_cache.set(cache_key, result)
+    if result["status"] == "PENDING":
+        _schedule_reconcile(company)
+    return result
+
+def _schedule_reconcile(company):
+    """Background Setu status check, rate-limited per company, for when a webhook never arrives."""
+    if SETU_STATUS_RECONCILE_SECONDS <= 0 or company.setu_consent_id.startswith("demo_") or setu_client.demo_mode:
+        return
+    now = time.monotonic()
+    if now - _last_reconcile.get(company.id, float("-inf")) < SETU_STATUS_RECONCILE_SECONDS:
+        return
+    _last_reconcile[company.id] = now
+    asyncio.create_task(_reconcile_consent(company.id, company.setu_consent_id))
+
+async def _reconcile_consent(company_id: int, consent_id: str):
     try:
-        setu = SetuAA()
-        result = setu.check_consent_status(company.setu_consent_id)
-        return {"status": result.get("status"), "url": url}
+        result = await setu_client.check_consent_status(consent_id)
+        status = result.get("status")
+        if status and status != "PENDING":
+            await _apply_consent_status(consent_id, status)
     except Exception as e:
-        return {"status": "PENDING", "url": url}
+        print(f"Setu status reconcile error for company {company_id}: {str(e)}")
+
+async def _apply_consent_status(consent_id: str, status: str):
+    """Persists a consent status reported by Setu, notifies subscribers, and starts the FI pull on ACTIVE."""
+    db = database.SessionLocal()
+    try:
+        company = await execution.run_io(_get_company_by_consent, db, consent_id)
+        if company is None:
+            return None
+        if company.setu_consent_status != status:
+            await execution.run_io(_update_company, db, company, setu_consent_status=status)
+            _setu_status_changed(company.id, company)
+        if status == "ACTIVE":
+            _start_fi_fetch(company)
+        return company.id
+    finally:
+        db.close()
+
+@app.post("/api/banking/setu/webhook")
+async def setu_webhook(payload: dict, x_webhook_secret: Optional[str] = Header(None)):
+    """
+    Setu notification receiver (CONSENT_STATUS_UPDATE, SESSION_STATUS_UPDATE / FI_DATA_READY).
+    Authenticated with the shared secret configured on the Setu bridge.
+    """
+    if not SETU_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook secret not configured")
+    if not x_webhook_secret or not hmac.compare_digest(x_webhook_secret, SETU_WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+
+    kind = str(payload.get("type", "")).upper()
+    consent_id = payload.get("consentId")
+    status = str((payload.get("data") or {}).get("status") or payload.get("status") or "").upper()
+    if not consent_id or not status:
+        raise HTTPException(status_code=400, detail="consentId and status are required")
+
+    if kind == "CONSENT_STATUS_UPDATE":
+        company_id = await _apply_consent_status(consent_id, status)
+    elif kind in ("SESSION_STATUS_UPDATE", "FI_DATA_READY"):
+        db = database.SessionLocal()
+        try:
+            company = await execution.run_io(_get_company_by_consent, db, consent_id)
+        finally:
+            db.close()
+        company_id = company.id if company else None
+        if company_id is not None and status in ("COMPLETED", "PARTIAL", "READY"):
+            fi_jobs.notify_ready(company_id)
+    else:
+        return {"status": "IGNORED"}
+
+    # Unknown consents are acknowledged so Setu doesn't keep retrying them
+    return {"status": "OK" if company_id is not None else "IGNORED"}
+
+@app.get("/api/banking/setu/events")
+async def setu_events(
+    request: Request,
+    principal: auth.Principal = Depends(auth.get_current_company_from_query)
+):
+    """Server-sent events: current consent status, then pushed status/fi_fetch changes. Auth via ?token=."""
+    # Short sessions, released before streaming: no pooled connection is held for the life of the stream
+    async def current_status() -> dict:
+        async with database.get_async_sessionmaker()() as db:
+            return _setu_status_payload(await db.run_sync(_get_company_by_id, principal.company_id))
+
+    initial = await current_status()
+    return StreamingResponse(
+        event_bus.stream(principal.company_id, initial, request.is_disconnected, refresh=current_status),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/banking/setu/fetch")
+async def start_setu_fetch(
+    db: Session = Depends(database.get_db),
+    principal: auth.Principal = Depends(auth.get_current_company)
+):
+    """(Re)fetches FI data for the company's ACTIVE consent in the background. Safe to repeat: rows are deduplicated."""
+    company = await execution.run_io(_get_company_by_id, db, principal.company_id)
+    if not company or company.setu_consent_status != "ACTIVE":
+        raise HTTPException(status_code=400, detail="No active Setu consent")
+    if company.setu_consent_id.startswith("demo_"):
+        raise HTTPException(status_code=400, detail="FI data is not available for demo consents")
+    started = _start_fi_fetch(company)
+    return {"started": started, **fi_jobs.status(company.id)}
+
+@app.get("/api/banking/setu/fetch")
+async def setu_fetch_status(principal: auth.Principal = Depends(auth.get_current_company)):
+    return fi_jobs.status(principal.company_id)
 
 # --- Data Ingestion ---
 
+# Uploads above this size are spooled and ingested by the job worker; the request returns a job id
+UPLOAD_ASYNC_THRESHOLD_BYTES = int(os.getenv("UPLOAD_ASYNC_THRESHOLD_BYTES", str(2 * 1024 * 1024)))
+
 @app.post("/api/upload")
 async def upload_financial_statement(
     type: str, 
     file: UploadFile = File(...), 
+    background: bool = False,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    principal: auth.Principal = Depends(auth.get_current_company)
 ):
     """
     Uploads a document, parses it, and stores raw data in the DB.
+    Large files (or background=true) are queued instead: 202 with a job id for /api/jobs/{id}.
     """
     try:
-        content = await file.read()
         filename = file.filename
         
-        # 1. Parse File
-        df = await DocumentParser.parse_file(content, filename)
-        
-        # Replace all NaN with None for DB compatibility
-        df = df.where(pd.notnull(df), None)
-        
-        # 2. Get User's Company
-        company = db.query(models.Company).filter(models.Company.user_id == current_user.id).first()
-        if not company:
+        # 1. Get User's Company (from the cached principal)
+        if principal.company_id is None:
             raise HTTPException(status_code=400, detail="No company found for this user")
 
-        # 3. Save to DB
-        records_saved = 0
-        
-        def safe_int(val):
-            try:
-                if val is None or (isinstance(val, float) and pd.isna(val)):
-                    return 0
-                return int(float(val))
-            except:
-                return 0
-
-        def safe_date(val):
-            try:
-                if val is None or (isinstance(val, float) and pd.isna(val)) or str(val).lower() == 'nan':
-                    return None
-                dt = pd.to_datetime(val)
-                if pd.isna(dt):
-                    return None
-                return dt
-            except:
-                return None
-
-        def safe_str(val):
-            if val is None or (isinstance(val, float) and pd.isna(val)) or str(val).lower() == 'nan':
-                return ''
-            return str(val)
-
-        def guess_type(row):
-            t = safe_str(row.get('type')).upper()
-            if t in ["SALE", "EXPENSE", "INVENTORY"]:
-                return t
-            cat = safe_str(row.get('item/category')).lower()
-            name = safe_str(row.get('name')).lower()
-            expense_keywords = ['electricity', 'salary', 'rent', 'internet', 'plumbing', 'fittings', 'bill', 'tax', 'payment']
-            if any(k in cat for k in expense_keywords) or any(k in name for k in expense_keywords):
-                return "EXPENSE"
-            return "SALE"
-
-        if type == "bank":
-            for _, row in df.iterrows():
-                debit = safe_int(row.get('debit'))
-                credit = safe_int(row.get('credit'))
-                # If both are 0 but amount exists, try to map it
-                amt = safe_int(row.get('amount'))
-                if debit == 0 and credit == 0 and amt != 0:
-                    if amt < 0: debit = abs(amt)
-                    else: credit = amt
-                
-                txn = models.BankTransaction(
-                    company_id=company.id,
-                    date=safe_date(row.get('date')),
-                    description=safe_str(row.get('description')),
-                    debit=debit,
-                    credit=credit,
-                    balance=safe_int(row.get('balance'))
-                )
-                db.add(txn)
-                records_saved += 1
-        
-        elif type == "accounting":
-            for _, row in df.iterrows():
-                rec = models.AccountingRecord(
-                    company_id=company.id,
-                    type=guess_type(row),
-                    invoice_no=safe_str(row.get('invoiceno')),
-                    date=safe_date(row.get('date')),
-                    name=safe_str(row.get('name')),
-                    item_category=safe_str(row.get('item/category')),
-                    qty=safe_int(row.get('qty')),
-                    unit_cost=safe_int(row.get('unitcost')),
-                    amount=safe_int(row.get('amount')),
-                    status=safe_str(row.get('status')),
-                    due_date=safe_date(row.get('duedate'))
-                )
-                db.add(rec)
-                records_saved += 1
-        
-        elif type == "gst":
-            for _, row in df.iterrows():
-                gst = models.GSTReturn(
-                    company_id=company.id,
-                    return_period=safe_str(row.get('period')),
-                    total_sales=safe_int(row.get('total_sales')),
-                    total_tax_paid=safe_int(row.get('total_tax_paid')),
-                    status=safe_str(row.get('status', 'Filed')),
-                    filing_date=safe_date(row.get('date'))
-                )
-                db.add(gst)
-                records_saved += 1
-        
-        db.commit()
+        # 2. Large file: spool it and let the job worker ingest it
+        if background or (file.size or 0) > UPLOAD_ASYNC_THRESHOLD_BYTES:
+            path = await execution.run_io(_spool_upload, file.file, filename)
+            job = await execution.run_io(
+                JobQueue.enqueue, db, principal.company_id, "upload",
+                {"kind": type, "path": path, "filename": filename}, principal.user_id
+            )
+            job_worker.notify()
+            return JSONResponse(status_code=202, content={
+                "status": "queued",
+                "job_id": job.id,
+                "filename": filename,
+                "type": type
+            })
+
+        # 3. Stream-parse the file and hand each batch to the bulk writer (off the event loop)
+        records_saved = await execution.run_io(_ingest_upload, db, principal.company_id, type, file.file, filename)
         
         return {
             "status": "success",
@@ -339,15 +484,68 @@ async def upload_financial_statement(
             "total_rows": records_saved,
             "type": type
         }
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=str(e))
 
+def _ingest_upload(db: Session, company_id: int, kind: str, fileobj, filename: str, progress=None) -> int:
+    ingestor = BulkIngestor(db, company_id)
+    records_saved = 0
+    for batch in DocumentParser.iter_batches(fileobj, filename):
+        records_saved += ingestor.ingest(kind, batch)
+        if progress:
+            progress(records_saved)
+    db.commit()
+    _schedule_insights(db, company_id)
+    return records_saved
+
+def _schedule_insights(db: Session, company_id: int):
+    """Data changed: queue the (delayed, shared) insights batch. Never fails the ingest."""
+    try:
+        schedule_batch(db, company_id)
+    except Exception as e:
+        db.rollback()
+        print(f"Insights schedule error: {str(e)}")
+
+def _spool_upload(fileobj, filename: str) -> str:
+    import shutil, uuid
+    os.makedirs(JOB_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(JOB_SPOOL_DIR, f"{uuid.uuid4().hex}_{os.path.basename(filename or 'upload')}")
+    with open(path, "wb") as out:
+        shutil.copyfileobj(fileobj, out, 1024 * 1024)
+    return path
+
+def _delete_rows(db: Session, company_id: int, kind: str) -> int:
+    removed = AggregateStore.delete_rows(db, company_id, kind)
+    db.commit()
+    _schedule_insights(db, company_id)
+    return removed
+
+@app.delete("/api/upload/{type}")
+async def delete_financial_data(
+    type: str,
+    db: Session = Depends(database.get_db),
+    principal: auth.Principal = Depends(auth.get_current_company)
+):
+    """
+    Removes all uploaded records of one type (bank/accounting/gst) and updates the aggregates.
+    """
+    if type not in ("bank", "accounting", "gst"):
+        raise HTTPException(status_code=400, detail="Unknown data type")
+
+    if principal.company_id is None:
+        raise HTTPException(status_code=400, detail="No company found for this user")
+
+    removed = await execution.run_io(_delete_rows, db, principal.company_id, type)
+    return {"status": "success", "deleted_rows": removed, "type": type}
+
 @app.post("/api/bank/connect")
 async def connect_bank(
     payload: dict,
-    current_user: models.User = Depends(auth.get_current_user)
+    principal: auth.Principal = Depends(auth.get_current_company)
 ):
     # payload expected: { "bank_name": "Chase" }
     try:
@@ -357,14 +555,13 @@ async def connect_bank(
 
 @app.get("/api/dashboard/metrics")
 async def get_dashboard_metrics(
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(database.get_async_db),
+    principal: auth.Principal = Depends(auth.get_current_company)
 ):
     """
     Returns calculated financial health metrics from real DB data.
     """
-    company = db.query(models.Company).filter(models.Company.user_id == current_user.id).first()
-    if not company:
+    if principal.company_id is None:
         return {
             "health_score": {"value": 0, "label": "No Data", "color": "gray"},
             "ratios": {"z_score": 0, "dscr": 0, "net_margin": 0},
@@ -372,63 +569,44 @@ async def get_dashboard_metrics(
             "insights": ["Complete your onboarding to see analytics."]
         }
 
-    # 1. Aggregate Accounting Data
-    from sqlalchemy import func
-    sales = db.query(func.sum(models.AccountingRecord.amount)).filter(
-        models.AccountingRecord.company_id == company.id,
-        models.AccountingRecord.type == "SALE"
-    ).scalar() or 0
-    
-    expenses = db.query(func.sum(models.AccountingRecord.amount)).filter(
-        models.AccountingRecord.company_id == company.id,
-        models.AccountingRecord.type == "EXPENSE"
-    ).scalar() or 0
-    
-    inventory = db.query(func.sum(models.AccountingRecord.amount)).filter(
-        models.AccountingRecord.company_id == company.id,
-        models.AccountingRecord.type == "INVENTORY"
-    ).scalar() or 0
+    # 0. Serve from the snapshot cache until new data lands
+    agg = await db.run_sync(AggregateStore.get, principal.company_id)
+    cache_key = f"dashboard:{principal.company_id}:v{agg.data_version or 0}"
+    cached = snapshot_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    company = await db.get(models.Company, principal.company_id)
+    metrics = await _compute_dashboard_metrics(db, company, agg)
+    if not metrics.get("insights_job_id"):
+        # Don't pin placeholder insights in the cache while the LLM job is still running
+        snapshot_cache.set(cache_key, metrics)
+    return metrics
+
+async def _compute_dashboard_metrics(db: AsyncSession, company: models.Company, agg: models.CompanyAggregate) -> dict:
+    # 1. Aggregate Accounting + Bank Data (one materialized row, paise -> rupees)
+    totals = AggregateStore.totals(agg)
+    sales = totals["sales"]
+    expenses = totals["expenses"]
+    inventory = totals["inventory"]
 
     # 2. Get Bank Data
-    latest_balance = db.query(models.BankTransaction.balance).filter(
-        models.BankTransaction.company_id == company.id
-    ).order_by(models.BankTransaction.date.desc()).first()
-    balance = latest_balance[0] if latest_balance else 0
+    balance = totals["balance"]
 
     # 3. Calculate Ratios
-    total_assets = inventory + balance + 1000 # Adding a buffer for fixed assets
-    total_liabilities = expenses * 0.5 # Simplified ratio for demo
-    ebit = sales - expenses
-    
-    z_score = FinancialMetrics.calculate_altman_z_score(
-        working_capital=(balance + inventory - total_liabilities),
-        retained_earnings=(sales - expenses), # Approximation
-        ebit=ebit,
-        market_cap=(total_assets - total_liabilities), # Book value
-        total_liabilities=max(total_liabilities, 1),
-        total_assets=max(total_assets, 1)
-    )
-    
-    dscr = FinancialMetrics.calculate_dscr(net_operating_income=ebit, total_debt_service=expenses * 0.1)
+    ratios = FinancialMetrics.headline_ratios(sales, expenses, inventory, balance)
+    total_assets = ratios["total_assets"]
+    total_liabilities = ratios["total_liabilities"]
+    ebit = ratios["ebit"]
+    z_score = ratios["z_score"]
+    dscr = ratios["dscr"]
 
-    # 4. Forecast from Bank History
-    historical = db.query(models.BankTransaction.balance).filter(
-        models.BankTransaction.company_id == company.id
-    ).order_by(models.BankTransaction.date.asc()).all()
-    historical_values = [h[0] for h in historical] if historical else [0]
-    
-    forecast_vals = Forecaster.project_cash_flow(historical_values, months_ahead=3)
+    # 4. Forecast from the incrementally maintained monthly state (one row read)
+    forecast = await db.run_sync(ForecastStore.forecast, company.id, agg.latest_balance or 0, agg.data_version or 0, 3)
     
     # 5. Generate Dynamic AI Insights (LLM)
-    metrics_summary = {
-        "sales": int(sales),
-        "expenses": int(expenses),
-        "bank_balance": int(balance),
-        "z_score": round(z_score, 2),
-        "ebit": int(ebit),
-        "dscr": round(dscr, 2)
-    }
-    insights = await bookkeeper.generate_business_alerts(metrics_summary)
+    metrics_summary = FinancialMetrics.insight_summary(sales, expenses, balance, ratios)
+    insights, insights_job_id = await _business_insights(db, company, metrics_summary)
 
     # 5.1 Score Breakdown (XAI)
     score_factors = []
@@ -451,20 +629,12 @@ async def get_dashboard_metrics(
         score_factors.append({"text": "Operating Loss Detected", "impact": "negative"})
 
     # 6. Anomaly Detection (New)
-    txns = db.query(models.BankTransaction).filter(models.BankTransaction.company_id == company.id).all()
-    tx_list = [{"id": t.id, "amount": t.debit if t.debit > 0 else t.credit, "description": t.description} for t in txns]
-    anomalies = AnomalyDetector.detect_transaction_anomalies(tx_list)
+    anomalies = await execution.run_cpu(tasks.detect_anomalies, company.id, agg.data_version or 0, agg.bank_count or 0)
 
     inflow_total = sales
 
     # Calculate Cash Flow Intelligence
-    category_sums = db.query(
-        models.AccountingRecord.item_category, 
-        func.sum(models.AccountingRecord.amount)
-    ).filter(
-        models.AccountingRecord.company_id == company.id,
-        models.AccountingRecord.type == "EXPENSE"
-    ).group_by(models.AccountingRecord.item_category).all()
+    category_sums = sorted(totals["categories"].items())
 
     colors = ["#3b82f6", "#6366f1", "#8b5cf6", "#a855f7", "#d946ef", "#ec4899", "#f43f5e"]
     outflow_categories = []
@@ -480,28 +650,20 @@ async def get_dashboard_metrics(
     if not outflow_categories:
         outflow_categories = [{"name": "Operational", "value": int(expenses), "color": "#3b82f6"}]
 
-    total_outflow = sum(c['value'] for c in outflow_categories)
-    net_cash_flow = inflow_total - total_outflow
-    
-    # Burn Rate (Average monthly outflow - for demo assuming this is the monthly data)
-    burn_rate = total_outflow
-    survival_months = round(balance / burn_rate, 1) if burn_rate > 0 else 99
+    cash_flow = FinancialMetrics.cash_flow_summary(inflow_total, expenses, balance, totals["categories"])
+    total_outflow = cash_flow["outflow"]
+    net_cash_flow = cash_flow["net"]
+    burn_rate = cash_flow["burn_rate"]
+    survival_months = cash_flow["survival_months"]
     
     # Calculate if we have any data to show
-    has_bank = db.query(models.BankTransaction).filter(models.BankTransaction.company_id == company.id).first() is not None
-    has_accounting = db.query(models.AccountingRecord).filter(models.AccountingRecord.company_id == company.id).first() is not None
-    has_gst = db.query(models.GSTReturn).filter(models.GSTReturn.company_id == company.id).first() is not None
+    has_bank = agg.has_bank
+    has_accounting = agg.has_accounting
+    has_gst = agg.has_gst
     has_any_data = has_bank or has_accounting or has_gst
 
     # Calculate Score
-    z_val = z_score
-    if z_val >= 3:
-        display_score = 90 + min(z_val, 10)
-    elif z_val >= 1.8:
-        display_score = 60 + (z_val - 1.8) * 20
-    else:
-        display_score = max(z_val * 30, 10)
-    display_score = min(int(display_score), 100)
+    health_score = FinancialMetrics.health_score(z_score)
 
     working_capital = (balance + inventory - total_liabilities)
     retained_earnings = (sales - expenses)
@@ -516,7 +678,7 @@ async def get_dashboard_metrics(
     roadmap = LendingEngine.get_roadmap(lending_score)
 
     # 8. Industry & Savings (New)
-    industry_type = IndustryAnalyzer.identify_industry(company.legal_name, tx_list)
+    industry_type = await db.run_sync(IndustryStore.get, company.id, company.legal_name, agg.data_version or 0)
     comparison = IndustryAnalyzer.get_comparison(industry_type, {
         "net_margin": (ebit / sales) if sales > 0 else 0,
         "dscr": dscr,
@@ -551,11 +713,7 @@ async def get_dashboard_metrics(
 
     return {
         "has_any_data": has_any_data,
-        "health_score": {
-            "value": display_score, 
-            "label": "Strong" if display_score > 80 else "Good" if display_score > 50 else "Weak",
-            "color": "green" if display_score > 80 else "yellow" if display_score > 50 else "red"
-        },
+        "health_score": health_score,
         "lending": {
             "score": lending_score,
             "loans": eligible_loans,
@@ -586,176 +744,422 @@ async def get_dashboard_metrics(
             "retained_earnings": int(retained_earnings)
         },
         "forecast": {
-            "months": ["Next Month", "+2 Months", "+3 Months"],
-            "values": forecast_vals["mid"],
-            "upper": forecast_vals["upper"],
-            "lower": forecast_vals["lower"]
+            "months": forecast["forecast"]["periods"],
+            "values": forecast["forecast"]["balance"]["mid"],
+            "upper": forecast["forecast"]["balance"]["upper"],
+            "lower": forecast["forecast"]["balance"]["lower"],
+            "model": forecast["model"]
         },
         "score_factors": score_factors,
         "compliance": compliance,
         "insights": insights,
+        "insights_job_id": insights_job_id,
         "anomalies": anomalies
     }
 
+async def _cash_flow_forecast(db: AsyncSession, company_id: int, freq: str, horizon: int) -> dict:
+    """Buckets bank history in SQL, then fits and backtests the models in the process pool."""
+    history = await db.run_sync(lambda s: CashFlowHistory.load(s, company_id, freq))
+    last_balance = int(history["balance"][-1]) if len(history["balance"]) else 0
+    result = await execution.run_cpu(
+        Forecaster.forecast, history["inflow"] - history["outflow"], last_balance, freq, horizon
+    )
+    return forecast_response(result, freq, horizon, history=history)
+
+@app.get("/api/forecast")
+async def get_forecast(
+    freq: str = "month",
+    horizon: int = 6,
+    db: AsyncSession = Depends(database.get_async_db),
+    principal: auth.Principal = Depends(auth.get_current_company)
+):
+    """
+    Cash flow forecast over monthly or weekly buckets: history, the model chosen by
+    backtest (Holt-Winters, seasonal naive or linear trend) and projected balance band.
+    """
+    if freq not in SEASON_LENGTHS:
+        raise HTTPException(status_code=400, detail=f"freq must be one of {sorted(SEASON_LENGTHS)}")
+    if not 1 <= horizon <= FORECAST_MAX_HORIZON:
+        raise HTTPException(status_code=400, detail=f"horizon must be between 1 and {FORECAST_MAX_HORIZON}")
+    if principal.company_id is None:
+        raise HTTPException(status_code=400, detail="No company found for this user")
+
+    version = await db.run_sync(AggregateStore.data_version, principal.company_id)
+    cache_key = f"forecast:{principal.company_id}:{freq}:{horizon}:v{version}"
+    cached = snapshot_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = await _cash_flow_forecast(db, principal.company_id, freq, horizon)
+    snapshot_cache.set(cache_key, result)
+    return result
+
+class RunwayShock(BaseModel):
+    type: str # revenue_drop | expense_change | fixed_outflow
+    pct: float = 0.0 # revenue_drop / expense_change, e.g. 0.2 = 20%
+    amount: float = 0.0 # fixed_outflow: rupees per month (e.g. a loan EMI)
+    category: Optional[str] = None # expense_change: one expense category (e.g. "Rent") instead of all outflow
+    start_month: int = 1 # first forecast month affected
+    months: Optional[int] = None # default: through the horizon
+
+class RunwayScenario(BaseModel):
+    paths: int = 10000
+    horizon: int = 24
+    seed: int = 0
+    shocks: List[RunwayShock] = []
+
+async def _runway_simulation(db: AsyncSession, company_id: int, agg: models.CompanyAggregate, scenario: RunwayScenario) -> dict:
+    """Monthly bank history from SQL, then the Monte Carlo paths in the process pool."""
+    history = await db.run_sync(lambda s: CashFlowHistory.load(s, company_id, "month"))
+    shocks = [dict(shock.model_dump(), amount=paise(shock.amount)) for shock in scenario.shocks]
+    result = await execution.run_cpu(
+        RunwaySimulator.simulate, history["inflow"], history["outflow"], agg.latest_balance or 0,
+        scenario.horizon, scenario.paths, shocks, agg.expense_categories or {}, scenario.seed
+    )
+    return runway_response(result, history)
+
+@app.post("/api/forecast/runway")
+async def simulate_runway(
+    scenario: RunwayScenario,
+    db: AsyncSession = Depends(database.get_async_db),
+    principal: auth.Principal = Depends(auth.get_current_company)
+):
+    """
+    What-if cash runway: Monte Carlo paths of monthly inflow/outflow around the forecast
+    baseline (bootstrapped historical residuals) with revenue, expense and fixed-outflow
+    shocks. Returns runway percentiles and the probability of the balance going negative.
+    """
+    if not 1 <= scenario.paths <= RUNWAY_MAX_PATHS:
+        raise HTTPException(status_code=400, detail=f"paths must be between 1 and {RUNWAY_MAX_PATHS}")
+    if not 1 <= scenario.horizon <= RUNWAY_MAX_HORIZON:
+        raise HTTPException(status_code=400, detail=f"horizon must be between 1 and {RUNWAY_MAX_HORIZON}")
+    for shock in scenario.shocks:
+        if shock.type not in RunwaySimulator.SHOCK_TYPES:
+            raise HTTPException(status_code=400, detail=f"shock type must be one of {list(RunwaySimulator.SHOCK_TYPES)}")
+        if shock.start_month < 1 or (shock.months is not None and shock.months < 1):
+            raise HTTPException(status_code=400, detail="start_month and months must be at least 1")
+        if shock.pct < -1 or (shock.type == "revenue_drop" and shock.pct > 1) or shock.amount < 0:
+            raise HTTPException(status_code=400, detail="pct must be at least -1 (at most 1 for revenue_drop) and amount non-negative")
+    if principal.company_id is None:
+        raise HTTPException(status_code=400, detail="No company found for this user")
+
+    # Same scenario + same data version -> same (seeded) result, served from the snapshot cache
+    agg = await db.run_sync(AggregateStore.get, principal.company_id)
+    cache_key = scenario_key(principal.company_id, agg.data_version or 0, scenario.model_dump())
+    cached = snapshot_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    try:
+        result = await _runway_simulation(db, principal.company_id, agg, scenario)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    snapshot_cache.set(cache_key, result)
+    return result
+
+INSIGHTS_PENDING = ["AI insights are being generated and will appear shortly."]
+
+async def _business_insights(db: AsyncSession, company: models.Company, metrics_summary: dict):
+    """
+    LLM alerts without waiting on the LLM: alerts precomputed by the insights batch (or
+    cached) are used directly. If the data changed since, an insights job is queued and the
+    previous alerts (or placeholders) are returned with its id.
+    """
+    if not bookkeeper.llm_enabled:
+        return await bookkeeper.generate_business_alerts(company.id, metrics_summary), None
+    key = BookkeeperAgent.cache_key(company.id, metrics_summary)
+    stored = await db.run_sync(InsightStore.get, company.id)
+    if stored is not None and stored.metrics_key == key:
+        return stored.insights, None
+    if bookkeeper.cached_alerts(company.id, metrics_summary) is not None:
+        return await bookkeeper.generate_business_alerts(company.id, metrics_summary), None
+    job = await db.run_sync(JobQueue.enqueue, company.id, "insights", {}, None, key, 2)
+    job_worker.notify()
+    return (stored.insights if stored is not None and stored.insights else INSIGHTS_PENDING), job.id
+
+# --- Background job handlers (run by job_worker; see services/jobs.py) ---
+
+async def _upload_job(job) -> dict:
+    path = job.payload["path"]
+    size = max(os.path.getsize(path), 1)
+    def work():
+        db = database.SessionLocal()
+        try:
+            with open(path, "rb") as fileobj:
+                report = lambda rows: job.progress_sync(min(fileobj.tell() / size, 0.99), f"{rows} rows ingested")
+                return _ingest_upload(db, job.company_id, job.payload["kind"], fileobj, job.payload["filename"], report)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    # The spooled file is removed by JobQueue once the job succeeds or fails for good
+    rows = await execution.run_io(work)
+    return {"status": "success", "filename": job.payload["filename"], "total_rows": rows, "type": job.payload["kind"]}
+
+async def _report_job(job) -> JobResult:
+    principal = auth.Principal(user_id=job.user_id, company_id=job.company_id, is_active=True, email="")
+    async with database.get_async_sessionmaker()() as db:
+        await job.progress(0.1, "Collecting metrics")
+        path, filename, cached = await _render_report(db, principal, job.progress)
+    pdf_bytes = await execution.run_io(_read_file, path, not cached)
+    return JobResult({"filename": filename, "bytes": len(pdf_bytes)}, pdf_bytes, "application/pdf")
+
+def _read_file(path: str, remove: bool = False) -> bytes:
+    with open(path, "rb") as f:
+        data = f.read()
+    if remove:
+        os.remove(path)
+    return data
+
+async def _insights_job(job) -> dict:
+    return await insight_batch.run([job.company_id])
+
+async def _insights_batch_job(job) -> dict:
+    return await insight_batch.run(progress=job.progress)
+
+def build_job_worker() -> JobWorker:
+    worker = JobWorker(execution)
+    worker.register("upload", _upload_job)
+    worker.register("report", _report_job)
+    worker.register("insights", _insights_job)
+    worker.register("insights_batch", _insights_batch_job)
+    return worker
+
+job_worker = build_job_worker()
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    db: Session = Depends(database.get_db),
+    principal: auth.Principal = Depends(auth.get_current_company)
+):
+    job = await execution.run_io(JobQueue.get, db, job_id, principal.company_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    result = JobQueue.to_dict(job)
+    live = job_worker.live_progress(job_id)
+    if live is not None and job.status == "RUNNING":
+        result["progress"], result["message"] = round(live[0], 3), live[1]
+    return result
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(
+    job_id: str,
+    db: Session = Depends(database.get_db),
+    principal: auth.Principal = Depends(auth.get_current_company)
+):
+    job = await execution.run_io(JobQueue.get, db, job_id, principal.company_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "SUCCEEDED":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if job.result_data is not None:
+        from fastapi.responses import Response
+        filename = (job.result or {}).get("filename", f"{job.kind}_{job.id}")
+        return Response(
+            content=job.result_data,
+            media_type=job.result_type or "application/octet-stream",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+    return job.result
+
+@app.post("/api/report/jobs")
+async def queue_report(
+    db: Session = Depends(database.get_db),
+    principal: auth.Principal = Depends(auth.get_current_company)
+):
+    """Queues PDF generation; poll /api/jobs/{id} and fetch the PDF from /api/jobs/{id}/result."""
+    if principal.company_id is None:
+        raise HTTPException(status_code=400, detail="No company found for this user")
+    job = await execution.run_io(JobQueue.enqueue, db, principal.company_id, "report", {}, principal.user_id)
+    job_worker.notify()
+    return JSONResponse(status_code=202, content={"status": "queued", "job_id": job.id})
+
+def _report_transactions(db: Session, company_id: int, limit: int = REPORT_MAX_TRANSACTIONS) -> list:
+    """Latest `limit` bank rows, oldest first, as (date, description, debit, credit, balance)."""
+    rows = db.query(
+        models.BankTransaction.date, models.BankTransaction.description, models.BankTransaction.debit,
+        models.BankTransaction.credit, models.BankTransaction.balance
+    ).filter(models.BankTransaction.company_id == company_id).order_by(
+        models.BankTransaction.date.desc(), models.BankTransaction.id.desc()
+    ).limit(limit).all()
+    return [tuple(r) for r in reversed(rows)]
+
+async def _render_report(db: AsyncSession, principal: auth.Principal, progress=None):
+    """
+    Returns (path, filename, cached). Reports are cached on disk per company data version,
+    so a repeat download skips metrics and rendering; `cached` False means `path` is a
+    one-off file (placeholder insights) the caller must delete after sending.
+    """
+    user = await db.get(models.User, principal.user_id)
+    company = await db.get(models.Company, principal.company_id) if principal.company_id else None
+    company_name = company.legal_name if company else None
+    filename = f"Financial_Report_{company_name.replace(' ', '_') if company else 'SME'}.pdf"
+
+    # 1. Serve the rendered PDF for this data version if we have it
+    agg = await db.run_sync(AggregateStore.get, principal.company_id) if company else None
+    key = ReportCache.key(principal.company_id, agg.data_version or 0 if agg else 0, principal.user_id, company_name, user.full_name)
+    path = report_cache.get(key)
+    if path is not None:
+        report_stats.record(True)
+        return path, filename, True
+
+    # 2. Metrics (snapshot-cached) and the transaction appendix
+    metrics = await get_dashboard_metrics(db, principal)
+    transactions = await db.run_sync(_report_transactions, principal.company_id) if company else []
+    if progress:
+        await progress(0.5, "Rendering PDF")
+
+    # 3. Render in a worker process straight to disk; placeholder insights are not cached
+    cacheable = not metrics.get("insights_job_id")
+    path = report_cache.path(key) if cacheable else report_cache.scratch_path()
+    try:
+        render = await execution.run_cpu(
+            ReportRenderer.render_to_file, path, metrics, company_name, user.full_name,
+            transactions, agg.bank_count if agg else len(transactions)
+        )
+    except Exception:
+        report_stats.failed()
+        raise
+    report_stats.record(False, render)
+    if cacheable:
+        report_cache.prune()
+    return path, filename, cacheable
+
 @app.get("/api/report/download")
 async def download_report(
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(database.get_async_db),
+    principal: auth.Principal = Depends(auth.get_current_company)
 ):
     """
     Generates and returns a professional PDF financial health report.
     """
     try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-        from io import BytesIO
-        from fastapi.responses import StreamingResponse
-        
-        # 1. Get real data
-        metrics = await get_dashboard_metrics(db, current_user)
-        user = current_user
-        company = db.query(models.Company).filter(models.Company.user_id == user.id).first()
-        
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-
-        # Header
-        p.setFont("Helvetica-Bold", 26)
-        p.setFillColorRGB(0.06, 0.45, 0.35) # Emerald Green
-        p.drawString(50, height - 70, "Financial Health Summary")
-        
-        p.setFont("Helvetica-Bold", 14)
-        p.setFillColorRGB(0.2, 0.2, 0.2)
-        p.drawString(50, height - 95, f"Company: {company.legal_name if company else 'Valued Partner'}")
-        
-        p.setFont("Helvetica", 10)
-        p.setFillColorRGB(0.5, 0.5, 0.5)
-        p.drawString(50, height - 110, f"Analysis Date: 2026-02-04 | User: {user.full_name}")
-        p.setStrokeColorRGB(0.8, 0.8, 0.8)
-        p.line(50, height - 120, width - 50, height - 120)
-
-        # 1. Overall Health
-        p.setFont("Helvetica-Bold", 18)
-        p.setFillColorRGB(0.1, 0.1, 0.1)
-        p.drawString(50, height - 160, "1. Overall Business Safety")
-        
-        # Health Score Box
-        score = metrics['health_score']['value']
-        score_label = metrics['health_score']['label']
-        p.setStrokeColorRGB(0.9, 0.9, 0.9)
-        p.setFillColorRGB(0.95, 0.98, 0.96)
-        p.roundRect(50, height - 230, 200, 50, 10, fill=1)
-        
-        p.setFont("Helvetica-Bold", 24)
-        p.setFillColorRGB(0.06, 0.45, 0.35)
-        p.drawString(70, height - 215, f"{score}/100")
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(160, height - 212, f"[{score_label}]")
-        
-        p.setFont("Helvetica", 11)
-        p.setFillColorRGB(0.3, 0.3, 0.3)
-        desc = "Your business is currently in a safe and stable financial position." if score > 70 else "Your business shows some areas of risk that need attention."
-        p.drawString(270, height - 200, desc)
-
-        # 2. Simplified Financial Indicators
-        y_pos = height - 270
-        p.setFont("Helvetica-Bold", 18)
-        p.setFillColorRGB(0.1, 0.1, 0.1)
-        p.drawString(50, y_pos, "2. Key Performance Indicators")
-        
-        metrics_data = [
-            ("Business Safety (Solvency)", f"{metrics['ratios']['z_score']}", "Is your business safe from closing?"),
-            ("Debt Power (Repayment)", f"{metrics['ratios']['dscr']}", "Can you easily pay back loans?"),
-            ("Take-Home (Net Margin)", f"{int(metrics['ratios']['net_margin'] * 100)}%", "Money left after all expenses.")
-        ]
-        
-        y_pos -= 40
-        for title, val, sub in metrics_data:
-            p.setFont("Helvetica-Bold", 12)
-            p.setFillColorRGB(0.2, 0.2, 0.2)
-            p.drawString(70, y_pos, title)
-            
-            p.setFont("Helvetica-Bold", 14)
-            p.setFillColorRGB(0.06, 0.45, 0.35)
-            p.drawRightString(width - 70, y_pos, val)
-            
-            p.setFont("Helvetica-Oblique", 9)
-            p.setFillColorRGB(0.5, 0.5, 0.5)
-            p.drawString(70, y_pos - 12, sub)
-            y_pos -= 40
-
-        # 3. AI Insights
-        y_pos -= 30
-        p.setFont("Helvetica-Bold", 18)
-        p.setFillColorRGB(0.1, 0.1, 0.1)
-        p.drawString(50, y_pos, "3. AI Business Advice")
-        
-        y_pos -= 30
-        p.setFont("Helvetica", 11)
-        p.setFillColorRGB(0.2, 0.2, 0.2)
-        for insight in metrics['insights'][:5]: # Show top 5
-            p.drawString(70, y_pos, f"> {insight}")
-            y_pos -= 25
-
-        # 4. Cash Flow Pulse
-        y_pos -= 30
-        p.setFont("Helvetica-Bold", 18)
-        p.setFillColorRGB(0.1, 0.1, 0.1)
-        p.drawString(50, y_pos, "4. Cash Flow Pulse")
-        
-        y_pos -= 30
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(70, y_pos, f"Monthly Surplus: Rs. {metrics['cash_flow']['net']:,}")
-        y_pos -= 20
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(70, y_pos, f"Survival Clock: {metrics['cash_flow']['survival_months']} Months")
-        p.setFont("Helvetica", 10)
-        p.drawString(70, y_pos - 15, "How long you can survive if revenue stops today.")
-
-        # Footer
-        p.setFont("Helvetica-Oblique", 9)
-        p.setFillColorRGB(0.6, 0.6, 0.6)
-        p.drawString(50, 40, "Generated by Financial Health AI Engine - Confidential and Secure")
-        p.drawRightString(width - 50, 40, "Page 1 of 1")
-        
-        p.showPage()
-        p.save()
-        
-        buffer.seek(0)
-        filename = f"Financial_Report_{company.legal_name.replace(' ', '_') if company else 'SME'}.pdf"
+        # 1. Cached or freshly rendered (off the event loop) PDF on disk
+        path, filename, cached = await _render_report(db, principal)
+
+        # 2. Stream it back in chunks
         return StreamingResponse(
-            buffer, 
-            media_type="application/pdf", 
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+            ReportCache.iter_file(path, remove=not cached),
+            media_type="application/pdf",
+            headers={
+                "Content-Disposition": f"attachment; filename={filename}",
+                "Content-Length": str(os.path.getsize(path))
+            }
         )
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"PDF Generation Error: {str(e)}")
 
+class ReportExportRequest(BaseModel):
+    company_ids: Optional[List[int]] = None # default: every company, up to `limit`
+    limit: int = 100
+    max_transactions: int = REPORT_EXPORT_TRANSACTIONS
+
+@app.post("/api/admin/reports/export")
+async def export_reports(
+    request: ReportExportRequest,
+    db: Session = Depends(database.get_db),
+    principal: auth.Principal = Depends(auth.get_admin_principal)
+):
+    """
+    Admin: financial health PDFs for many companies, rendered in parallel worker processes
+    and streamed back as one ZIP (with manifest.json) while they finish.
+    """
+    limit = max(1, min(request.limit, REPORT_EXPORT_MAX_COMPANIES))
+    company_ids = request.company_ids[:limit] if request.company_ids else \
+        await execution.run_io(PortfolioLoader.company_ids, db, limit)
+    if not company_ids:
+        raise HTTPException(status_code=404, detail="No companies to export")
+    filename = f"financial_reports_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        report_exporter.stream(company_ids, max(0, min(request.max_transactions, REPORT_MAX_TRANSACTIONS))),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+SCORE_SORT_COLUMNS = {"credit_score", "health_score", "z_score", "dscr", "net_margin"}
+
+def _score_portfolio(db: Session):
+    """Every company's lifetime aggregates as columns, scored in one vectorized pass."""
+    import pandas as pd
+    start = time.perf_counter()
+    stmt = select(
+        models.CompanyAggregate.company_id,
+        models.Company.legal_name,
+        models.CompanyAggregate.total_sales.label("sales"),
+        models.CompanyAggregate.total_expenses.label("expenses"),
+        models.CompanyAggregate.total_inventory.label("inventory"),
+        models.CompanyAggregate.latest_balance.label("balance")
+    ).join(models.Company, models.Company.id == models.CompanyAggregate.company_id).where(
+        models.CompanyAggregate.period == "ALL"
+    )
+    frame = pd.read_sql(stmt, db.connection())
+    columns = list(PortfolioScorer.COLUMNS)
+    frame[columns] = rupees(frame[columns].fillna(0))
+    loaded = time.perf_counter()
+    scored = PortfolioScorer.score(frame)
+    timing = {"load_seconds": round(loaded - start, 3), "score_seconds": round(time.perf_counter() - loaded, 3)}
+    return scored, timing
+
+@app.get("/api/admin/portfolio/scores")
+async def portfolio_scores(
+    min_credit_score: int = 300,
+    max_credit_score: int = 900,
+    label: Optional[str] = None,
+    sort: str = "credit_score",
+    descending: bool = True,
+    limit: int = 100,
+    format: str = "json",
+    db: Session = Depends(database.get_db),
+    principal: auth.Principal = Depends(auth.get_admin_principal)
+):
+    """
+    Admin / lender screening: Z-score, DSCR, net margin, credit score and health label for
+    every company, filtered by credit-score band and label. format=csv returns all matches.
+    """
+    if sort not in SCORE_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {sorted(SCORE_SORT_COLUMNS)}")
+    scored, timing = await execution.run_io(_score_portfolio, db)
+
+    matches = scored[(scored["credit_score"] >= min_credit_score) & (scored["credit_score"] <= max_credit_score)]
+    if label:
+        matches = matches[matches["health_label"].str.lower() == label.lower()]
+    matches = matches.sort_values(sort, ascending=not descending, kind="stable")
+
+    if format == "csv":
+        return StreamingResponse(
+            iter([matches.to_csv(index=False)]),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=portfolio_scores.csv"}
+        )
+    return {
+        "summary": PortfolioScorer.summary(scored),
+        "matched": int(len(matches)),
+        "timing": timing,
+        "companies": matches.head(max(0, min(limit, 10000))).to_dict(orient="records")
+    }
+
 @app.get("/api/notifications")
 async def get_notifications(
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(database.get_async_db),
+    principal: auth.Principal = Depends(auth.get_current_company)
 ):
     """
     Returns tax and compliance reminders + dynamic risks.
     """
     # Get anomalies for the user's company
-    company = db.query(models.Company).filter(models.Company.user_id == current_user.id).first()
     dynamic_notifs = []
-    if company:
-        txns = db.query(models.BankTransaction).filter(models.BankTransaction.company_id == company.id).all()
-        tx_list = [{"id": t.id, "amount": t.debit if t.debit > 0 else t.credit, "description": t.description} for t in txns]
-        anomalies = AnomalyDetector.detect_transaction_anomalies(tx_list)
+    if principal.company_id is not None:
+        agg = await db.run_sync(AggregateStore.get, principal.company_id)
+        anomalies = await execution.run_cpu(tasks.detect_anomalies, principal.company_id, agg.data_version or 0, agg.bank_count or 0)
         for a in anomalies:
             dynamic_notifs.append({
                 "id": f"anomaly-{a['id']}",
                 "title": "Financial Risk Detected",
                 "date": "Today",
                 "priority": "high",
-                "message": f"Unusual spend of ₹{a['amount']:,} on '{a['description']}'. This differs from your usual patterns."
+                "message": f"Unusual spend of ₹{a['amount']:,.2f} on '{a['description']}'. This differs from your usual patterns."
             })
 
     static_notifs = [
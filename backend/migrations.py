@@ -0,0 +1,116 @@
+"""
+Minimal forward-only schema migrations.
+
+create_all() only creates missing tables, so anything that changes an existing table
+(new indexes, columns, data rewrites) goes here. Each migration runs once, in order,
+inside one startup transaction, and is recorded in schema_migrations.
+Run automatically at API startup, or by hand: python migrations.py
+"""
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table, inspect, select, text
+import models, database
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("id", String, primary_key=True),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+# Indexes as each migration created them. Migrations list their own indexes instead of
+# reading the current models: replaying 0001 on an old database must not try to build an
+# index over a column that only a later migration adds.
+_index_meta = MetaData()
+
+def _index(name: str, table: str, *columns: str, unique: bool = False) -> Index:
+    if table not in _index_meta.tables:
+        Table(table, _index_meta)
+    table = _index_meta.tables[table]
+    for column in columns:
+        if column not in table.c:
+            table.append_column(Column(column))
+    return Index(name, *[table.c[c] for c in columns], unique=unique)
+
+M0001_INDEXES = [
+    _index("ix_companies_user_id", "companies", "user_id"),
+    _index("ix_bank_transactions_company_date", "bank_transactions", "company_id", "date"),
+    _index("ix_bank_transactions_company_id_id", "bank_transactions", "company_id", "id"),
+    _index("ix_accounting_records_company_type_category", "accounting_records", "company_id", "type", "item_category"),
+    _index("ix_gst_returns_company_id", "gst_returns", "company_id"),
+]
+M0003_INDEXES = [_index("ux_bank_transactions_company_external_id", "bank_transactions", "company_id", "external_id", unique=True)]
+M0004_INDEXES = [_index("ix_companies_setu_consent_id", "companies", "setu_consent_id")]
+
+def _create_missing_indexes(conn, indexes):
+    for index in indexes:
+        index.create(bind=conn, checkfirst=True)
+
+def m0001_hot_query_indexes(conn):
+    _create_missing_indexes(conn, M0001_INDEXES)
+
+def m0002_company_aggregates_data_version(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("company_aggregates")}
+    if "data_version" not in columns:
+        conn.execute(text("ALTER TABLE company_aggregates ADD COLUMN data_version INTEGER DEFAULT 0"))
+
+def m0003_bank_transactions_external_id(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("bank_transactions")}
+    if "external_id" not in columns:
+        conn.execute(text("ALTER TABLE bank_transactions ADD COLUMN external_id VARCHAR"))
+    _create_missing_indexes(conn, M0003_INDEXES)
+
+def m0004_companies_setu_consent_index(conn):
+    _create_missing_indexes(conn, M0004_INDEXES)
+
+MONEY_COLUMNS = {
+    "bank_transactions": ["debit", "credit", "balance"],
+    "accounting_records": ["unit_cost", "amount"],
+    "gst_returns": ["total_sales", "total_tax_paid"],
+    "company_aggregates": ["total_sales", "total_expenses", "total_inventory", "bank_inflow", "bank_outflow", "latest_balance"],
+}
+
+def m0005_money_in_paise(conn):
+    """Whole-rupee amounts -> BIGINT paise (money.Money); bumps data versions so cached output is rebuilt."""
+    if conn.dialect.name == "postgresql":
+        for table, columns in MONEY_COLUMNS.items():
+            conn.execute(text(f"ALTER TABLE {table} " + ", ".join(f"ALTER COLUMN {c} TYPE BIGINT" for c in columns)))
+    for table, columns in MONEY_COLUMNS.items():
+        conn.execute(text(f"UPDATE {table} SET " + ", ".join(f"{c} = {c} * 100" for c in columns)))
+
+    aggregates = models.CompanyAggregate.__table__
+    for row_id, categories in conn.execute(select(aggregates.c.id, aggregates.c.expense_categories)).all():
+        if categories:
+            conn.execute(aggregates.update().where(aggregates.c.id == row_id).values(
+                expense_categories={k: int(v) * 100 for k, v in categories.items()}
+            ))
+    conn.execute(text("UPDATE company_aggregates SET data_version = COALESCE(data_version, 0) + 1 WHERE period = 'ALL'"))
+
+MIGRATIONS = [
+    ("0001_hot_query_indexes", m0001_hot_query_indexes),
+    ("0002_company_aggregates_data_version", m0002_company_aggregates_data_version),
+    ("0003_bank_transactions_external_id", m0003_bank_transactions_external_id),
+    ("0004_companies_setu_consent_index", m0004_companies_setu_consent_index),
+    ("0005_money_in_paise", m0005_money_in_paise),
+]
+
+def run_migrations(engine=None) -> list:
+    """Applies pending migrations. Returns the ids that were applied."""
+    engine = engine or database.engine
+    _meta.create_all(bind=engine)
+    applied = []
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Serialize concurrent workers starting at the same time
+            conn.execute(text("SELECT pg_advisory_xact_lock(727274)"))
+        done = set(conn.execute(select(schema_migrations.c.id)).scalars())
+        for migration_id, migrate in MIGRATIONS:
+            if migration_id in done:
+                continue
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(id=migration_id, applied_at=datetime.utcnow()))
+            applied.append(migration_id)
+    return applied
+
+if __name__ == "__main__":
+    models.Base.metadata.create_all(bind=database.engine)
+    print("Applied:", run_migrations() or "nothing (up to date)")
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Boolean, DateTime, ForeignKey, JSON, LargeBinary, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
+from money import Money
 
 class User(Base):
     __tablename__ = "users"
@@ -17,6 +18,10 @@ class User(Base):
 
 class Company(Base):
     __tablename__ = "companies"
+    __table_args__ = (
+        Index("ix_companies_user_id", "user_id"),
+        Index("ix_companies_setu_consent_id", "setu_consent_id"), # webhook lookups
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
@@ -35,19 +40,26 @@ class Company(Base):
 
 class BankTransaction(Base):
     __tablename__ = "bank_transactions"
+    __table_args__ = (
+        Index("ix_bank_transactions_company_date", "company_id", "date"), # latest balance, history
+        Index("ix_bank_transactions_company_id_id", "company_id", "id"), # incremental anomaly scoring
+        Index("ux_bank_transactions_company_external_id", "company_id", "external_id", unique=True), # AA dedupe
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"))
     date = Column(DateTime)
     description = Column(String)
-    debit = Column(Integer, default=0)
-    credit = Column(Integer, default=0)
-    balance = Column(Integer, default=0)
+    debit = Column(Money, default=0)
+    credit = Column(Money, default=0)
+    balance = Column(Money, default=0)
+    external_id = Column(String, nullable=True) # natural key for AA-fetched rows; NULL for uploads
 
     company = relationship("Company", back_populates="bank_transactions")
 
 class AccountingRecord(Base):
     __tablename__ = "accounting_records"
+    __table_args__ = (Index("ix_accounting_records_company_type_category", "company_id", "type", "item_category"),)
 
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"))
@@ -57,8 +69,8 @@ class AccountingRecord(Base):
     name = Column(String)
     item_category = Column(String)
     qty = Column(Integer)
-    unit_cost = Column(Integer)
-    amount = Column(Integer)
+    unit_cost = Column(Money)
+    amount = Column(Money)
     status = Column(String)
     due_date = Column(DateTime)
 
@@ -66,13 +78,128 @@ class AccountingRecord(Base):
 
 class GSTReturn(Base):
     __tablename__ = "gst_returns"
+    __table_args__ = (Index("ix_gst_returns_company_id", "company_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"))
     return_period = Column(String) # e.g., "Jan 2025"
-    total_sales = Column(Integer, default=0)
-    total_tax_paid = Column(Integer, default=0)
+    total_sales = Column(Money, default=0)
+    total_tax_paid = Column(Money, default=0)
     status = Column(String) # "Filed", "Pending"
     filing_date = Column(DateTime)
 
     company = relationship("Company", back_populates="gst_returns")
+
+class CompanyAggregate(Base):
+    """
+    Materialized running totals per company, maintained incrementally on ingest/delete.
+    period is "ALL" for the lifetime rollup or "YYYY-MM" for a calendar month. Amounts are paise.
+    """
+    __tablename__ = "company_aggregates"
+    __table_args__ = (UniqueConstraint("company_id", "period", name="uq_company_aggregates_company_period"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    period = Column(String, nullable=False, default="ALL")
+    total_sales = Column(Money, default=0)
+    total_expenses = Column(Money, default=0)
+    total_inventory = Column(Money, default=0)
+    expense_categories = Column(JSON, default=dict) # {item_category: sum(amount)} in paise
+    bank_inflow = Column(Money, default=0)
+    bank_outflow = Column(Money, default=0)
+    latest_balance = Column(Money, default=0)
+    latest_balance_date = Column(DateTime, nullable=True)
+    bank_count = Column(Integer, default=0)
+    accounting_count = Column(Integer, default=0)
+    gst_count = Column(Integer, default=0)
+    data_version = Column(Integer, default=0) # Bumped on every ingest/delete (ALL row); cache key component
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    @property
+    def has_bank(self):
+        return (self.bank_count or 0) > 0
+
+    @property
+    def has_accounting(self):
+        return (self.accounting_count or 0) > 0
+
+    @property
+    def has_gst(self):
+        return (self.gst_count or 0) > 0
+
+class Job(Base):
+    """
+    Background work item (upload ingest, report render, LLM insights), see services/jobs.py.
+    status: QUEUED -> RUNNING -> SUCCEEDED | FAILED (retries go back to QUEUED with a later run_after).
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"), # worker claim scan
+        Index("ix_jobs_company_status", "company_id", "status"), # per-company concurrency, dedupe
+    )
+
+    id = Column(String, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    kind = Column(String, nullable=False)
+    dedupe_key = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="QUEUED")
+    payload = Column(JSON, default=dict)
+    result = Column(JSON, nullable=True)
+    result_data = Column(LargeBinary, nullable=True) # binary output, e.g. a rendered PDF
+    result_type = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    progress = Column(Float, default=0.0)
+    progress_message = Column(String, nullable=True)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, nullable=True)
+    locked_by = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class CompanyInsight(Base):
+    """
+    Latest precomputed LLM alerts per company, written by the insights batch (services/insights.py).
+    data_version is the aggregate version the alerts were generated from; metrics_key is
+    BookkeeperAgent.cache_key of the metrics sent to the LLM.
+    """
+    __tablename__ = "company_insights"
+
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False, unique=True)
+    data_version = Column(Integer, default=0)
+    metrics_key = Column(String, nullable=False)
+    metrics = Column(JSON, default=dict)
+    insights = Column(JSON, default=list)
+    generated_at = Column(DateTime, nullable=True)
+
+class ForecastState(Base):
+    """
+    Incremental monthly cash flow forecast per company (services.forecast.ForecastStore).
+    Ingest folds new months into the running regression sums and the current bucket;
+    `state` holds the fitted model's online state. A back-dated upload or a delete sets
+    stale (as does a data_version behind the company's), and the next read reloads the
+    bucketed history and refits.
+    """
+    __tablename__ = "forecast_states"
+
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False, unique=True)
+    freq = Column(String, nullable=False, default="month")
+    last_period = Column(String, nullable=True) # "YYYY-MM" of the current (latest) bucket
+    n = Column(Integer, default=0)
+    sum_x = Column(Float, default=0.0)
+    sum_y = Column(Float, default=0.0)
+    sum_xy = Column(Float, default=0.0)
+    sum_xx = Column(Float, default=0.0)
+    sum_yy = Column(Float, default=0.0)
+    last_value = Column(Money, default=0) # current bucket's net flow
+    state = Column(JSON, default=dict)
+    data_version = Column(Integer, default=0) # company data version the state reflects
+    stale = Column(Boolean, default=False)
+    buckets_since_fit = Column(Integer, default=0)
+    fitted_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
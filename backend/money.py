@@ -0,0 +1,60 @@
+"""
+Fixed-point money: every amount is an integer number of paise (1 rupee = 100 paise).
+
+Amount columns are BIGINT paise in the database and plain ints / int64 NumPy arrays in
+the ORM, ingestion frames and company_aggregates, so sums are exact and never pass
+through floats. Rupees only appear at the edges: parsing uploaded values (to_paise)
+and handing figures to the ratio engines, API responses and reports (rupees).
+"""
+import numbers
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+PAISE_PER_RUPEE = 100
+
+class Money(TypeDecorator):
+    """BIGINT column holding paise. Rejects floats/Decimals so rupee values can't slip in unscaled."""
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or type(value) is int:
+            return value
+        if isinstance(value, numbers.Integral):
+            return int(value)
+        raise TypeError(f"Money columns take integer paise, got {type(value).__name__} {value!r} (use money.to_paise)")
+
+    @property
+    def python_type(self):
+        return int
+
+def to_paise(values) -> np.ndarray:
+    """
+    Rupee amounts (numbers or numeric strings, any array-like) -> int64 paise, rounded
+    half away from zero. Anything unparseable becomes 0.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    amounts = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan, copy=True)
+    amounts[~np.isfinite(amounts)] = 0
+    # float64 holds 2-decimal rupee values to well under half a paisa up to ~10^13 rupees
+    scaled = amounts * PAISE_PER_RUPEE
+    return (np.sign(scaled) * np.floor(np.abs(scaled) + 0.5)).astype(np.int64)
+
+def paise(value) -> int:
+    """Scalar to_paise."""
+    return int(to_paise([value])[0])
+
+def rupees(value):
+    """Paise -> rupees for the engines and display. Works on ints, NumPy arrays and pandas objects."""
+    if value is None:
+        return 0.0
+    return value / PAISE_PER_RUPEE
+
+def format_rupees(value: int) -> str:
+    """Paise -> '1,234.50' without a float round trip (report tables)."""
+    value = int(value)
+    sign = "-" if value < 0 else ""
+    whole, fraction = divmod(abs(value), PAISE_PER_RUPEE)
+    return f"{sign}{whole:,}.{fraction:02d}"
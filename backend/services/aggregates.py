@@ -0,0 +1,248 @@
+import pandas as pd
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import models
+from money import rupees
+from services.forecast import ForecastStore
+from services.transactions import IndustryStore
+
+ALL_PERIODS = "ALL"
+
+# Columns each upload type contributes to the aggregates (matches BulkIngestor frames)
+SOURCE_COLUMNS = {
+    "bank": (models.BankTransaction, ["date", "debit", "credit", "balance"]),
+    "accounting": (models.AccountingRecord, ["date", "type", "item_category", "amount"]),
+    "gst": (models.GSTReturn, ["filing_date"]),
+}
+
+class AggregateStore:
+    """
+    Maintains the company_aggregates table: one lifetime ("ALL") row plus one row per
+    calendar month, updated from ingested/deleted frames instead of rescanning history.
+    All sums are int64 paise; totals() converts a row to rupees for the engines.
+    """
+
+    @staticmethod
+    def get(db: Session, company_id: int, period: str = ALL_PERIODS) -> models.CompanyAggregate:
+        """
+        Returns the aggregate row (None for a month with no data), backfilling from the
+        base tables the first time. The backfill only writes if the company still has no
+        aggregates; if a concurrent ingest or reader materialized them first, theirs is kept.
+        """
+        query = db.query(models.CompanyAggregate).filter(
+            models.CompanyAggregate.company_id == company_id,
+            models.CompanyAggregate.period == period
+        )
+        row = query.first()
+        if row is None and period == ALL_PERIODS:
+            try:
+                AggregateStore.rebuild(db, company_id, seen=0) # 0: no ALL row yet
+                db.commit()
+            except IntegrityError:
+                db.rollback() # lost the race to insert the ALL row
+            row = query.first()
+        return row
+
+    @staticmethod
+    def totals(agg: models.CompanyAggregate) -> dict:
+        """Rupee figures from an aggregate row, as the ratio engines and API responses expect."""
+        return {
+            "sales": rupees(agg.total_sales or 0),
+            "expenses": rupees(agg.total_expenses or 0),
+            "inventory": rupees(agg.total_inventory or 0),
+            "balance": rupees(agg.latest_balance or 0),
+            "inflow": rupees(agg.bank_inflow or 0),
+            "outflow": rupees(agg.bank_outflow or 0),
+            "categories": {k: rupees(v) for k, v in (agg.expense_categories or {}).items()}
+        }
+
+    @staticmethod
+    def data_version(db: Session, company_id: int) -> int:
+        return AggregateStore.get(db, company_id).data_version or 0
+
+    @staticmethod
+    def apply(db: Session, company_id: int, kind: str, frame: pd.DataFrame, sign: int = 1):
+        """
+        Adds (sign=1) or subtracts (sign=-1) a frame of bank/accounting/gst rows.
+        For deletes, call this after the rows are gone so a latest-balance re-probe sees the new state.
+        The caller owns the commit, so aggregates land in the same transaction as the data.
+        """
+        if kind not in SOURCE_COLUMNS or frame.empty:
+            return
+        summaries = AggregateStore._summarize(kind, frame)
+
+        rows = {r.period: r for r in db.query(models.CompanyAggregate).filter(
+            models.CompanyAggregate.company_id == company_id,
+            models.CompanyAggregate.period.in_(list(summaries.keys()))
+        ).with_for_update()}
+        if ALL_PERIODS not in rows:
+            # First touch for this company: materialize from the base tables, which
+            # already include this frame's rows in the current transaction.
+            AggregateStore.rebuild(db, company_id)
+            return
+
+        for period, summary in summaries.items():
+            row = rows.get(period)
+            if row is None:
+                row = AggregateStore._empty_row(company_id, period)
+                db.add(row)
+            AggregateStore._merge(db, row, summary, sign)
+        previous = rows[ALL_PERIODS].data_version or 0
+        rows[ALL_PERIODS].data_version = previous + 1
+        if kind == "bank":
+            deltas = {p: sign * (s["bank_inflow"] - s["bank_outflow"]) for p, s in summaries.items() if p != ALL_PERIODS}
+            ForecastStore.apply(db, company_id, deltas, rows[ALL_PERIODS].data_version, sign)
+            IndustryStore.reset(db, company_id)
+        else:
+            ForecastStore.advance(db, company_id, previous, rows[ALL_PERIODS].data_version)
+        db.flush()
+
+    @staticmethod
+    def delete_rows(db: Session, company_id: int, kind: str, *criteria) -> int:
+        """
+        Deletes a company's bank/accounting/gst rows (optionally narrowed by extra filter
+        criteria) and subtracts them from the aggregates. Returns the number of rows removed.
+        """
+        model, columns = SOURCE_COLUMNS[kind]
+        where = [model.company_id == company_id, *criteria]
+        frame = pd.read_sql(select(*[getattr(model, c) for c in columns]).where(*where), db.connection())
+        if frame.empty:
+            return 0
+
+        db.query(model).filter(*where).delete(synchronize_session=False)
+        numeric = [c for c in ("debit", "credit", "balance", "amount") if c in frame.columns]
+        frame[numeric] = frame[numeric].fillna(0).astype("int64")
+        AggregateStore.apply(db, company_id, kind, frame, sign=-1)
+        return len(frame)
+
+    @staticmethod
+    def rebuild(db: Session, company_id: int, chunk_rows: int = 50000, seen: int = None) -> bool:
+        """
+        Recomputes all aggregate rows for a company from the base tables.
+        `seen`: the ALL row's data_version the caller read (0 if it had none). When given,
+        the rebuild only writes while the version is still `seen`: an existing ALL row is
+        claimed with UPDATE ... WHERE data_version = :seen (False, nothing written, if a
+        concurrent ingest moved it on), and a first ALL row is inserted before anything
+        else, so a concurrent first build makes the flush raise IntegrityError.
+        """
+        aggregate = models.CompanyAggregate
+        is_all = (aggregate.company_id == company_id, aggregate.period == ALL_PERIODS)
+        previous = db.query(aggregate.data_version).filter(*is_all).scalar()
+        # Keep the data version moving forward so snapshots keyed on it stay invalid
+        version = (previous or 0) + 1
+        if seen is not None and previous is not None:
+            claimed = db.execute(update(aggregate).where(*is_all, aggregate.data_version == seen).values(data_version=version))
+            if claimed.rowcount == 0:
+                return False
+        if seen is None or previous is not None:
+            db.query(aggregate).filter(aggregate.company_id == company_id).delete(synchronize_session="fetch")
+        ForecastStore.invalidate(db, company_id)
+        all_row = AggregateStore._empty_row(company_id, ALL_PERIODS)
+        all_row.data_version = version
+        db.add(all_row)
+        db.flush()
+
+        for kind, (model, columns) in SOURCE_COLUMNS.items():
+            stmt = select(*[getattr(model, c) for c in columns]).where(model.company_id == company_id)
+            for chunk in pd.read_sql(stmt, db.connection(), chunksize=chunk_rows):
+                if "filing_date" in chunk.columns:
+                    chunk = chunk.rename(columns={"filing_date": "date"})
+                chunk["date"] = pd.to_datetime(chunk["date"], errors="coerce")
+                numeric = [c for c in ("debit", "credit", "balance", "amount") if c in chunk.columns]
+                chunk[numeric] = chunk[numeric].fillna(0).astype("int64")
+                AggregateStore.apply(db, company_id, kind, chunk)
+        return True
+
+    # --- Internals ---
+
+    @staticmethod
+    def _empty_row(company_id: int, period: str) -> models.CompanyAggregate:
+        return models.CompanyAggregate(
+            company_id=company_id, period=period,
+            total_sales=0, total_expenses=0, total_inventory=0, expense_categories={},
+            bank_inflow=0, bank_outflow=0, latest_balance=0, latest_balance_date=None,
+            bank_count=0, accounting_count=0, gst_count=0, data_version=0
+        )
+
+    @staticmethod
+    def _summarize(kind: str, frame: pd.DataFrame) -> dict:
+        """Vectorized per-period deltas for one frame: {period: {field: value}}."""
+        date_col = "filing_date" if kind == "gst" and "filing_date" in frame.columns else "date"
+        dates = pd.to_datetime(frame[date_col], errors="coerce")
+        periods = dates.dt.strftime("%Y-%m")
+        frame = frame.assign(_date=dates, _period=periods)
+
+        groups = [(ALL_PERIODS, frame)]
+        groups += [(p, g) for p, g in frame.dropna(subset=["_period"]).groupby("_period", sort=False)]
+
+        summaries = {}
+        for period, g in groups:
+            s = {}
+            if kind == "bank":
+                s["bank_count"] = len(g)
+                s["bank_inflow"] = int(g["credit"].sum())
+                s["bank_outflow"] = int(g["debit"].sum())
+                dated = g["_date"].notna().to_numpy()
+                if dated.any():
+                    latest = g["_date"].idxmax()
+                    s["latest"] = (int(g.at[latest, "balance"]), g.at[latest, "_date"].to_pydatetime())
+                else:
+                    s["latest"] = (int(g["balance"].iloc[-1]), None)
+            elif kind == "accounting":
+                s["accounting_count"] = len(g)
+                by_type = g.groupby("type")["amount"].sum()
+                s["total_sales"] = int(by_type.get("SALE", 0))
+                s["total_expenses"] = int(by_type.get("EXPENSE", 0))
+                s["total_inventory"] = int(by_type.get("INVENTORY", 0))
+                expenses = g[g["type"] == "EXPENSE"]
+                if len(expenses):
+                    categories = expenses["item_category"].fillna("").astype(str)
+                    s["categories"] = {k: int(v) for k, v in expenses["amount"].groupby(categories.to_numpy()).sum().items()}
+            elif kind == "gst":
+                s["gst_count"] = len(g)
+            summaries[period] = s
+        return summaries
+
+    @staticmethod
+    def _merge(db: Session, row: models.CompanyAggregate, summary: dict, sign: int):
+        for field in ("bank_count", "accounting_count", "gst_count", "total_sales",
+                      "total_expenses", "total_inventory", "bank_inflow", "bank_outflow"):
+            if field in summary:
+                setattr(row, field, (getattr(row, field) or 0) + sign * summary[field])
+
+        if "categories" in summary:
+            categories = dict(row.expense_categories or {})
+            for name, value in summary["categories"].items():
+                categories[name] = categories.get(name, 0) + sign * value
+                if sign < 0 and categories[name] == 0:
+                    del categories[name]
+            row.expense_categories = categories
+
+        if "latest" in summary:
+            balance, date = summary["latest"]
+            if sign > 0:
+                newer = date is not None and (row.latest_balance_date is None or date >= row.latest_balance_date)
+                if newer or (date is None and row.latest_balance_date is None):
+                    row.latest_balance, row.latest_balance_date = balance, date
+            elif row.bank_count <= 0:
+                row.latest_balance, row.latest_balance_date = 0, None
+            elif date is None or row.latest_balance_date is None or date >= row.latest_balance_date:
+                # The deleted rows may have held the latest balance; re-probe that one value
+                AggregateStore._reload_latest(db, row)
+
+    @staticmethod
+    def _reload_latest(db: Session, row: models.CompanyAggregate):
+        query = db.query(models.BankTransaction.balance, models.BankTransaction.date).filter(
+            models.BankTransaction.company_id == row.company_id,
+            models.BankTransaction.date.isnot(None)
+        )
+        if row.period != ALL_PERIODS:
+            start = pd.Timestamp(f"{row.period}-01")
+            query = query.filter(
+                models.BankTransaction.date >= start.to_pydatetime(),
+                models.BankTransaction.date < (start + pd.offsets.MonthBegin(1)).to_pydatetime()
+            )
+        latest = query.order_by(models.BankTransaction.date.desc()).first()
+        row.latest_balance = int(latest[0] or 0) if latest else 0
+        row.latest_balance_date = latest[1] if latest else None
@@ -1,60 +1,95 @@
 from openai import AsyncOpenAI
+import hashlib
+import json
+import math
 import os
-import time
 from typing import List, Dict
+from services.cache import RevalidatingCache
+
+FALLBACK_ALERTS = ["Review operational overhead for potential savings."]
 
 class BookkeeperAgent:
     def __init__(self):
         self.api_key = os.getenv("OPENAI_API_KEY")
-        self.client = AsyncOpenAI(api_key=self.api_key) if self.api_key else None
-        self._cache = {} # Simple in-memory cache
+        self.base_url = os.getenv("OPENAI_BASE_URL") or None # any OpenAI-compatible server, e.g. tools/stub_openai_server.py
+        self.model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+        self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url) if self.api_key else None
+        # Bounded LRU/TTL, single-flight, stale-while-revalidate; BOOKKEEPER_CACHE_BACKEND=sqlite persists it
+        self.cache = RevalidatingCache.from_env("BOOKKEEPER_CACHE", ttl=300, stale_ttl=3600)
+
+    @staticmethod
+    def _round(value):
+        """3 significant figures, so metrics that differ by noise share one set of alerts."""
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return value
+        if value == 0 or not math.isfinite(value):
+            return value
+        rounded = round(value, 2 - int(math.floor(math.log10(abs(value)))))
+        return int(rounded) if float(rounded).is_integer() else rounded
+
+    @classmethod
+    def rounded(cls, metrics: dict) -> dict:
+        """The metrics as the LLM sees them (and as cache_key hashes them)."""
+        return {k: cls._round(v) for k, v in metrics.items()}
 
-    async def generate_business_alerts(self, metrics: dict) -> list:
+    @classmethod
+    def cache_key(cls, company_id: int, metrics: dict) -> str:
         """
-        Generates dynamic business alerts using LLM. Includes caching to avoid long loading times.
+        Per-company canonical hash of the rounded metrics (key order and float noise don't
+        matter). Alerts are never shared across companies, even when their metrics round alike.
         """
-        # 1. Check Cache
-        cache_key = str(metrics)
-        if cache_key in self._cache:
-            entry = self._cache[cache_key]
-            if time.time() - entry['timestamp'] < 300: # 5 min cache
-                return entry['data']
+        canonical = json.dumps(cls.rounded(metrics), sort_keys=True, default=str)
+        return f"alerts:v2:{company_id}:" + hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+    @property
+    def llm_enabled(self) -> bool:
+        return bool(self.client or os.getenv("OPENAI_API_KEY"))
 
-        # 2. Check Client
+    def ensure_client(self):
+        """Creates the client once OPENAI_API_KEY is available; returns it or None."""
         if not self.client:
             self.api_key = os.getenv("OPENAI_API_KEY")
             if self.api_key:
-                self.client = AsyncOpenAI(api_key=self.api_key)
-        
-        if not self.client:
+                self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self.client
+
+    def cached_alerts(self, company_id: int, metrics: dict):
+        """Cached (fresh or stale) alerts for this company's metrics, or None (never calls the LLM)."""
+        return self.cache.peek(self.cache_key(company_id, metrics))
+
+    async def generate_business_alerts(self, company_id: int, metrics: dict) -> list:
+        """
+        Generates dynamic business alerts using LLM. Includes caching to avoid long loading times.
+        """
+        # 1. Check Client
+        if not self.ensure_client():
             return ["Alert: Cash runway is healthy.", "Optimization: Review overhead."]
-        
+
+        # 2. Cache / coalesce; only successful LLM answers are stored
         try:
-            import asyncio
-            prompt = f"Act as a CFO. Give 3 short, actionable alerts for an SME owner with these metrics: {metrics}. Format: one per line."
-            
-            # 3. Bulletproof Async call with hard timeout
-            response = await asyncio.wait_for(
-                self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=150
-                ),
-                timeout=5.0
-            )
-            
-            content = response.choices[0].message.content
-            alerts = [a.strip('• -1234. ') for a in content.split('\n') if a.strip()]
-            
-            # 4. Store in Cache
-            self._cache[cache_key] = {
-                'data': alerts[:4],
-                'timestamp': time.time()
-            }
-            return alerts[:4]
+            return await self.cache.get_or_compute(self.cache_key(company_id, metrics), lambda: self._llm_alerts(metrics))
         except Exception as e:
             print(f"LLM Error: {e}")
-            return ["Review operational overhead for potential savings."]
+            return FALLBACK_ALERTS
+
+    async def _llm_alerts(self, metrics: dict, client=None, timeout: float = 5.0) -> list:
+        import asyncio
+        # Prompt from the rounded metrics, so cached alerts depend only on what the key hashes
+        prompt = f"Act as a CFO. Give 3 short, actionable alerts for an SME owner with these metrics: {self.rounded(metrics)}. Format: one per line."
+        
+        # Bulletproof Async call with hard timeout
+        response = await asyncio.wait_for(
+            (client or self.client).chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=150
+            ),
+            timeout=timeout
+        )
+        
+        content = response.choices[0].message.content
+        alerts = [a.strip('• -1234. ') for a in content.split('\n') if a.strip()]
+        return alerts[:4]
 
     def _mock_categorization(self, transactions: List[Dict]) -> List[Dict]:
         """
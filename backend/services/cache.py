@@ -0,0 +1,276 @@
+import asyncio
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class InProcessBackend:
+    """Bounded LRU with per-entry expiry, local to one worker process."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+class RedisBackend:
+    """Shared backend for any Redis-protocol server (Redis, Valkey, KeyDB...)."""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "fh:"):
+        import redis # in requirements.txt; only imported when this backend is selected
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value, ttl: float):
+        self.client.set(self.prefix + key, pickle.dumps(value), px=int(ttl * 1000))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def __len__(self):
+        # Only this cache's keys: the database may be shared with other prefixes and apps
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*", count=1000))
+
+class SQLiteBackend:
+    """
+    Persistent single-host backend in a local SQLite file, so entries survive restarts.
+    Bounded: least recently read rows are pruned past max_entries. Expiry uses wall-clock time.
+    """
+
+    def __init__(self, path: str = "cache.sqlite3", max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed_at ON cache_entries (accessed_at)")
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return pickle.loads(row[0])
+
+    def set(self, key: str, value, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, pickle.dumps(value), now + ttl, now)
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (now,))
+                self._conn.execute(
+                    "DELETE FROM cache_entries WHERE key IN "
+                    "(SELECT key FROM cache_entries ORDER BY accessed_at ASC LIMIT ?)",
+                    (max(count - self.max_entries, 0),)
+                )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+def backend_from_env(prefix: str, max_entries: int = 1024):
+    """<prefix>_BACKEND = memory (default) | redis | sqlite, with <prefix>_REDIS_URL / _SQLITE_PATH / _MAX_ENTRIES."""
+    kind = os.getenv(f"{prefix}_BACKEND", "memory").lower()
+    max_entries = int(os.getenv(f"{prefix}_MAX_ENTRIES", str(max_entries)))
+    if kind == "redis":
+        return RedisBackend(os.getenv(f"{prefix}_REDIS_URL", "redis://localhost:6379/0"), prefix=f"fh:{prefix.lower()}:")
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv(f"{prefix}_SQLITE_PATH", f"{prefix.lower()}.sqlite3"), max_entries)
+    return InProcessBackend(max_entries)
+
+class SnapshotCache:
+    """
+    TTL cache for computed snapshots (dashboard metrics etc.) with hit/miss counters.
+    Callers put the company's data version in the key, so new uploads invalidate
+    naturally and old versions just age out.
+    """
+
+    def __init__(self, backend=None, ttl: float = 300):
+        self.backend = backend if backend is not None else InProcessBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, prefix: str = "SNAPSHOT_CACHE"):
+        ttl = float(os.getenv(f"{prefix}_TTL", "300"))
+        return cls(backend_from_env(prefix), ttl)
+
+    def get(self, key: str):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"Cache Error: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value, ttl: float = None):
+        try:
+            self.backend.set(key, value, ttl or self.ttl)
+        except Exception as e:
+            print(f"Cache Error: {e}")
+
+    def delete(self, key: str):
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            print(f"Cache Error: {e}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        try:
+            size = len(self.backend)
+        except Exception:
+            size = None
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0
+        }
+
+class RevalidatingCache:
+    """
+    Async cache for expensive remote calls (LLM alerts) on any backend above.
+    - Entries are fresh for `ttl`, then served stale for up to `stale_ttl` more while one
+      background task refreshes them (stale-while-revalidate).
+    - Concurrent misses for the same key share one in-flight call (single-flight).
+    - Failed computations are never cached; a failed refresh keeps the stale value.
+    """
+
+    def __init__(self, backend=None, ttl: float = 300, stale_ttl: float = 3600):
+        self.backend = backend if backend is not None else InProcessBackend()
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._inflight = {} # key -> asyncio.Task
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls, prefix: str, ttl: float = 300, stale_ttl: float = 3600, max_entries: int = 2048):
+        return cls(
+            backend_from_env(prefix, max_entries),
+            ttl=float(os.getenv(f"{prefix}_TTL", str(ttl))),
+            stale_ttl=float(os.getenv(f"{prefix}_STALE_TTL", str(stale_ttl)))
+        )
+
+    def _read(self, key: str):
+        try:
+            return self.backend.get(key) # (value, fresh_until) or None
+        except Exception as e:
+            print(f"Cache Error: {e}")
+            return None
+
+    def peek(self, key: str):
+        """Fresh or stale value without triggering any computation, else None."""
+        entry = self._read(key)
+        return entry[0] if entry is not None else None
+
+    async def get_or_compute(self, key: str, compute):
+        """`compute` is a zero-arg coroutine function; its result is cached under `key`."""
+        entry = self._read(key)
+        if entry is not None:
+            value, fresh_until = entry
+            if time.time() < fresh_until:
+                self.counters["hits"] += 1
+            else:
+                self.counters["stale_hits"] += 1
+                if key not in self._inflight:
+                    self._start(key, compute, background=True)
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+        else:
+            self.counters["misses"] += 1
+            task = self._start(key, compute)
+        return await asyncio.shield(task)
+
+    def _start(self, key: str, compute, background: bool = False):
+        async def run():
+            try:
+                value = await compute()
+                try:
+                    self.backend.set(key, (value, time.time() + self.ttl), self.ttl + self.stale_ttl)
+                except Exception as e:
+                    print(f"Cache Error: {e}")
+                return value
+            except Exception:
+                self.counters["errors"] += 1
+                if background:
+                    return None # keep serving the stale value
+                raise
+            finally:
+                self._inflight.pop(key, None)
+
+        if background:
+            self.counters["refreshes"] += 1
+        task = asyncio.create_task(run())
+        self._inflight[key] = task
+        return task
+
+    def delete(self, key: str):
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            print(f"Cache Error: {e}")
+
+    def stats(self) -> dict:
+        try:
+            size = len(self.backend)
+        except Exception:
+            size = None
+        return {"backend": type(self.backend).__name__, "entries": size, "in_flight": len(self._inflight), **self.counters}
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+import sys
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+# auto: LISTEN/NOTIFY when DATABASE_URL is PostgreSQL, in-process otherwise | postgres | memory
+EVENT_BUS_BACKEND = os.getenv("EVENT_BUS_BACKEND", "auto").lower()
+EVENT_CHANNEL = os.getenv("EVENT_CHANNEL", "fh_events")
+EVENT_LISTEN_RETRY_SECONDS = float(os.getenv("EVENT_LISTEN_RETRY_SECONDS", "5"))
+
+class PostgresChannel:
+    """
+    Cross-worker fan-out over PostgreSQL LISTEN/NOTIFY. Each worker keeps one dedicated
+    asyncpg connection listening on the channel (reconnecting if it drops) and publishes
+    with pg_notify on the same connection, so every worker's listener, the publisher's
+    included, hands the event to its own subscribers.
+    """
+
+    def __init__(self, dsn: str, channel: str, deliver):
+        self.dsn = dsn
+        self.channel = channel
+        self.deliver = deliver
+        self.connected = False
+        self.notified = 0
+        self.reconnects = 0
+        self._conn = None
+        self._task = None
+        self._lock = asyncio.Lock() # one operation at a time on the asyncpg connection
+        self._pending = set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._conn, self.connected = None, False
+
+    async def _listen(self):
+        import asyncpg
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                await conn.add_listener(self.channel, self._on_notify)
+                self._conn, self.connected = conn, True
+                await closed.wait()
+            except asyncio.CancelledError:
+                if conn is not None:
+                    await conn.close()
+                raise
+            except Exception as e:
+                print(f"Event listener error: {str(e)}")
+            self._conn, self.connected = None, False
+            self.reconnects += 1
+            await asyncio.sleep(EVENT_LISTEN_RETRY_SECONDS)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        message = json.loads(payload)
+        self.deliver(message["company_id"], message["event"], message["data"])
+
+    def send(self, company_id: int, event: str, data: dict):
+        """Schedules the NOTIFY; from the event loop only (publishers are async handlers and tasks)."""
+        payload = json.dumps({"company_id": company_id, "event": event, "data": data})
+        task = asyncio.get_running_loop().create_task(self._notify(company_id, event, data, payload))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _notify(self, company_id: int, event: str, data: dict, payload: str):
+        try:
+            async with self._lock:
+                await self._conn.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+            self.notified += 1
+        except Exception as e:
+            # Connection lost mid-publish: at least this worker's subscribers get it
+            print(f"Event notify error: {str(e)}")
+            self.deliver(company_id, event, data)
+
+class EventBus:
+    """
+    Pub/sub of per-company state changes (consent status, FI fetch progress) for the
+    server-sent-events endpoint. Each subscriber gets a bounded queue; a slow client
+    drops its oldest events rather than holding memory.
+    With several workers, events travel through PostgresChannel so a webhook handled by
+    one worker reaches clients streaming from another. Without it (SQLite, or the
+    listener is down) delivery is in-process; when more than one worker is configured,
+    streams then re-read the status from the DB on each keep-alive instead. Clients
+    should still re-read /api/banking/setu/status on (re)connect: the DB stays the
+    source of truth.
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = {} # company_id -> set of asyncio.Queue
+        self.channel = None
+        self.workers = 1
+        self.published = 0
+        self.dropped = 0
+
+    async def start(self, database_url: str, workers: int = 1):
+        """Startup: picks the transport for EVENT_BUS_BACKEND and the database in use."""
+        self.workers = workers
+        is_postgres = database_url.startswith(("postgres", "postgresql"))
+        if EVENT_BUS_BACKEND == "postgres" or (EVENT_BUS_BACKEND == "auto" and is_postgres):
+            from database import async_database_url
+            dsn = async_database_url(database_url).replace("postgresql+asyncpg://", "postgresql://", 1)
+            self.channel = PostgresChannel(dsn, EVENT_CHANNEL, self._deliver)
+            self.channel.start()
+        elif workers > 1:
+            print(f"Event bus warning: {workers} workers without a shared channel (needs PostgreSQL); "
+                  f"SSE clients fall back to DB status reads every {SSE_KEEPALIVE_SECONDS:g}s")
+
+    async def stop(self):
+        if self.channel is not None:
+            await self.channel.stop()
+
+    @property
+    def shared(self) -> bool:
+        """Whether published events currently reach every worker's subscribers."""
+        return self.workers <= 1 or (self.channel is not None and self.channel.connected)
+
+    @contextmanager
+    def subscribe(self, company_id: int):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(company_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(company_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    self._subscribers.pop(company_id, None)
+
+    def publish(self, company_id: int, event: str, data: dict):
+        self.published += 1
+        if self.channel is not None and self.channel.connected:
+            self.channel.send(company_id, event, data) # comes back through _deliver on every worker
+        else:
+            self._deliver(company_id, event, data)
+
+    def _deliver(self, company_id: int, event: str, data: dict):
+        for queue in list(self._subscribers.get(company_id, ())):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait((event, data))
+
+    @staticmethod
+    def format_sse(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    async def stream(self, company_id: int, initial: dict, is_disconnected, refresh=None):
+        """
+        Async generator of SSE frames: the current state, then pushed events, with keep-alive
+        comments. `refresh`: async callable returning the current status, polled on each
+        keep-alive (and sent if it changed) while events can't reach every worker.
+        """
+        last_status = initial
+        with self.subscribe(company_id) as queue:
+            yield self.format_sse("status", initial)
+            while not await is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if refresh is not None and not self.shared:
+                        status = await refresh()
+                        if status != last_status:
+                            last_status = status
+                            yield self.format_sse("status", status)
+                            continue
+                    yield ": keep-alive\n\n"
+                    continue
+                if event == "status":
+                    last_status = data
+                yield self.format_sse(event, data)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+            "workers": self.workers,
+            "channel": None if self.channel is None else {
+                "connected": self.channel.connected, "notified": self.channel.notified, "reconnects": self.channel.reconnects
+            },
+            "shared": self.shared
+        }
+
+def configured_workers() -> int:
+    """Worker processes the server was launched with: WEB_CONCURRENCY, or --workers/-w on the command line."""
+    workers = os.getenv("WEB_CONCURRENCY") or "1"
+    args = sys.argv[1:] # uvicorn's spawned workers inherit the parent's argv
+    for i, arg in enumerate(args):
+        if arg in ("--workers", "-w") and i + 1 < len(args):
+            workers = args[i + 1]
+        elif arg.startswith("--workers="):
+            workers = arg.split("=", 1)[1]
+    try:
+        return int(workers)
+    except ValueError:
+        return 1
+
+event_bus = EventBus()
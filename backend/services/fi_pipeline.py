@@ -0,0 +1,300 @@
+"""
+Account Aggregator FI data pipeline: ACTIVE consent -> data session -> bank_transactions.
+
+1. Create an FI data session for the consent.
+2. Poll the session with jittered backoff. Each poll streams the session document into a
+   spooled temp file, so a large statement never sits in memory as one bytes object.
+3. Stream-decode the statement: ijson for JSON (json.load fallback), iterparse for XML.
+4. Upsert in batches. Rows are deduplicated by a natural key (account + txnId, or a hash
+   of the row when the FIP sends no txnId) against the batch itself and the table.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+import pandas as pd
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+import models, database
+from services.aggregates import AggregateStore
+from services.events import event_bus
+from services.ingest import BulkIngestor
+from services.insights import schedule_batch
+
+FI_BATCH_ROWS = int(os.getenv("FI_BATCH_ROWS", "5000"))
+FI_HISTORY_DAYS = int(os.getenv("FI_HISTORY_DAYS", "365"))
+FI_POLL_TIMEOUT = float(os.getenv("FI_POLL_TIMEOUT", "300"))
+FI_POLL_INTERVAL = float(os.getenv("FI_POLL_INTERVAL", "1"))
+FI_POLL_MAX_INTERVAL = float(os.getenv("FI_POLL_MAX_INTERVAL", "15"))
+FI_SPOOL_BYTES = int(os.getenv("FI_SPOOL_BYTES", str(8 * 1024 * 1024)))
+
+READY_STATUSES = {"COMPLETED", "PARTIAL"}
+FAILED_STATUSES = {"FAILED", "EXPIRED", "REJECTED"}
+JSON_TRANSACTIONS = "fips.item.accounts.item.data.account.transactions.transaction.item"
+
+class FIPipelineError(Exception):
+    pass
+
+class FIStatementReader:
+    """Decodes an FI session document into batches of raw transaction dicts."""
+
+    @staticmethod
+    def natural_key(account: str, txn: dict) -> str:
+        txn_id = txn.get("txnId")
+        if txn_id:
+            return f"{account}:{txn_id}"
+        raw = "|".join(str(txn.get(k, "")) for k in ("transactionTimestamp", "type", "amount", "currentBalance", "narration"))
+        return f"{account}:h{hashlib.sha1(raw.encode()).hexdigest()[:20]}"
+
+    @staticmethod
+    def to_row(account: str, txn: dict) -> dict:
+        amount = txn.get("amount")
+        is_debit = str(txn.get("type", "")).upper() == "DEBIT"
+        return {
+            "date": txn.get("transactionTimestamp") or txn.get("valueDate"),
+            "description": txn.get("narration"),
+            "debit": amount if is_debit else 0,
+            "credit": 0 if is_debit else amount,
+            "balance": txn.get("currentBalance"),
+            "external_id": FIStatementReader.natural_key(account, txn),
+        }
+
+    @staticmethod
+    def status(fileobj, content_type: str) -> str:
+        fileobj.seek(0)
+        if "xml" in content_type:
+            for _, elem in ET.iterparse(fileobj, events=("start",)):
+                return (elem.get("status") or "").upper()
+            return ""
+        try:
+            import ijson
+            status = next(ijson.items(fileobj, "status"), "")
+        except ImportError:
+            status = json.load(fileobj).get("status", "")
+        return str(status).upper()
+
+    @classmethod
+    def batches(cls, fileobj, content_type: str, batch_rows: int = FI_BATCH_ROWS):
+        rows = []
+        for account, txn in cls._transactions(fileobj, content_type):
+            rows.append(cls.to_row(account, txn))
+            if len(rows) >= batch_rows:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+    @staticmethod
+    def _transactions(fileobj, content_type: str):
+        fileobj.seek(0)
+        if "xml" in content_type:
+            # <Account maskedAccNumber=..><Transactions><Transaction txnId=.. amount=.. /></Transactions></Account>
+            account = ""
+            for event, elem in ET.iterparse(fileobj, events=("start", "end")):
+                tag = elem.tag.rsplit("}", 1)[-1]
+                if event == "start" and tag == "Account":
+                    account = elem.get("maskedAccNumber") or elem.get("linkRefNumber") or ""
+                elif event == "end" and tag == "Transaction":
+                    yield account, dict(elem.attrib)
+                    elem.clear()
+            return
+        try:
+            import ijson
+        except ImportError:
+            ijson = None
+        if ijson is None:
+            for fip in json.load(fileobj).get("fips", []):
+                for acc in fip.get("accounts", []):
+                    account = acc.get("maskedAccNumber") or acc.get("linkRefNumber") or ""
+                    for txn in (acc.get("data") or {}).get("account", {}).get("transactions", {}).get("transaction", []):
+                        yield account, txn
+            return
+        # Walk the event stream so each transaction is paired with its account without loading the document
+        account = ""
+        builder = None
+        for prefix, event, value in ijson.parse(fileobj, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == JSON_TRANSACTIONS and event == "end_map":
+                    yield account, builder.value
+                    builder = None
+            elif prefix == JSON_TRANSACTIONS and event == "start_map":
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            elif prefix in ("fips.item.accounts.item.maskedAccNumber", "fips.item.accounts.item.linkRefNumber") and value:
+                if prefix.endswith("maskedAccNumber") or not account:
+                    account = value
+            elif prefix == "fips.item.accounts.item" and event == "start_map":
+                account = ""
+
+class FIUpserter:
+    """
+    Writes decoded FI batches into bank_transactions, skipping rows already stored.
+    Deduplication is INSERT ... ON CONFLICT DO NOTHING on (company_id, external_id), so
+    overlapping fetches of the same consent can't race a check-then-insert.
+    """
+    INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+    def __init__(self, db: Session, company_id: int):
+        self.db = db
+        self.company_id = company_id
+        self.ingestor = BulkIngestor(db, company_id)
+
+    def upsert(self, rows: list) -> tuple:
+        """Returns (inserted, duplicates). Commits per batch so progress survives a failure."""
+        df = pd.DataFrame(rows).drop_duplicates(subset="external_id", keep="last")
+        frame = self.ingestor.bank_frame(df)
+        frame["external_id"] = df["external_id"].to_numpy()
+
+        table = models.BankTransaction.__table__
+        stmt = self.INSERTS[self.db.get_bind().dialect.name](table).on_conflict_do_nothing(
+            index_elements=["company_id", "external_id"]
+        ).returning(table.c.external_id)
+        inserted = set()
+        for start in range(0, len(frame), self.ingestor.batch_size):
+            batch = BulkIngestor._records(frame.iloc[start:start + self.ingestor.batch_size])
+            inserted.update(self.db.execute(stmt, batch).scalars())
+
+        # Aggregates only for the rows that actually landed
+        if inserted:
+            AggregateStore.apply(self.db, self.company_id, "bank", frame[frame["external_id"].isin(inserted)])
+        self.db.commit()
+        return len(inserted), len(rows) - len(inserted)
+
+def ingest_statement(company_id: int, fileobj, content_type: str) -> dict:
+    """Blocking decode + upsert of a downloaded session document (runs on the IO pool)."""
+    db = database.SessionLocal()
+    try:
+        upserter = FIUpserter(db, company_id)
+        fetched = inserted = duplicates = 0
+        for rows in FIStatementReader.batches(fileobj, content_type):
+            added, skipped = upserter.upsert(rows)
+            fetched += len(rows)
+            inserted += added
+            duplicates += skipped
+        if inserted:
+            try:
+                schedule_batch(db, company_id)
+            except Exception as e:
+                db.rollback()
+                print(f"Insights schedule error: {str(e)}")
+        return {"fetched": fetched, "inserted": inserted, "duplicates": duplicates}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+class FIFetchJobs:
+    """
+    One background fetch per company at a time, run as asyncio tasks off the request path.
+    Keeps the last run's progress and throughput for /api/banking/setu/fetch.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._ready = {} # company_id -> asyncio.Event set by the FI-ready webhook
+        self.runs = {}
+
+    def running(self, company_id: int) -> bool:
+        task = self._tasks.get(company_id)
+        return task is not None and not task.done()
+
+    def start(self, client, execution, company_id: int, consent_id: str) -> bool:
+        """Schedules a fetch. Returns False if one is already running for the company."""
+        if self.running(company_id):
+            return False
+        self.runs[company_id] = {"status": "QUEUED", "consent_id": consent_id, "started_at": datetime.utcnow().isoformat()}
+        self._ready[company_id] = asyncio.Event()
+        self._tasks[company_id] = asyncio.create_task(self._run(client, execution, company_id, consent_id))
+        return True
+
+    def status(self, company_id: int) -> dict:
+        return self.runs.get(company_id, {"status": "NONE"})
+
+    def notify_ready(self, company_id: int):
+        """Webhook hook: the AA says the session is ready, so stop waiting and poll now."""
+        ready = self._ready.get(company_id)
+        if ready is not None:
+            ready.set()
+
+    @staticmethod
+    def _set_status(company_id: int, run: dict, status: str):
+        run["status"] = status
+        event_bus.publish(company_id, "fi_fetch", {k: v for k, v in run.items() if k != "consent_id"})
+
+    async def _run(self, client, execution, company_id: int, consent_id: str):
+        run = self.runs[company_id]
+        start = time.perf_counter()
+        try:
+            # 1. Create the data session
+            self._set_status(company_id, run, "REQUESTED")
+            now = datetime.utcnow()
+            session = await client.create_data_session(consent_id, now - timedelta(days=FI_HISTORY_DAYS), now)
+            run["session_id"] = session.get("id")
+
+            # 2. Poll until the FIPs have delivered, spooling each response to disk if large
+            with tempfile.SpooledTemporaryFile(max_size=FI_SPOOL_BYTES) as spool:
+                content_type = await self._poll(client, execution, company_id, run, spool, self._ready[company_id])
+                run["bytes"] = spool.tell()
+                download_seconds = time.perf_counter() - start
+
+                # 3/4. Decode and upsert off the event loop
+                self._set_status(company_id, run, "INGESTING")
+                result = await execution.run_io(ingest_statement, company_id, spool, content_type)
+
+            elapsed = time.perf_counter() - start
+            run.update(result)
+            run.update(
+                seconds=round(elapsed, 3),
+                download_seconds=round(download_seconds, 3),
+                rows_per_sec=round(result["fetched"] / elapsed, 1) if elapsed else None
+            )
+            self._set_status(company_id, run, "COMPLETED")
+            print(f"FI fetch company={company_id}: {result['fetched']} rows "
+                  f"({result['inserted']} new, {result['duplicates']} duplicate) in {elapsed:.2f}s")
+        except Exception as e:
+            print(f"FI fetch error for company {company_id}: {str(e)}")
+            run.update(error=str(e), seconds=round(time.perf_counter() - start, 3))
+            self._set_status(company_id, run, "FAILED")
+        finally:
+            run["finished_at"] = datetime.utcnow().isoformat()
+
+    @classmethod
+    async def _poll(cls, client, execution, company_id: int, run: dict, spool, ready: asyncio.Event) -> str:
+        deadline = time.monotonic() + FI_POLL_TIMEOUT
+        interval = FI_POLL_INTERVAL
+        while True:
+            if run["status"] != "POLLING":
+                cls._set_status(company_id, run, "POLLING")
+            ready.clear()
+            content_type = await client.download_data_session(run["session_id"], spool)
+            status = await execution.run_io(FIStatementReader.status, spool, content_type)
+            if status in READY_STATUSES:
+                spool.seek(0, os.SEEK_END)
+                return content_type
+            if status in FAILED_STATUSES:
+                raise FIPipelineError(f"FI data session {run['session_id']} ended with {status}")
+            if time.monotonic() + interval > deadline:
+                raise FIPipelineError(f"FI data session {run['session_id']} not ready after {FI_POLL_TIMEOUT:.0f}s")
+            try:
+                await asyncio.wait_for(ready.wait(), timeout=random.uniform(interval / 2, interval))
+            except asyncio.TimeoutError:
+                pass
+            interval = min(interval * 2, FI_POLL_MAX_INTERVAL)
+
+    def stats(self) -> dict:
+        return {
+            "running": sum(1 for t in self._tasks.values() if not t.done()),
+            "last_runs": {
+                cid: {k: run.get(k) for k in ("status", "fetched", "inserted", "duplicates", "bytes", "rows_per_sec")}
+                for cid, run in list(self.runs.items())[-20:]
+            }
+        }
+
+fi_jobs = FIFetchJobs()
@@ -0,0 +1,259 @@
+"""
+Cash flow forecasts from bucketed bank history.
+
+1. CashFlowHistory resamples a company's bank rows into month/week buckets in SQL
+   (date_trunc on PostgreSQL, strftime/date on SQLite): inflow, outflow and closing
+   balance per bucket in one windowed scan, so the engine sees one row per bucket
+   however many transactions or years of history there are.
+2. Forecaster.forecast (engine/forecaster.py) picks a model by backtest and projects
+   net flow and balance; forecast_response converts the result to rupees for the API.
+3. ForecastStore keeps a per-company IncrementalForecaster state in forecast_states,
+   updated from each ingest's monthly deltas, so the dashboard forecast is a single row
+   read. History is only reloaded when a back-dated upload or delete invalidates it.
+4. runway_response/scenario_key shape and key RunwaySimulator (engine/simulation.py)
+   Monte Carlo results for the what-if runway endpoint.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+import models
+from engine.forecaster import IncrementalForecaster
+from money import rupees
+
+load_dotenv()
+
+FORECAST_MAX_HORIZON = int(os.getenv("FORECAST_MAX_HORIZON", "24"))
+# Re-run model selection after this many appended months, even without a back-dated upload
+FORECAST_REFIT_BUCKETS = int(os.getenv("FORECAST_REFIT_BUCKETS", "12"))
+FORECAST_STATE_HORIZON = 12
+RUNWAY_MAX_PATHS = int(os.getenv("RUNWAY_MAX_PATHS", "100000"))
+RUNWAY_MAX_HORIZON = int(os.getenv("RUNWAY_MAX_HORIZON", "60"))
+
+# Bucket start dates for pandas (calendar month starts, ISO weeks starting Monday)
+BUCKET_FREQ = {"month": "MS", "week": "W-MON"}
+
+class CashFlowHistory:
+
+    @staticmethod
+    def bucket(dialect: str, column, freq: str):
+        """SQL expression for the start of the bucket containing `column`."""
+        if dialect == "postgresql":
+            return func.date_trunc(freq, column)
+        if freq == "month":
+            return func.strftime("%Y-%m-01", column)
+        return func.date(column, "-6 days", "weekday 1") # Monday on or before
+
+    @staticmethod
+    def load(db: Session, company_id: int, freq: str = "month") -> dict:
+        """
+        {"periods", "inflow", "outflow", "balance"}: one entry per bucket from the first to
+        the last dated transaction, empty buckets filled (no flow, balance carried forward).
+        Amounts are int64 paise.
+        """
+        bt = models.BankTransaction
+        bucket = CashFlowHistory.bucket(db.get_bind().dialect.name, bt.date, freq)
+        ranked = select(
+            bucket.label("bucket"),
+            bt.balance,
+            func.sum(bt.credit).over(partition_by=bucket).label("inflow"),
+            func.sum(bt.debit).over(partition_by=bucket).label("outflow"),
+            func.row_number().over(partition_by=bucket, order_by=(bt.date.desc(), bt.id.desc())).label("rank")
+        ).where(bt.company_id == company_id, bt.date.isnot(None)).subquery()
+        frame = pd.read_sql(
+            select(ranked.c.bucket, ranked.c.inflow, ranked.c.outflow, ranked.c.balance)
+            .where(ranked.c.rank == 1).order_by(ranked.c.bucket),
+            db.connection()
+        )
+        if frame.empty:
+            empty = np.zeros(0, dtype=np.int64)
+            return {"periods": pd.DatetimeIndex([]), "inflow": empty, "outflow": empty, "balance": empty}
+
+        buckets = pd.to_datetime(frame["bucket"])
+        if buckets.dt.tz is not None:
+            buckets = buckets.dt.tz_localize(None)
+        frame.index = pd.DatetimeIndex(buckets)
+        periods = pd.date_range(frame.index[0], frame.index[-1], freq=BUCKET_FREQ[freq])
+        frame = frame.reindex(periods)
+        return {
+            "periods": periods,
+            "inflow": frame["inflow"].fillna(0).to_numpy(dtype=np.int64),
+            "outflow": frame["outflow"].fillna(0).to_numpy(dtype=np.int64),
+            "balance": frame["balance"].ffill().fillna(0).to_numpy(dtype=np.int64)
+        }
+
+def period_labels(periods, freq: str) -> list:
+    return [p.strftime("%b %Y") if freq == "month" else p.strftime("%Y-%m-%d") for p in periods]
+
+def forecast_response(result: dict, freq: str, horizon: int, history: dict = None, last_period=None) -> dict:
+    """
+    API shape of a Forecaster/IncrementalForecaster result, amounts in rupees. Forecast
+    periods follow the last history bucket (or `last_period`, else the current one).
+    """
+    offset = to_offset(BUCKET_FREQ[freq])
+    if history is not None and len(history["periods"]):
+        last_period = history["periods"][-1]
+    start = pd.Timestamp(last_period) if last_period is not None else offset.rollback(pd.Timestamp.today().normalize())
+    future = pd.date_range(start, periods=horizon + 1, freq=offset)[1:]
+    amounts = lambda values: [round(float(v), 2) for v in rupees(np.asarray(values, dtype=np.float64))]
+    response = {
+        "freq": freq,
+        "model": result["model"],
+        "params": result["params"],
+        "backtest": {"mae": {k: round(rupees(v), 2) for k, v in result["backtest"].items()}, "origins": result["origins"]},
+        "forecast": {
+            "periods": period_labels(future, freq),
+            "net_flow": amounts(result["net_flow"]),
+            "balance": {k: amounts(v) for k, v in result["balance"].items()}
+        }
+    }
+    if history is not None:
+        response["history"] = {
+            "periods": period_labels(history["periods"], freq),
+            "inflow": amounts(history["inflow"]),
+            "outflow": amounts(history["outflow"]),
+            "balance": amounts(history["balance"])
+        }
+    return response
+
+def scenario_key(company_id: int, data_version: int, scenario: dict) -> str:
+    """Snapshot cache key for one runway scenario: a hash of its canonical JSON."""
+    digest = hashlib.sha256(json.dumps(scenario, sort_keys=True, default=str).encode()).hexdigest()[:24]
+    return f"runway:{company_id}:v{data_version}:{digest}"
+
+def runway_response(result: dict, history: dict) -> dict:
+    """API shape of a RunwaySimulator result: amounts in rupees, forecast months labelled."""
+    offset = to_offset(BUCKET_FREQ["month"])
+    last = history["periods"][-1] if len(history["periods"]) else offset.rollback(pd.Timestamp.today().normalize())
+    future = pd.date_range(last, periods=result["horizon"] + 1, freq=offset)[1:]
+    amounts = lambda values: [round(float(v), 2) for v in rupees(np.asarray(values, dtype=np.float64))]
+    return {
+        "paths": result["paths"],
+        "horizon": result["horizon"],
+        "seed": result["seed"],
+        "models": result["models"],
+        "residual_months": result["residual_months"],
+        "runway_months": result["runway"],
+        "probability_negative": round(result["probability_negative"], 4),
+        "periods": period_labels(future, "month"),
+        "probability_negative_by_month": [round(float(p), 4) for p in result["negative_by_month"]],
+        "net_flow": amounts(result["net_flow"]),
+        "balance": {k: amounts(v) for k, v in result["balance"].items()}
+    }
+
+def _month_index(period: str) -> int:
+    year, month = period.split("-")
+    return int(year) * 12 + int(month) - 1
+
+class ForecastStore:
+    """Blocking reads/writes of forecast_states (monthly); run them through db.run_sync."""
+
+    @staticmethod
+    def _state(row: models.ForecastState) -> dict:
+        state = dict(row.state or {})
+        state["recent"] = list(state.get("recent") or [0.0])
+        state["sums"] = {"n": float(row.n or 0), "sx": row.sum_x or 0.0, "sy": row.sum_y or 0.0,
+                         "sxy": row.sum_xy or 0.0, "sxx": row.sum_xx or 0.0, "syy": row.sum_yy or 0.0}
+        return state
+
+    @staticmethod
+    def _store(row: models.ForecastState, state: dict):
+        sums = state["sums"]
+        row.n = int(sums["n"])
+        row.sum_x, row.sum_y, row.sum_xy = sums["sx"], sums["sy"], sums["sxy"]
+        row.sum_xx, row.sum_yy = sums["sxx"], sums["syy"]
+        row.last_value = int(round(state["recent"][-1]))
+        row.state = {k: v for k, v in state.items() if k != "sums"}
+
+    @staticmethod
+    def apply(db: Session, company_id: int, deltas: dict, data_version: int, sign: int = 1):
+        """
+        Folds one ingest's per-month net flow deltas ({"YYYY-MM": paise}) into the state.
+        Months at or after the current bucket are O(1) each; anything earlier, and any
+        delete, marks the state stale. The caller owns the commit.
+        """
+        row = db.query(models.ForecastState).filter(
+            models.ForecastState.company_id == company_id
+        ).with_for_update().first()
+        if row is None or row.stale or not deltas:
+            return
+        periods = sorted(deltas)
+        if sign < 0 or row.last_period is None or _month_index(periods[0]) < _month_index(row.last_period):
+            row.stale = True
+            return
+
+        state = ForecastStore._state(row)
+        last = row.last_period
+        for period in periods:
+            gap = _month_index(period) - _month_index(last)
+            if gap:
+                IncrementalForecaster.advance(state, gap)
+                row.buckets_since_fit = (row.buckets_since_fit or 0) + gap
+                last = period
+            IncrementalForecaster.add(state, deltas[period])
+        ForecastStore._store(row, state)
+        row.last_period = last
+        row.data_version = data_version
+        if row.buckets_since_fit >= FORECAST_REFIT_BUCKETS:
+            row.stale = True # re-select the model on the next read
+
+    @staticmethod
+    def advance(db: Session, company_id: int, previous: int, data_version: int):
+        """
+        Moves an up-to-date state to data_version after a non-bank ingest (accounting/GST
+        rows don't change the cash flow), so those uploads don't force a refit. The caller
+        owns the commit.
+        """
+        db.query(models.ForecastState).filter(
+            models.ForecastState.company_id == company_id,
+            models.ForecastState.data_version == previous
+        ).update({"data_version": data_version}, synchronize_session=False)
+
+    @staticmethod
+    def invalidate(db: Session, company_id: int):
+        db.query(models.ForecastState).filter(
+            models.ForecastState.company_id == company_id
+        ).update({"stale": True}, synchronize_session=False)
+
+    @staticmethod
+    def refit(db: Session, company_id: int, data_version: int) -> models.ForecastState:
+        """Reloads the monthly history from SQL, re-runs model selection and saves the state."""
+        history = CashFlowHistory.load(db, company_id, "month")
+        state = IncrementalForecaster.fit(history["inflow"] - history["outflow"], "month", FORECAST_STATE_HORIZON)
+        last_period = history["periods"][-1].strftime("%Y-%m") if len(history["periods"]) else None
+        for attempt in range(2):
+            row = db.query(models.ForecastState).filter(models.ForecastState.company_id == company_id).first()
+            if row is None:
+                row = models.ForecastState(company_id=company_id, freq="month")
+                db.add(row)
+            ForecastStore._store(row, dict(state, recent=list(state["recent"])))
+            row.last_period = last_period
+            row.data_version = data_version
+            row.stale = False
+            row.buckets_since_fit = 0
+            row.fitted_at = datetime.utcnow()
+            try:
+                db.commit()
+                return row
+            except IntegrityError:
+                # A concurrent read refit the same company first; retry as an update
+                db.rollback()
+                if attempt:
+                    raise
+
+    @staticmethod
+    def forecast(db: Session, company_id: int, last_balance: int, data_version: int, horizon: int = 3) -> dict:
+        """Monthly balance forecast from the stored state; refits first if it is missing or stale."""
+        row = db.query(models.ForecastState).filter(models.ForecastState.company_id == company_id).first()
+        if row is None or row.stale or row.data_version != data_version:
+            row = ForecastStore.refit(db, company_id, data_version)
+        result = IncrementalForecaster.forecast(ForecastStore._state(row), last_balance, horizon)
+        last_period = f"{row.last_period}-01" if row.last_period else None
+        return forecast_response(result, "month", horizon, last_period=last_period)
@@ -0,0 +1,180 @@
+import io
+import os
+import re
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+import models
+from money import to_paise
+from services.aggregates import AggregateStore
+
+EXPENSE_KEYWORDS = ['electricity', 'salary', 'rent', 'internet', 'plumbing', 'fittings', 'bill', 'tax', 'payment']
+ACCOUNTING_TYPES = ["SALE", "EXPENSE", "INVENTORY"]
+
+class BulkIngestor:
+    """
+    Column-wise ingestion of parsed statements.
+    Coerces whole columns with pandas/NumPy (amounts to int64 paise, see money.py) and
+    writes them in batched Core inserts
+    (or COPY when the session is bound to psycopg2) instead of one ORM object per row.
+    """
+    BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+
+    def __init__(self, db: Session, company_id: int, batch_size: int = None):
+        self.db = db
+        self.company_id = company_id
+        self.batch_size = batch_size or self.BATCH_SIZE
+
+    # --- Column coercion ---
+
+    @staticmethod
+    def _column(df: pd.DataFrame, name: str) -> pd.Series:
+        if name in df.columns:
+            return df[name]
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+    @staticmethod
+    def to_int(series: pd.Series) -> np.ndarray:
+        """Vectorized equivalent of int(float(val)) with 0 for anything unparseable."""
+        values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan, copy=True)
+        values[~np.isfinite(values)] = 0
+        return np.trunc(values).astype(np.int64)
+
+    @staticmethod
+    def to_date(series: pd.Series) -> pd.Series:
+        """Naive UTC datetimes; offset-aware values (even mixed offsets) are converted, naive ones kept, junk is NaT."""
+        return pd.to_datetime(series, errors="coerce", format="mixed", utc=True).dt.tz_convert(None)
+
+    @staticmethod
+    def to_str(series: pd.Series) -> pd.Series:
+        values = series.astype(object)
+        out = values.astype(str)
+        missing = values.isna().to_numpy() | (out.str.lower() == 'nan').to_numpy(dtype=bool, na_value=True)
+        out[missing] = ''
+        return out.astype(object)
+
+    @classmethod
+    def guess_types(cls, df: pd.DataFrame) -> np.ndarray:
+        """Keyword-based SALE/EXPENSE/INVENTORY classification over whole columns."""
+        declared = cls.to_str(cls._column(df, 'type')).str.upper()
+        category = cls.to_str(cls._column(df, 'item/category')).str.lower()
+        name = cls.to_str(cls._column(df, 'name')).str.lower()
+
+        pattern = "|".join(re.escape(k) for k in EXPENSE_KEYWORDS)
+        is_expense = category.str.contains(pattern, regex=True).to_numpy(dtype=bool) | \
+            name.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+
+        guessed = np.where(is_expense, "EXPENSE", "SALE")
+        return np.where(declared.isin(ACCOUNTING_TYPES).to_numpy(), declared.to_numpy(dtype=object), guessed).astype(object)
+
+    # --- Frame builders (one per upload type) ---
+
+    def bank_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        debit = to_paise(self._column(df, 'debit'))
+        credit = to_paise(self._column(df, 'credit'))
+        amount = to_paise(self._column(df, 'amount'))
+
+        # If both are 0 but amount exists, map its sign to debit/credit
+        only_amount = (debit == 0) & (credit == 0) & (amount != 0)
+        debit = np.where(only_amount & (amount < 0), -amount, debit)
+        credit = np.where(only_amount & (amount > 0), amount, credit)
+
+        return pd.DataFrame({
+            "company_id": self.company_id,
+            "date": self.to_date(self._column(df, 'date')).to_numpy(),
+            "description": self.to_str(self._column(df, 'description')).to_numpy(),
+            "debit": debit,
+            "credit": credit,
+            "balance": to_paise(self._column(df, 'balance')),
+        })
+
+    def accounting_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        return pd.DataFrame({
+            "company_id": self.company_id,
+            "type": self.guess_types(df),
+            "invoice_no": self.to_str(self._column(df, 'invoiceno')).to_numpy(),
+            "date": self.to_date(self._column(df, 'date')).to_numpy(),
+            "name": self.to_str(self._column(df, 'name')).to_numpy(),
+            "item_category": self.to_str(self._column(df, 'item/category')).to_numpy(),
+            "qty": self.to_int(self._column(df, 'qty')),
+            "unit_cost": to_paise(self._column(df, 'unitcost')),
+            "amount": to_paise(self._column(df, 'amount')),
+            "status": self.to_str(self._column(df, 'status')).to_numpy(),
+            "due_date": self.to_date(self._column(df, 'duedate')).to_numpy(),
+        })
+
+    def gst_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        if 'status' in df.columns:
+            status = self.to_str(df['status']).to_numpy()
+        else:
+            status = np.full(len(df), 'Filed', dtype=object)
+
+        return pd.DataFrame({
+            "company_id": self.company_id,
+            "return_period": self.to_str(self._column(df, 'period')).to_numpy(),
+            "total_sales": to_paise(self._column(df, 'total_sales')),
+            "total_tax_paid": to_paise(self._column(df, 'total_tax_paid')),
+            "status": status,
+            "filing_date": self.to_date(self._column(df, 'date')).to_numpy(),
+        })
+
+    FRAMES = {
+        "bank": (models.BankTransaction, "bank_frame"),
+        "accounting": (models.AccountingRecord, "accounting_frame"),
+        "gst": (models.GSTReturn, "gst_frame"),
+    }
+
+    # --- Writers ---
+
+    def ingest(self, kind: str, df: pd.DataFrame) -> int:
+        """
+        Coerces and writes a parsed DataFrame for the given upload type.
+        Also folds the batch into company_aggregates.
+        Returns the number of rows written. The caller owns the commit.
+        """
+        if kind not in self.FRAMES or df.empty:
+            return 0
+        model, builder = self.FRAMES[kind]
+        frame = getattr(self, builder)(df)
+        written = self.write(model.__table__, frame)
+        AggregateStore.apply(self.db, self.company_id, kind, frame)
+        return written
+
+    def write(self, table, frame: pd.DataFrame) -> int:
+        if frame.empty:
+            return 0
+        if self.db.get_bind().dialect.driver == "psycopg2":
+            return self._copy(table, frame)
+        return self._executemany(table, frame)
+
+    @staticmethod
+    def _records(frame: pd.DataFrame) -> list:
+        # NaT -> None, numpy scalars -> Python scalars for the DBAPI
+        out = frame.astype(object).where(frame.notna(), None)
+        for col in frame.columns:
+            if pd.api.types.is_datetime64_any_dtype(frame[col]):
+                out[col] = pd.Series([None if pd.isna(v) else v.to_pydatetime() for v in out[col]], index=out.index, dtype=object)
+        return out.to_dict("records")
+
+    def _executemany(self, table, frame: pd.DataFrame) -> int:
+        stmt = insert(table)
+        for start in range(0, len(frame), self.batch_size):
+            self.db.execute(stmt, self._records(frame.iloc[start:start + self.batch_size]))
+        return len(frame)
+
+    def _copy(self, table, frame: pd.DataFrame) -> int:
+        columns = ", ".join(frame.columns)
+        sql = f"COPY {table.name} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        cursor = self.db.connection().connection.cursor()
+        try:
+            for start in range(0, len(frame), self.batch_size):
+                buffer = io.StringIO()
+                frame.iloc[start:start + self.batch_size].to_csv(
+                    buffer, index=False, header=False, na_rep="\\N", date_format="%Y-%m-%d %H:%M:%S"
+                )
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+        finally:
+            cursor.close()
+        return len(frame)
@@ -0,0 +1,307 @@
+"""
+Batch LLM insights: precomputes dashboard alerts for many companies off the request path.
+
+1. Pick companies whose aggregates changed since their stored insights (or an explicit list).
+2. Build each company's metrics summary from its aggregate row, exactly as the dashboard does.
+3. Call the LLM with at most INSIGHTS_BATCH_CONCURRENCY requests in flight, through a shared
+   pacer that spaces request starts to INSIGHTS_RPM and backs off on 429s (Retry-After, then
+   a slower rate that recovers on success). Repeat runs for a company whose rounded metrics
+   are unchanged reuse its alerts through the bookkeeper's (per-company) cache.
+4. Persist alerts to company_insights per chunk; the dashboard reads them without waiting.
+
+Runs as an "insights_batch" job queued after ingestion (schedule_batch), or directly, e.g.
+from cron: `python -m services.insights [--all]` from backend/.
+Point OPENAI_BASE_URL at tools/stub_openai_server.py to exercise it locally.
+"""
+import asyncio
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime
+import openai
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+import models
+from engine.metrics import FinancialMetrics
+from services.aggregates import AggregateStore, ALL_PERIODS
+from services.bookkeeper import BookkeeperAgent
+from services.jobs import JobQueue, _in_session
+
+load_dotenv()
+
+INSIGHTS_BATCH_CONCURRENCY = int(os.getenv("INSIGHTS_BATCH_CONCURRENCY", "4"))
+INSIGHTS_RPM = float(os.getenv("INSIGHTS_RPM", "60"))
+INSIGHTS_BATCH_DELAY = float(os.getenv("INSIGHTS_BATCH_DELAY", "30"))
+INSIGHTS_BATCH_LIMIT = int(os.getenv("INSIGHTS_BATCH_LIMIT", "500"))
+INSIGHTS_BATCH_CHUNK = int(os.getenv("INSIGHTS_BATCH_CHUNK", "50"))
+INSIGHTS_MAX_RETRIES = int(os.getenv("INSIGHTS_MAX_RETRIES", "3"))
+INSIGHTS_LLM_TIMEOUT = float(os.getenv("INSIGHTS_LLM_TIMEOUT", "30"))
+
+class InsightStore:
+    """Blocking reads/writes of company_insights; run them through execution.run_io."""
+
+    @staticmethod
+    def metrics_summary(agg: models.CompanyAggregate) -> dict:
+        t = AggregateStore.totals(agg)
+        ratios = FinancialMetrics.headline_ratios(t["sales"], t["expenses"], t["inventory"], t["balance"])
+        return FinancialMetrics.insight_summary(t["sales"], t["expenses"], t["balance"], ratios)
+
+    @staticmethod
+    def get(db: Session, company_id: int):
+        return db.query(models.CompanyInsight).filter(models.CompanyInsight.company_id == company_id).first()
+
+    @staticmethod
+    def stale_company_ids(db: Session, limit: int = INSIGHTS_BATCH_LIMIT) -> list:
+        """Companies with data whose stored insights are missing or from an older data_version."""
+        rows = db.query(models.CompanyAggregate.company_id).outerjoin(
+            models.CompanyInsight, models.CompanyInsight.company_id == models.CompanyAggregate.company_id
+        ).filter(
+            models.CompanyAggregate.period == ALL_PERIODS,
+            models.CompanyAggregate.data_version > 0,
+            or_(models.CompanyInsight.id.is_(None), models.CompanyInsight.data_version != models.CompanyAggregate.data_version)
+        ).order_by(models.CompanyAggregate.updated_at).limit(limit).all()
+        return [r[0] for r in rows]
+
+    @staticmethod
+    def inputs(db: Session, company_ids: list) -> list:
+        """[(company_id, data_version, metrics, stored (metrics_key, insights) or None)]"""
+        aggs = {a.company_id: a for a in db.query(models.CompanyAggregate).filter(
+            models.CompanyAggregate.company_id.in_(company_ids),
+            models.CompanyAggregate.period == ALL_PERIODS
+        )}
+        stored = {r.company_id: (r.metrics_key, r.insights) for r in db.query(models.CompanyInsight).filter(
+            models.CompanyInsight.company_id.in_(company_ids)
+        )}
+        return [
+            (cid, aggs[cid].data_version or 0, InsightStore.metrics_summary(aggs[cid]), stored.get(cid))
+            for cid in company_ids if cid in aggs
+        ]
+
+    @staticmethod
+    def save(db: Session, results: list):
+        """Upserts [(company_id, data_version, metrics_key, metrics, insights)] in one commit."""
+        if not results:
+            return
+        for attempt in range(2):
+            existing = {r.company_id: r for r in db.query(models.CompanyInsight).filter(
+                models.CompanyInsight.company_id.in_([r[0] for r in results])
+            )}
+            now = datetime.utcnow()
+            for company_id, data_version, key, metrics, insights in results:
+                row = existing.get(company_id)
+                if row is None:
+                    row = models.CompanyInsight(company_id=company_id)
+                    db.add(row)
+                row.data_version = data_version
+                row.metrics_key = key
+                row.metrics = metrics
+                row.insights = insights
+                row.generated_at = now
+            try:
+                db.commit()
+                return
+            except IntegrityError:
+                # Another worker inserted the same company first; retry as updates
+                db.rollback()
+                if attempt:
+                    raise
+
+def schedule_batch(db: Session, company_id: int, delay: float = INSIGHTS_BATCH_DELAY):
+    """
+    Called after an ingest commits: queues one delayed insights_batch job shared by every
+    company (the job is filed under the triggering company). No-op while one is still queued
+    or when no LLM is configured.
+    """
+    if not os.getenv("OPENAI_API_KEY"):
+        return None
+    pending = db.query(models.Job).filter(
+        models.Job.kind == "insights_batch", models.Job.status == "QUEUED"
+    ).first()
+    if pending is not None:
+        return pending
+    # No dedupe_key: a batch already RUNNING may have picked its companies before this ingest
+    return JobQueue.enqueue(db, company_id, "insights_batch", {}, delay=delay)
+
+class RatePacer:
+    """
+    Spaces request starts `60 / rpm` seconds apart across all tasks. A 429 pushes the next
+    slot past its Retry-After and doubles the spacing; each success eases it back.
+    """
+
+    def __init__(self, rpm: float = INSIGHTS_RPM):
+        self.base_interval = 60.0 / rpm if rpm > 0 else 0.0
+        self.interval = self.base_interval
+        self._next = 0.0
+        self.waited = 0.0
+        self.throttled = 0
+
+    async def wait(self):
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            self.waited += slot - now
+            await asyncio.sleep(slot - now)
+
+    def throttle(self, retry_after: float):
+        self.throttled += 1
+        self.interval = min(max(self.interval * 2, 0.05), 60.0)
+        self._next = max(self._next, time.monotonic() + retry_after)
+
+    def success(self):
+        if self.interval > self.base_interval:
+            self.interval = max(self.base_interval, self.interval * 0.9)
+
+    def stats(self) -> dict:
+        return {
+            "rpm_limit": round(60.0 / self.base_interval, 1) if self.base_interval else None,
+            "current_interval": round(self.interval, 3),
+            "throttled": self.throttled,
+            "waited_seconds": round(self.waited, 2)
+        }
+
+class BatchInsightGenerator:
+
+    def __init__(self, bookkeeper: BookkeeperAgent, execution, concurrency: int = INSIGHTS_BATCH_CONCURRENCY,
+                 rpm: float = INSIGHTS_RPM, max_retries: int = INSIGHTS_MAX_RETRIES):
+        self.bookkeeper = bookkeeper
+        self.execution = execution
+        self.max_retries = max_retries
+        self.pacer = RatePacer(rpm)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+        self._client = None
+        self.in_flight = 0
+        self.counters = Counter()
+        self.last_run = None
+
+    def _batch_client(self):
+        # The SDK's own retries would hide 429s from the pacer, so the batch handles them
+        if self._client is None:
+            self._client = self.bookkeeper.client.with_options(max_retries=0, timeout=INSIGHTS_LLM_TIMEOUT)
+        return self._client
+
+    @staticmethod
+    def _retry_after(error: openai.RateLimitError, attempt: int) -> float:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            if headers.get("retry-after-ms"):
+                return min(float(headers["retry-after-ms"]) / 1000, 60.0)
+            if headers.get("retry-after"):
+                return min(float(headers["retry-after"]), 60.0)
+        except ValueError:
+            pass
+        return min(2 ** attempt, 30) * random.uniform(0.5, 1.0)
+
+    async def _call(self, metrics: dict) -> list:
+        async with self.semaphore:
+            self.in_flight += 1
+            try:
+                for attempt in range(self.max_retries + 1):
+                    await self.pacer.wait()
+                    self.counters["llm_calls"] += 1
+                    try:
+                        alerts = await self.bookkeeper._llm_alerts(metrics, client=self._batch_client(), timeout=INSIGHTS_LLM_TIMEOUT)
+                        self.pacer.success()
+                        return alerts
+                    except openai.RateLimitError as e:
+                        self.counters["rate_limited"] += 1
+                        if attempt >= self.max_retries:
+                            raise
+                        self.pacer.throttle(self._retry_after(e, attempt))
+                    except (openai.APIConnectionError, openai.InternalServerError, asyncio.TimeoutError):
+                        if attempt >= self.max_retries:
+                            raise
+                        await asyncio.sleep(min(2 ** attempt, 30) * random.uniform(0.5, 1.0))
+            finally:
+                self.in_flight -= 1
+
+    async def _generate(self, company_id: int, data_version: int, metrics: dict, stored, force: bool = False):
+        key = BookkeeperAgent.cache_key(company_id, metrics)
+        if not force and stored is not None and stored[0] == key:
+            return "reused", (company_id, data_version, key, metrics, stored[1])
+        try:
+            insights = await self.bookkeeper.cache.get_or_compute(key, lambda: self._call(metrics))
+        except Exception as e:
+            print(f"Insights batch error for company {company_id}: {type(e).__name__}: {e}")
+            return "failed", None
+        return "generated", (company_id, data_version, key, metrics, insights)
+
+    async def run(self, company_ids: list = None, limit: int = INSIGHTS_BATCH_LIMIT, progress=None, force: bool = False) -> dict:
+        """
+        Generates and stores insights for `company_ids`, or for up to `limit` stale companies.
+        Stored alerts are kept when the metrics key is unchanged, unless `force`.
+        `progress` is an optional coroutine fn(fraction, message), e.g. JobContext.progress.
+        """
+        if not self.bookkeeper.ensure_client():
+            return {"status": "skipped", "reason": "OPENAI_API_KEY not set"}
+        start = time.perf_counter()
+        calls_before = self.counters["llm_calls"]
+        scan = company_ids is None
+        if scan:
+            company_ids = await self.execution.run_io(_in_session, InsightStore.stale_company_ids, limit)
+
+        outcomes = Counter()
+        for i in range(0, len(company_ids), INSIGHTS_BATCH_CHUNK):
+            chunk = company_ids[i:i + INSIGHTS_BATCH_CHUNK]
+            inputs = await self.execution.run_io(_in_session, InsightStore.inputs, chunk)
+            results = await asyncio.gather(*(self._generate(*item, force=force) for item in inputs))
+            await self.execution.run_io(_in_session, InsightStore.save, [row for _, row in results if row is not None])
+            outcomes.update(outcome for outcome, _ in results)
+            if progress:
+                await progress((i + len(chunk)) / len(company_ids), f"{i + len(chunk)}/{len(company_ids)} companies")
+
+        if scan and len(company_ids) >= limit and outcomes["generated"] + outcomes["reused"]:
+            # More stale companies than one batch takes: queue the next batch right away
+            await self.execution.run_io(_in_session, schedule_batch, company_ids[0], 0)
+
+        elapsed = time.perf_counter() - start
+        self.counters["batches"] += 1
+        self.counters.update(outcomes)
+        self.last_run = {
+            "companies": len(company_ids),
+            "generated": outcomes["generated"],
+            "reused": outcomes["reused"],
+            "failed": outcomes["failed"],
+            "llm_calls": self.counters["llm_calls"] - calls_before,
+            "seconds": round(elapsed, 3),
+            "companies_per_sec": round(len(company_ids) / elapsed, 1) if elapsed else None,
+            "finished_at": datetime.utcnow().isoformat()
+        }
+        return self.last_run
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "pacer": self.pacer.stats(),
+            "last_run": self.last_run,
+            **self.counters
+        }
+
+if __name__ == "__main__":
+    # One-off / cron run: python -m services.insights [--all] [--limit N]
+    import argparse
+    from executor import ExecutionLayer
+
+    parser = argparse.ArgumentParser(description="Precompute LLM insights for companies with changed data")
+    parser.add_argument("--all", action="store_true", help="regenerate every company with data, not just stale ones")
+    parser.add_argument("--limit", type=int, default=INSIGHTS_BATCH_LIMIT)
+    args = parser.parse_args()
+
+    def all_company_ids(db: Session) -> list:
+        return [r[0] for r in db.query(models.CompanyAggregate.company_id).filter(
+            models.CompanyAggregate.period == ALL_PERIODS, models.CompanyAggregate.data_version > 0
+        ).limit(args.limit)]
+
+    async def run_once():
+        execution = ExecutionLayer(cpu_workers=0, io_workers=4)
+        generator = BatchInsightGenerator(BookkeeperAgent(), execution)
+        ids = await execution.run_io(_in_session, all_company_ids) if args.all else None
+        print(await generator.run(ids, limit=args.limit, force=args.all))
+        print(generator.stats()["pacer"])
+        execution.shutdown()
+    asyncio.run(run_once())
@@ -0,0 +1,392 @@
+"""
+DB-backed background jobs.
+
+JobQueue  - blocking table operations (enqueue, claim, progress, finish); call them through
+            execution.run_io or from a worker thread, each with its own Session.
+JobWorker - asyncio loop that claims runnable jobs and runs their registered handlers.
+            Handlers are coroutines that push heavy work onto the execution layer's process
+            and thread pools, so a job never blocks the event loop.
+
+The API process runs a JobWorker by default (JOB_WORKER_ENABLED). Dedicated workers can
+run alongside it: `python -m services.jobs` from backend/.
+"""
+import asyncio
+import os
+import socket
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import func, text, update
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+import models, database
+
+load_dotenv()
+
+JOB_WORKER_ENABLED = os.getenv("JOB_WORKER_ENABLED", "true").lower() in ("1", "true", "yes")
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_COMPANY_CONCURRENCY = int(os.getenv("JOB_COMPANY_CONCURRENCY", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "5"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "300"))
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", "job_spool")
+JOB_PROGRESS_FLUSH_SECONDS = float(os.getenv("JOB_PROGRESS_FLUSH_SECONDS", "1"))
+
+ACTIVE_STATUSES = ("QUEUED", "RUNNING")
+
+class JobQueue:
+
+    @staticmethod
+    def enqueue(db: Session, company_id: int, kind: str, payload: dict = None, user_id: int = None,
+                dedupe_key: str = None, max_attempts: int = None, delay: float = 0) -> models.Job:
+        """
+        Adds a job and commits. With a dedupe_key, returns the existing queued/running
+        job of the same kind and key for the company instead of adding another.
+        `delay` seconds postpone the first run (lets bursts of triggers share one job).
+        """
+        if dedupe_key is not None:
+            existing = db.query(models.Job).filter(
+                models.Job.company_id == company_id,
+                models.Job.kind == kind,
+                models.Job.dedupe_key == dedupe_key,
+                models.Job.status.in_(ACTIVE_STATUSES)
+            ).first()
+            if existing is not None:
+                return existing
+
+        now = datetime.utcnow()
+        job = models.Job(
+            id=uuid.uuid4().hex,
+            company_id=company_id,
+            user_id=user_id,
+            kind=kind,
+            dedupe_key=dedupe_key,
+            status="QUEUED",
+            payload=payload or {},
+            progress=0.0,
+            attempts=0,
+            max_attempts=max_attempts or JOB_MAX_ATTEMPTS,
+            run_after=now + timedelta(seconds=delay),
+            created_at=now
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job) # load before returning; callers may read it outside this session's thread
+        return job
+
+    @staticmethod
+    def get(db: Session, job_id: str, company_id: int = None):
+        query = db.query(models.Job).filter(models.Job.id == job_id)
+        if company_id is not None:
+            query = query.filter(models.Job.company_id == company_id)
+        return query.first()
+
+    @staticmethod
+    def claim(db: Session, worker_id: str, kinds: list, limit: int) -> list:
+        """
+        Moves up to `limit` runnable jobs to RUNNING for this worker and returns their ids.
+        A job is runnable when it is QUEUED, due, and its company is below
+        JOB_COMPANY_CONCURRENCY running jobs. Each claim is a conditional UPDATE, so
+        concurrent workers never take the same job.
+        """
+        now = datetime.utcnow()
+        running = dict(db.query(models.Job.company_id, func.count()).filter(
+            models.Job.status == "RUNNING"
+        ).group_by(models.Job.company_id).all())
+
+        candidates = db.query(models.Job.id, models.Job.company_id).filter(
+            models.Job.status == "QUEUED",
+            models.Job.run_after <= now,
+            models.Job.kind.in_(kinds)
+        ).order_by(models.Job.run_after, models.Job.created_at).limit(limit * 5).all()
+
+        claimed = []
+        for job_id, company_id in candidates:
+            if len(claimed) >= limit:
+                break
+            if running.get(company_id, 0) >= JOB_COMPANY_CONCURRENCY:
+                continue
+            if db.get_bind().dialect.name == "postgresql":
+                # Serialize claims per company so two workers can't both take the last slot
+                db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": 8_000_000 + company_id})
+                in_flight = db.query(func.count()).select_from(models.Job).filter(
+                    models.Job.company_id == company_id, models.Job.status == "RUNNING"
+                ).scalar()
+                if in_flight >= JOB_COMPANY_CONCURRENCY:
+                    db.commit()
+                    continue
+            result = db.execute(
+                update(models.Job)
+                .where(models.Job.id == job_id, models.Job.status == "QUEUED")
+                .values(status="RUNNING", locked_by=worker_id, started_at=now, heartbeat_at=now,
+                        attempts=models.Job.attempts + 1, error=None)
+            )
+            db.commit()
+            if result.rowcount == 1:
+                claimed.append(job_id)
+                running[company_id] = running.get(company_id, 0) + 1
+        return claimed
+
+    @staticmethod
+    def progress(db: Session, job_id: str, fraction: float, message: str = None):
+        db.execute(update(models.Job).where(models.Job.id == job_id).values(
+            progress=max(0.0, min(float(fraction), 1.0)),
+            progress_message=message,
+            heartbeat_at=datetime.utcnow()
+        ))
+        db.commit()
+
+    @staticmethod
+    def heartbeat(db: Session, job_id: str):
+        db.execute(update(models.Job).where(models.Job.id == job_id).values(heartbeat_at=datetime.utcnow()))
+        db.commit()
+
+    @staticmethod
+    def succeed(db: Session, job_id: str, result: dict = None, data: bytes = None, result_type: str = None):
+        payloads = db.execute(update(models.Job).where(models.Job.id == job_id).values(
+            status="SUCCEEDED", result=result, result_data=data, result_type=result_type,
+            progress=1.0, finished_at=datetime.utcnow(), locked_by=None
+        ).returning(models.Job.payload)).scalars().all()
+        db.commit()
+        _remove_spooled(payloads)
+
+    @staticmethod
+    def fail(db: Session, job_id: str, error: str) -> str:
+        """Re-queues with exponential backoff while attempts remain; returns the new status."""
+        job = db.get(models.Job, job_id)
+        if job is None:
+            return "MISSING"
+        if (job.attempts or 0) < (job.max_attempts or 1):
+            job.status = "QUEUED"
+            job.run_after = datetime.utcnow() + timedelta(seconds=JOB_RETRY_BACKOFF * 2 ** ((job.attempts or 1) - 1))
+        else:
+            job.status = "FAILED"
+            job.finished_at = datetime.utcnow()
+        job.error = error
+        job.locked_by = None
+        db.commit()
+        if job.status == "FAILED":
+            _remove_spooled([job.payload])
+        return job.status
+
+    @staticmethod
+    def requeue_stale(db: Session) -> int:
+        """
+        Returns RUNNING jobs whose worker stopped heartbeating (crash, redeploy) to the queue,
+        or marks them FAILED (dropping their spooled input) when that was their last attempt.
+        Returns the number requeued.
+        """
+        now = datetime.utcnow()
+        lost = (models.Job.status == "RUNNING", models.Job.heartbeat_at < now - timedelta(seconds=JOB_STALE_SECONDS))
+        exhausted = func.coalesce(models.Job.attempts, 0) >= func.coalesce(models.Job.max_attempts, 1)
+        failed = db.execute(update(models.Job).where(*lost, exhausted).values(
+            status="FAILED", locked_by=None, finished_at=now, error="worker lost on the final attempt"
+        ).returning(models.Job.payload)).scalars().all()
+        result = db.execute(update(models.Job).where(*lost, ~exhausted).values(
+            status="QUEUED", locked_by=None, run_after=now, error="worker lost"
+        ))
+        db.commit()
+        _remove_spooled(failed)
+        return result.rowcount
+
+    @staticmethod
+    def to_dict(job: models.Job) -> dict:
+        return {
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "progress": round(job.progress or 0.0, 3),
+            "message": job.progress_message,
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts,
+            "error": job.error if job.status == "FAILED" else None,
+            "result": job.result,
+            "has_file": job.result_data is not None,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None
+        }
+
+def _remove_spooled(payloads):
+    """Deletes the spooled input (payload "path", see main._spool_upload) of jobs that just finished for good."""
+    for payload in payloads:
+        path = (payload or {}).get("path")
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def _in_session(fn, *args, **kwargs):
+    db = database.SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
+
+class JobContext:
+    """What a handler sees: the job's ids and payload, plus progress reporting."""
+
+    def __init__(self, job: models.Job, execution):
+        self.id = job.id
+        self.kind = job.kind
+        self.company_id = job.company_id
+        self.user_id = job.user_id
+        self.payload = job.payload or {}
+        self.attempt = job.attempts
+        self.max_attempts = job.max_attempts
+        self.execution = execution
+        self.live = None # (fraction, message) not yet written to the DB
+
+    @property
+    def final_attempt(self) -> bool:
+        """True when a failure now will not be retried."""
+        return (self.attempt or 0) >= (self.max_attempts or 1)
+
+    def progress_sync(self, fraction: float, message: str = None):
+        """
+        Records progress in memory; safe to call from the handler's worker threads.
+        The worker flushes it to the jobs row from its heartbeat task, so a handler holding
+        a long write transaction never waits on (or, on SQLite, deadlocks with) the update.
+        """
+        self.live = (max(0.0, min(float(fraction), 1.0)), message)
+
+    async def progress(self, fraction: float, message: str = None):
+        self.progress_sync(fraction, message)
+
+class JobResult:
+    def __init__(self, result: dict = None, data: bytes = None, result_type: str = None):
+        self.result = result
+        self.data = data
+        self.result_type = result_type
+
+class JobWorker:
+    """
+    Polls the jobs table and runs up to `concurrency` handlers at once.
+    Register handlers with `worker.register(kind, coroutine_fn)`; a handler receives a
+    JobContext and returns a JobResult, a dict, or None. Raising schedules a retry.
+    """
+
+    def __init__(self, execution, concurrency: int = JOB_WORKER_CONCURRENCY, poll_interval: float = JOB_POLL_INTERVAL):
+        self.execution = execution
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.handlers = {}
+        self._running = set()
+        self._contexts = {} # job_id -> JobContext of running jobs
+        self._loop_task = None
+        self._wakeup = None
+        self.counters = {"succeeded": 0, "failed": 0, "retried": 0}
+
+    def register(self, kind: str, handler):
+        self.handlers[kind] = handler
+
+    def start(self):
+        if self._loop_task is None:
+            self._wakeup = asyncio.Event()
+            self._loop_task = asyncio.create_task(self._loop())
+
+    def notify(self):
+        """Called after enqueue so a new job starts without waiting for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        for task in list(self._running):
+            task.cancel()
+
+    async def _loop(self):
+        last_reap = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_reap > JOB_STALE_SECONDS / 2:
+                    await self.execution.run_io(_in_session, JobQueue.requeue_stale)
+                    last_reap = time.monotonic()
+                free = self.concurrency - len(self._running)
+                if free > 0 and self.handlers:
+                    for job_id in await self.execution.run_io(_in_session, JobQueue.claim, self.worker_id, list(self.handlers), free):
+                        task = asyncio.create_task(self._run(job_id))
+                        self._running.add(task)
+                        task.add_done_callback(self._running.discard)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job worker error: {str(e)}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job_id: str):
+        job = await self.execution.run_io(_in_session, JobQueue.get, job_id)
+        if job is None:
+            return
+        ctx = JobContext(job, self.execution)
+        self._contexts[job_id] = ctx
+        heartbeat = asyncio.create_task(self._heartbeat(ctx))
+        try:
+            outcome = await self.handlers[job.kind](ctx)
+            if not isinstance(outcome, JobResult):
+                outcome = JobResult(result=outcome)
+            await self.execution.run_io(_in_session, JobQueue.succeed, job_id, outcome.result, outcome.data, outcome.result_type)
+            self.counters["succeeded"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            traceback.print_exc()
+            status = await self.execution.run_io(_in_session, JobQueue.fail, job_id, f"{type(e).__name__}: {e}")
+            self.counters["retried" if status == "QUEUED" else "failed"] += 1
+        finally:
+            heartbeat.cancel()
+            self._contexts.pop(job_id, None)
+            self.notify() # a slot freed up
+
+    async def _heartbeat(self, ctx: JobContext):
+        """Flushes buffered progress every JOB_PROGRESS_FLUSH_SECONDS and keeps heartbeat_at fresh."""
+        last_beat = time.monotonic()
+        while True:
+            await asyncio.sleep(JOB_PROGRESS_FLUSH_SECONDS)
+            live, ctx.live = ctx.live, None
+            if live is None and time.monotonic() - last_beat < JOB_STALE_SECONDS / 4:
+                continue
+            try:
+                if live is not None:
+                    await self.execution.run_io(_in_session, JobQueue.progress, ctx.id, *live)
+                else:
+                    await self.execution.run_io(_in_session, JobQueue.heartbeat, ctx.id)
+                last_beat = time.monotonic()
+            except Exception as e:
+                # Best effort: e.g. SQLite is write-locked by the handler's own transaction
+                if live is not None and ctx.live is None:
+                    ctx.live = live
+                print(f"Job progress flush skipped for {ctx.id}: {type(e).__name__}")
+
+    def live_progress(self, job_id: str):
+        """Unflushed progress for a job running in this process, or None."""
+        ctx = self._contexts.get(job_id)
+        return ctx.live if ctx is not None else None
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "running": len(self._running),
+            "concurrency": self.concurrency,
+            "kinds": sorted(self.handlers),
+            **self.counters
+        }
+
+if __name__ == "__main__":
+    # Standalone worker: same handlers as the API process, no HTTP server
+    import main
+    async def run_forever():
+        worker = main.build_job_worker()
+        worker.start()
+        print(f"Job worker {worker.worker_id} running {sorted(worker.handlers)}")
+        await asyncio.Event().wait()
+    asyncio.run(run_forever())
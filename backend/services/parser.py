@@ -1,70 +1,112 @@
 import pandas as pd
-import io
+import os
+from typing import BinaryIO, Iterator
 import pymupdf # type: ignore
 
 class DocumentParser:
+    # Common Mapping Logic
+    COLUMN_MAPPING = {
+        'narration': 'description',
+        'payee': 'description',
+        'particulars': 'description',
+        'transaction date': 'date',
+        'value date': 'date',
+        'tran date': 'date',
+        'withdrawal': 'debit',
+        'deposit': 'credit',
+        'qty': 'qty',
+        'quantity': 'qty',
+        'unit cost': 'unitcost',
+        'unit_cost': 'unitcost',
+        'invoice no': 'invoiceno',
+        'invoice_no': 'invoiceno',
+        'invoice #': 'invoiceno',
+        'item': 'item/category',
+        'category': 'item/category',
+        'type': 'type'
+    }
+
+    STREAM_CHUNK_ROWS = int(os.getenv("PARSER_CHUNK_ROWS", "50000"))
+
+    @staticmethod
+    def _header_renames(df: pd.DataFrame) -> dict:
+        """
+        Works out the full column rename for a file from its header (and first rows).
+        Computed once per file so streamed batches don't repeat it.
+        """
+        # Basic normalization (lowercasing columns)
+        columns = [str(c).lower().strip() for c in df.columns]
+        renames = dict(zip(df.columns, columns))
+
+        # Rename columns if they exist in mapping but the target isn't already there
+        for old_col, new_col in DocumentParser.COLUMN_MAPPING.items():
+            if old_col in columns and new_col not in columns:
+                renames[df.columns[columns.index(old_col)]] = new_col
+                columns[columns.index(old_col)] = new_col
+
+        # Ensure minimal structure for generic analysis
+        if 'description' not in columns:
+            # Fallback: find any string column that looks like a description
+            str_cols = [c for c in df.select_dtypes(include=['object', 'string']).columns]
+            if len(str_cols) > 0:
+                renames[str_cols[0]] = 'description'
+
+        return renames
+
     @staticmethod
-    async def parse_file(file_content: bytes, filename: str) -> pd.DataFrame:
+    def iter_batches(fileobj: BinaryIO, filename: str, chunk_rows: int = None) -> Iterator[pd.DataFrame]:
         """
-        Parses uploaded file (PDF/XLSX/CSV) and returns a standardized pandas DataFrame.
-        Expected columns in output: ['date', 'description', 'amount']
+        Streaming mode: yields normalized DataFrame batches of at most chunk_rows rows
+        from a file-like upload (e.g. UploadFile.file), so peak memory stays bounded
+        by the batch size rather than the file size.
         """
+        chunk_rows = chunk_rows or DocumentParser.STREAM_CHUNK_ROWS
         try:
             if filename.endswith('.csv'):
-                df = pd.read_csv(io.BytesIO(file_content))
+                batches = pd.read_csv(fileobj, chunksize=chunk_rows)
             elif filename.endswith('.xlsx'):
-                df = pd.read_excel(io.BytesIO(file_content))
+                batches = DocumentParser._iter_xlsx(fileobj, chunk_rows)
             elif filename.endswith('.pdf'):
-                return DocumentParser._parse_pdf(file_content)
+                yield DocumentParser._parse_pdf(fileobj.read())
+                return
             else:
                 raise ValueError("Unsupported file format")
-            
-            # Basic normalization (lowercasing columns)
-            df.columns = [c.lower().strip() for c in df.columns]
 
-            # Common Mapping Logic
-            mapping = {
-                'narration': 'description',
-                'payee': 'description',
-                'particulars': 'description',
-                'transaction date': 'date',
-                'value date': 'date',
-                'tran date': 'date',
-                'withdrawal': 'debit',
-                'deposit': 'credit',
-                'qty': 'qty',
-                'quantity': 'qty',
-                'unit cost': 'unitcost',
-                'unit_cost': 'unitcost',
-                'invoice no': 'invoiceno',
-                'invoice_no': 'invoiceno',
-                'invoice #': 'invoiceno',
-                'item': 'item/category',
-                'category': 'item/category',
-                'type': 'type'
-            }
-            
-            # Rename columns if they exist in mapping but the target isn't already there
-            cols_to_rename = {}
-            for old_col, new_col in mapping.items():
-                if old_col in df.columns and new_col not in df.columns:
-                    cols_to_rename[old_col] = new_col
-            
-            if cols_to_rename:
-                df = df.rename(columns=cols_to_rename)
-
-            # Ensure minimal structure for generic analysis
-            if 'description' not in df.columns:
-                # Fallback: find any string column that looks like a description
-                str_cols = df.select_dtypes(include=['object']).columns
-                if len(str_cols) > 0:
-                    df = df.rename(columns={str_cols[0]: 'description'})
+            renames = None
+            for batch in batches:
+                if renames is None:
+                    renames = DocumentParser._header_renames(batch)
+                yield batch.rename(columns=renames)
 
-            return df
-            
         except Exception as e:
             raise ValueError(f"Error parsing file: {str(e)}")
 
+    @staticmethod
+    def _iter_xlsx(fileobj: BinaryIO, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """Row-iterates the first sheet with openpyxl read_only mode."""
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            header = [c if c is not None else f"unnamed: {i}" for i, c in enumerate(header)]
+
+            buffer = []
+            for row in rows:
+                if all(v is None for v in row):
+                    continue
+                buffer.append(row[:len(header)])
+                if len(buffer) >= chunk_rows:
+                    yield pd.DataFrame(buffer, columns=header)
+                    buffer = []
+            if buffer:
+                yield pd.DataFrame(buffer, columns=header)
+        finally:
+            workbook.close()
+
     @staticmethod
     def _parse_pdf(file_content: bytes) -> pd.DataFrame:
         """
@@ -0,0 +1,326 @@
+"""
+PDF financial health report.
+
+ReportRenderer lays the report out with reportlab platypus flowables, so long insight,
+anomaly and transaction tables flow onto as many pages as they need (table headers repeat,
+"Page X of Y" footers). Rendering is a pure function of its inputs and writes straight to a
+file, so it runs in a worker process and the API streams the file back in chunks.
+
+ReportCache keeps rendered PDFs on disk per (company, data version, ...) key, so repeat
+downloads skip both the metrics and the render. ReportStats tracks reports per minute.
+"""
+import hashlib
+import os
+import time
+import uuid
+from collections import deque
+from datetime import date
+from io import BytesIO
+from xml.sax.saxutils import escape
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from reportlab.platypus import KeepTogether, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from dotenv import load_dotenv
+from money import format_rupees
+
+load_dotenv()
+
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "report_cache")
+REPORT_CACHE_MAX_FILES = int(os.getenv("REPORT_CACHE_MAX_FILES", "200"))
+REPORT_MAX_TRANSACTIONS = int(os.getenv("REPORT_MAX_TRANSACTIONS", "10000"))
+REPORT_CHUNK_BYTES = int(os.getenv("REPORT_CHUNK_BYTES", str(64 * 1024)))
+REPORT_LAYOUT_VERSION = "3" # bump when the layout changes so cached PDFs are not reused
+
+EMERALD = colors.Color(0.06, 0.45, 0.35)
+FRAME_WIDTH = letter[0] - 100 # page width minus the 50pt side margins
+TABLE_CHUNK_ROWS = 200 # splitting one huge Table per page is quadratic; flow fixed-size tables instead
+
+class NumberedCanvas(canvas.Canvas):
+    """Defers page output until the end so every footer can say "Page X of Y"."""
+
+    def __init__(self, *args, **kwargs):
+        canvas.Canvas.__init__(self, *args, **kwargs)
+        self._saved_pages = []
+
+    def showPage(self):
+        self._saved_pages.append(dict(self.__dict__))
+        self._startPage()
+
+    def save(self):
+        total = len(self._saved_pages)
+        for state in self._saved_pages:
+            self.__dict__.update(state)
+            self.setFont("Helvetica-Oblique", 9)
+            self.setFillColorRGB(0.6, 0.6, 0.6)
+            self.drawString(50, 40, "Generated by Financial Health AI Engine - Confidential and Secure")
+            self.drawRightString(letter[0] - 50, 40, f"Page {self._pageNumber} of {total}")
+            canvas.Canvas.showPage(self)
+        canvas.Canvas.save(self)
+
+class ReportRenderer:
+    styles = getSampleStyleSheet()
+    title = ParagraphStyle("ReportTitle", parent=styles["Title"], fontSize=26, leading=30, alignment=0, textColor=EMERALD)
+    heading = ParagraphStyle("ReportHeading", parent=styles["Heading2"], fontSize=18, leading=22, spaceBefore=18, spaceAfter=10)
+    body = ParagraphStyle("ReportBody", parent=styles["BodyText"], fontSize=11, leading=15, textColor=colors.Color(0.2, 0.2, 0.2))
+    muted = ParagraphStyle("ReportMuted", parent=body, fontSize=9, leading=12, textColor=colors.Color(0.5, 0.5, 0.5))
+    cell = ParagraphStyle("ReportCell", parent=body, fontSize=8, leading=10)
+
+    @staticmethod
+    def render(metrics: dict, company_name: str, user_name: str, transactions: list = None, total_transactions: int = None) -> bytes:
+        """Renders the report into memory and returns its bytes."""
+        buffer = BytesIO()
+        ReportRenderer.build(buffer, metrics, company_name, user_name, transactions, total_transactions)
+        return buffer.getvalue()
+
+    @staticmethod
+    def render_to_file(path: str, metrics: dict, company_name: str, user_name: str,
+                       transactions: list = None, total_transactions: int = None) -> dict:
+        """Renders to `path` (written under a temp name, then renamed). Runs in a worker process."""
+        start = time.perf_counter()
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "wb") as out:
+            pages = ReportRenderer.build(out, metrics, company_name, user_name, transactions, total_transactions)
+        os.replace(tmp_path, path)
+        return {"pages": pages, "bytes": os.path.getsize(path), "seconds": round(time.perf_counter() - start, 3)}
+
+    @classmethod
+    def build(cls, fileobj, metrics: dict, company_name: str, user_name: str,
+              transactions: list = None, total_transactions: int = None) -> int:
+        """
+        Writes the PDF to `fileobj` and returns the page count.
+        `transactions` are (date, description, debit, credit, balance) rows for the appendix,
+        amounts in paise.
+        """
+        doc = SimpleDocTemplate(
+            fileobj, pagesize=letter, leftMargin=50, rightMargin=50, topMargin=50, bottomMargin=60,
+            title="Financial Health Summary", author="Financial Health AI Engine"
+        )
+        story = cls._summary(metrics, company_name, user_name)
+        story += cls._anomalies(metrics.get("anomalies") or [])
+        story += cls._transactions(transactions or [], total_transactions)
+        doc.build(story, canvasmaker=NumberedCanvas)
+        return doc.page
+
+    @classmethod
+    def _summary(cls, metrics: dict, company_name: str, user_name: str) -> list:
+        story = [
+            Paragraph("Financial Health Summary", cls.title),
+            Paragraph(f"<b>Company: {escape(company_name or 'Valued Partner')}</b>", cls.body),
+            Paragraph(f"Analysis Date: {date.today().isoformat()} | User: {escape(user_name or '')}", cls.muted),
+        ]
+
+        # 1. Overall Health
+        health = metrics.get("health_score") or {}
+        score = health.get("value", 0)
+        desc = ("Your business is currently in a safe and stable financial position." if score > 70
+                else "Your business shows some areas of risk that need attention.")
+        score_box = Table(
+            [[Paragraph(f"<font size=24 color='#0f7359'><b>{score}/100</b></font>", cls.body),
+              Paragraph(f"<font color='#0f7359'><b>[{escape(str(health.get('label', '')))}]</b></font>", cls.body),
+              Paragraph(desc, cls.body)]],
+            colWidths=[1.4 * inch, 1.1 * inch, None], rowHeights=[0.7 * inch]
+        )
+        score_box.setStyle(TableStyle([
+            ("BACKGROUND", (0, 0), (1, 0), colors.Color(0.95, 0.98, 0.96)),
+            ("BOX", (0, 0), (1, 0), 0.5, colors.Color(0.9, 0.9, 0.9)),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ]))
+        story += [Paragraph("1. Overall Business Safety", cls.heading), score_box]
+
+        # 2. Simplified Financial Indicators
+        ratios = metrics.get("ratios") or {}
+        kpis = [
+            ("Business Safety (Solvency)", f"{ratios.get('z_score', 0)}", "Is your business safe from closing?"),
+            ("Debt Power (Repayment)", f"{ratios.get('dscr', 0)}", "Can you easily pay back loans?"),
+            ("Take-Home (Net Margin)", f"{int(ratios.get('net_margin', 0) * 100)}%", "Money left after all expenses."),
+        ]
+        kpi_table = Table(
+            [[Paragraph(f"<b>{title}</b><br/><font size=9 color='#808080'><i>{sub}</i></font>", cls.body),
+              Paragraph(f"<para alignment='right'><font size=14 color='#0f7359'><b>{val}</b></font></para>", cls.body)]
+             for title, val, sub in kpis],
+            colWidths=[None, 1.5 * inch]
+        )
+        kpi_table.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "MIDDLE"), ("BOTTOMPADDING", (0, 0), (-1, -1), 8)]))
+        story += [Paragraph("2. Key Performance Indicators", cls.heading), kpi_table]
+
+        # 3. AI Insights (wrapped, as many as there are)
+        story.append(Paragraph("3. AI Business Advice", cls.heading))
+        for insight in metrics.get("insights") or []:
+            story.append(Paragraph(f"&gt; {escape(str(insight))}", cls.body))
+            story.append(Spacer(1, 6))
+
+        # 4. Cash Flow Pulse
+        cash_flow = metrics.get("cash_flow") or {}
+        story.append(KeepTogether([
+            Paragraph("4. Cash Flow Pulse", cls.heading),
+            Paragraph(f"<b>Monthly Surplus: Rs. {cash_flow.get('net', 0):,}</b>", cls.body),
+            Paragraph(f"<b>Survival Clock: {cash_flow.get('survival_months', 0)} Months</b>", cls.body),
+            Paragraph("How long you can survive if revenue stops today.", cls.muted),
+        ]))
+        return story
+
+    @classmethod
+    def _anomalies(cls, anomalies: list) -> list:
+        if not anomalies:
+            return []
+        rows = [[
+            str(a.get("date") or "")[:10],
+            Paragraph(escape(str(a.get("description") or "")), cls.cell),
+            f"{float(a.get('amount') or 0):,.2f}",
+            str(a.get("severity") or "").title(),
+        ] for a in anomalies]
+        story = [Paragraph("5. Unusual Transactions", cls.heading)]
+        story += cls._tables(["Date", "Description", "Amount", "Severity"], rows, [0.9 * inch, None, 1.1 * inch, 0.8 * inch])
+        return story
+
+    @classmethod
+    def _transactions(cls, transactions: list, total: int = None) -> list:
+        if not transactions:
+            return []
+        total = total if total is not None else len(transactions)
+        note = f"Latest {len(transactions):,} of {total:,} bank transactions." if total > len(transactions) \
+            else f"All {total:,} bank transactions."
+        rows = [[
+            str(d or "")[:10],
+            # Plain strings, not Paragraphs: 10k wrapped cells would dominate render time
+            str(desc or "")[:60],
+            format_rupees(debit) if debit else "",
+            format_rupees(credit) if credit else "",
+            format_rupees(balance) if balance is not None else "",
+        ] for d, desc, debit, credit, balance in transactions]
+        story = [Paragraph("Appendix: Bank Transactions", cls.heading), Paragraph(note, cls.muted), Spacer(1, 6)]
+        story += cls._tables(["Date", "Description", "Debit", "Credit", "Balance"], rows,
+                             [0.8 * inch, None, 0.95 * inch, 0.95 * inch, 1.0 * inch])
+        return story
+
+    @staticmethod
+    def _tables(header: list, rows: list, col_widths: list) -> list:
+        style = TableStyle([
+            ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 8),
+            ("FONT", (0, 1), (-1, -1), "Helvetica", 8),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.Color(0.93, 0.96, 0.94)),
+            ("TEXTCOLOR", (0, 0), (-1, 0), EMERALD),
+            ("LINEBELOW", (0, 0), (-1, 0), 0.5, EMERALD),
+            ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("TOPPADDING", (0, 0), (-1, -1), 2),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+        ])
+        # The one None column takes whatever the frame width leaves
+        fixed = sum(w for w in col_widths if w is not None)
+        col_widths = [w if w is not None else FRAME_WIDTH - fixed for w in col_widths]
+        return [
+            Table([header] + rows[i:i + TABLE_CHUNK_ROWS], colWidths=col_widths, repeatRows=1, style=style)
+            for i in range(0, len(rows), TABLE_CHUNK_ROWS)
+        ]
+
+class ReportCache:
+    """
+    Rendered PDFs on local disk, keyed by what the report depends on. Bounded to
+    REPORT_CACHE_MAX_FILES, evicting the least recently used file (by mtime).
+    """
+
+    def __init__(self, directory: str = REPORT_CACHE_DIR, max_files: int = REPORT_CACHE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(company_id: int, data_version: int, *parts) -> str:
+        digest = hashlib.sha256("|".join(str(p) for p in (REPORT_LAYOUT_VERSION,) + parts).encode()).hexdigest()[:16]
+        return f"{company_id}-v{data_version}-{digest}"
+
+    def path(self, key: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str):
+        """Path of the cached PDF, or None."""
+        path = os.path.join(self.directory, f"{key}.pdf")
+        try:
+            os.utime(path) # mark as recently used
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def scratch_path(self) -> str:
+        """A path for a one-off render that must not be served to anyone else."""
+        return self.path(f"tmp-{uuid.uuid4().hex}")
+
+    def prune(self):
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith(".pdf") and not e.name.startswith("tmp-")]
+        except FileNotFoundError:
+            return
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def iter_file(path: str, chunk_bytes: int = REPORT_CHUNK_BYTES, remove: bool = False):
+        """Yields the file in chunks (StreamingResponse runs sync iterators in a thread)."""
+        try:
+            with open(path, "rb") as f:
+                while chunk := f.read(chunk_bytes):
+                    yield chunk
+        finally:
+            if remove:
+                os.remove(path)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        try:
+            files = sum(1 for e in os.scandir(self.directory) if e.name.endswith(".pdf"))
+        except FileNotFoundError:
+            files = 0
+        return {"files": files, "hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / total, 3) if total else 0}
+
+class ReportStats:
+    """Reports delivered per minute (sliding window) plus render totals, for /api/ops/stats."""
+
+    def __init__(self, window: float = 60):
+        self.window = window
+        self._recent = deque() # monotonic times of delivered reports
+        self.counters = {"delivered": 0, "rendered": 0, "cache_hits": 0, "failed": 0, "pages": 0}
+        self.render_seconds = 0.0
+
+    def record(self, cached: bool, render: dict = None):
+        """`render` is ReportRenderer.render_to_file's result when the PDF was rendered."""
+        self._recent.append(time.monotonic())
+        self.counters["delivered"] += 1
+        if cached:
+            self.counters["cache_hits"] += 1
+        if render:
+            self.counters["rendered"] += 1
+            self.counters["pages"] += render.get("pages", 0)
+            self.render_seconds += render.get("seconds", 0.0)
+
+    def failed(self):
+        self.counters["failed"] += 1
+
+    def per_minute(self) -> float:
+        cutoff = time.monotonic() - self.window
+        while self._recent and self._recent[0] < cutoff:
+            self._recent.popleft()
+        return round(len(self._recent) * 60 / self.window, 1)
+
+    def stats(self) -> dict:
+        rendered = self.counters["rendered"]
+        return {
+            "reports_per_minute": self.per_minute(),
+            "avg_render_seconds": round(self.render_seconds / rendered, 3) if rendered else None,
+            **self.counters
+        }
+
+report_stats = ReportStats()
@@ -0,0 +1,213 @@
+"""
+Portfolio report export: PDFs for many companies, streamed out as one ZIP.
+
+1. Load inputs per chunk of REPORT_EXPORT_CHUNK companies with a handful of batched queries
+   (companies + owners, aggregate rows, stored insights, latest transactions through a
+   window function) instead of the per-user dashboard queries for each company.
+2. Render each company's PDF in the process pool, at most REPORT_EXPORT_CONCURRENCY at once,
+   reusing ReportCache entries from earlier exports.
+3. Append each finished PDF to a ZIP written to an unseekable stream and yield its bytes
+   straight away; manifest.json at the end lists per-company status and throughput.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import zipfile
+from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+import models, tasks
+from engine.metrics import FinancialMetrics
+from services.aggregates import AggregateStore, ALL_PERIODS
+from services.jobs import _in_session
+from services.report import ReportCache
+
+load_dotenv()
+
+REPORT_EXPORT_CHUNK = int(os.getenv("REPORT_EXPORT_CHUNK", "25"))
+REPORT_EXPORT_CONCURRENCY = int(os.getenv("REPORT_EXPORT_CONCURRENCY", str(os.cpu_count() or 1)))
+REPORT_EXPORT_MAX_COMPANIES = int(os.getenv("REPORT_EXPORT_MAX_COMPANIES", "1000"))
+REPORT_EXPORT_TRANSACTIONS = int(os.getenv("REPORT_EXPORT_TRANSACTIONS", "1000"))
+
+NO_INSIGHTS = ["AI insights have not been generated for this company yet."]
+
+class PortfolioLoader:
+    """Batched reads for the export; blocking, run through execution.run_io."""
+
+    @staticmethod
+    def company_ids(db: Session, limit: int) -> list:
+        return [r[0] for r in db.query(models.Company.id).order_by(models.Company.id).limit(limit)]
+
+    @staticmethod
+    def report_metrics(agg: models.CompanyAggregate, insights: list) -> dict:
+        """The dashboard figures the PDF shows, computed from the aggregate row alone."""
+        t = AggregateStore.totals(agg)
+        sales, expenses, balance = t["sales"], t["expenses"], t["balance"]
+        ratios = FinancialMetrics.headline_ratios(sales, expenses, t["inventory"], balance)
+        return {
+            "health_score": FinancialMetrics.health_score(ratios["z_score"]),
+            "ratios": {
+                "z_score": round(ratios["z_score"], 2),
+                "dscr": round(ratios["dscr"], 2),
+                "net_margin": round(ratios["ebit"] / sales, 2) if sales > 0 else 0
+            },
+            "cash_flow": FinancialMetrics.cash_flow_summary(sales, expenses, balance, t["categories"]),
+            "insights": insights or NO_INSIGHTS
+        }
+
+    @staticmethod
+    def transactions(db: Session, company_ids: list, limit: int) -> dict:
+        """company_id -> its latest `limit` bank rows, oldest first, in one windowed query."""
+        if limit <= 0:
+            return {}
+        bt = models.BankTransaction
+        rank = func.row_number().over(partition_by=bt.company_id, order_by=(bt.date.desc(), bt.id.desc())).label("rank")
+        ranked = select(bt.company_id, bt.date, bt.description, bt.debit, bt.credit, bt.balance, rank).where(
+            bt.company_id.in_(company_ids)
+        ).subquery()
+        rows = db.execute(
+            select(ranked.c.company_id, ranked.c.date, ranked.c.description, ranked.c.debit, ranked.c.credit, ranked.c.balance)
+            .where(ranked.c.rank <= limit)
+            .order_by(ranked.c.company_id, ranked.c.rank.desc())
+        )
+        result = {}
+        for company_id, *row in rows:
+            result.setdefault(company_id, []).append(tuple(row))
+        return result
+
+    @staticmethod
+    def load(db: Session, company_ids: list, max_transactions: int) -> list:
+        companies = db.query(models.Company.id, models.Company.legal_name, models.User.full_name).join(
+            models.User, models.User.id == models.Company.user_id
+        ).filter(models.Company.id.in_(company_ids)).all()
+        aggs = {a.company_id: a for a in db.query(models.CompanyAggregate).filter(
+            models.CompanyAggregate.company_id.in_(company_ids),
+            models.CompanyAggregate.period == ALL_PERIODS
+        )}
+        insights = {r[0]: r[1] for r in db.query(models.CompanyInsight.company_id, models.CompanyInsight.insights).filter(
+            models.CompanyInsight.company_id.in_(company_ids)
+        )}
+        transactions = PortfolioLoader.transactions(db, company_ids, max_transactions)
+
+        inputs = []
+        for company_id, legal_name, owner_name in companies:
+            agg = aggs.get(company_id) or AggregateStore.get(db, company_id) # backfills companies never aggregated
+            inputs.append({
+                "company_id": company_id,
+                "company_name": legal_name,
+                "user_name": owner_name,
+                "data_version": agg.data_version or 0,
+                "bank_count": agg.bank_count or 0,
+                "metrics": PortfolioLoader.report_metrics(agg, insights.get(company_id)),
+                "transactions": transactions.get(company_id, [])
+            })
+        return inputs
+
+class _ZipStream:
+    """Write-only sink for zipfile; the exporter drains what was written after each member."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+class ReportExporter:
+
+    def __init__(self, execution, cache: ReportCache, stats, concurrency: int = REPORT_EXPORT_CONCURRENCY):
+        self.execution = execution
+        self.cache = cache
+        self.stats = stats
+        self.concurrency = concurrency
+        self.last_export = None
+
+    @staticmethod
+    def member_name(company_id: int, company_name: str) -> str:
+        safe = re.sub(r"[^A-Za-z0-9_-]+", "_", company_name or "company").strip("_")[:60]
+        return f"{company_id}_{safe or 'company'}.pdf"
+
+    async def _report(self, semaphore: asyncio.Semaphore, item: dict, max_transactions: int):
+        """Returns (manifest entry, pdf bytes or None)."""
+        entry = {"company_id": item["company_id"], "company": item["company_name"], "file": None}
+        insights_hash = hashlib.sha256(json.dumps(item["metrics"]["insights"]).encode()).hexdigest()[:12]
+        key = ReportCache.key(item["company_id"], item["data_version"], "export", max_transactions,
+                              item["company_name"], item["user_name"], insights_hash)
+        path = self.cache.get(key)
+        cached = path is not None
+        try:
+            if not cached:
+                async with semaphore:
+                    path = self.cache.path(key)
+                    render = await self.execution.run_cpu(
+                        tasks.render_company_report, path, item["company_id"], item["data_version"], item["bank_count"],
+                        item["metrics"], item["company_name"], item["user_name"], item["transactions"], item["bank_count"]
+                    )
+                self.stats.record(False, render)
+            else:
+                self.stats.record(True)
+            data = await self.execution.run_io(_read_bytes, path)
+        except Exception as e:
+            print(f"Report export error for company {item['company_id']}: {str(e)}")
+            self.stats.failed()
+            return dict(entry, status="failed", error=str(e)), None
+        return dict(entry, status="ok", cached=cached,
+                    file=self.member_name(item["company_id"], item["company_name"]), bytes=len(data)), data
+
+    async def stream(self, company_ids: list, max_transactions: int = REPORT_EXPORT_TRANSACTIONS):
+        """Async generator of ZIP bytes, one PDF member at a time."""
+        start = time.perf_counter()
+        out = _ZipStream()
+        archive = zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) # PDFs are already compressed
+        semaphore = asyncio.Semaphore(self.concurrency)
+        manifest = []
+        pending = []
+        try:
+            for i in range(0, len(company_ids), REPORT_EXPORT_CHUNK):
+                chunk = company_ids[i:i + REPORT_EXPORT_CHUNK]
+                inputs = await self.execution.run_io(_in_session, PortfolioLoader.load, chunk, max_transactions)
+                pending = [asyncio.create_task(self._report(semaphore, item, max_transactions)) for item in inputs]
+                for done in asyncio.as_completed(pending):
+                    entry, data = await done
+                    manifest.append(entry)
+                    if data is not None:
+                        archive.writestr(entry["file"], data)
+                        yield out.drain()
+
+            elapsed = time.perf_counter() - start
+            ok = sum(1 for e in manifest if e["status"] == "ok")
+            self.last_export = {
+                "companies": len(company_ids),
+                "reports": ok,
+                "failed": len(manifest) - ok,
+                "cached": sum(1 for e in manifest if e.get("cached")),
+                "seconds": round(elapsed, 3),
+                "reports_per_minute": round(ok * 60 / elapsed, 1) if elapsed else None,
+                "finished_at": datetime.utcnow().isoformat()
+            }
+            print(f"Report export: {ok}/{len(company_ids)} reports in {elapsed:.2f}s "
+                  f"({self.last_export['reports_per_minute']} reports/min)")
+            archive.writestr("manifest.json", json.dumps({**self.last_export, "entries": manifest}, indent=2, default=str))
+            archive.close()
+            yield out.drain()
+            self.cache.prune()
+        finally:
+            # Client went away mid-export: stop rendering what is left of the chunk
+            for task in pending:
+                task.cancel()
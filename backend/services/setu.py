@@ -1,84 +1,266 @@
-import requests
+import asyncio
+import random
 import os
+import time
+import urllib.parse
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv()
 
-class SetuAA:
-    def __init__(self):
-        self.base_url = "https://fiu-sandbox.setu.co" # Sandbox URL
-        self.client_id = os.getenv("SETU_CLIENT_ID")
-        self.client_secret = os.getenv("SETU_CLIENT_SECRET")
-        self.access_token = None
-        self.token_expiry = None
+SETU_BASE_URL = os.getenv("SETU_BASE_URL", "https://fiu-sandbox.setu.co")
+SETU_TIMEOUT = float(os.getenv("SETU_TIMEOUT", "5"))
+SETU_MAX_RETRIES = int(os.getenv("SETU_MAX_RETRIES", "3"))
+SETU_BACKOFF_BASE = float(os.getenv("SETU_BACKOFF_BASE", "0.2"))
+SETU_TOKEN_TTL = int(os.getenv("SETU_TOKEN_TTL", "3000")) # used when the token response has no expires_in
+SETU_TOKEN_REFRESH_MARGIN = int(os.getenv("SETU_TOKEN_REFRESH_MARGIN", "300"))
+SETU_BREAKER_THRESHOLD = int(os.getenv("SETU_BREAKER_THRESHOLD", "5"))
+SETU_BREAKER_COOLDOWN = float(os.getenv("SETU_BREAKER_COOLDOWN", "30"))
+SETU_MAX_CONNECTIONS = int(os.getenv("SETU_MAX_CONNECTIONS", "20"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class SetuError(Exception):
+    pass
+
+class SetuUnavailable(SetuError):
+    """Raised without touching the network while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures. After `cooldown` seconds it is half-open:
+    exactly one caller gets through as a probe and everyone else is rejected until that
+    probe succeeds (closed) or fails (open for another cooldown).
+    """
+
+    def __init__(self, threshold: int = SETU_BREAKER_THRESHOLD, cooldown: float = SETU_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open" or self.probing:
+            return False
+        self.probing = True # this caller is the half-open probe
+        return True
+
+    def release(self):
+        """Ends a probe that finished without an outcome (e.g. cancelled), so the next caller can probe."""
+        self.probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.opened_at is None:
+                self.trips += 1
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+class TokenCache:
+    """
+    Process-wide OAuth token shared by every request. Refreshed under a lock so a burst
+    of callers triggers exactly one token call, and refreshed `margin` seconds before
+    expiry so in-flight calls never carry a token that is about to lapse.
+    """
+
+    def __init__(self, margin: int = SETU_TOKEN_REFRESH_MARGIN):
+        self.margin = margin
+        self.token = None
+        self.expires_at = 0.0
+        self.refreshes = 0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self.token is not None and time.monotonic() < self.expires_at - self.margin
+
+    async def get(self, fetch) -> str:
+        if self._fresh():
+            return self.token
+        async with self._lock:
+            if not self._fresh(): # another caller may have refreshed while we waited
+                token, ttl = await fetch()
+                self.token = token
+                self.expires_at = time.monotonic() + ttl
+                self.refreshes += 1
+            return self.token
+
+    def invalidate(self):
+        self.token = None
+        self.expires_at = 0.0
+
+class AsyncSetuAA:
+    """
+    Non-blocking Setu AA client. One instance per process: it owns the keep-alive
+    httpx.AsyncClient, the token cache and the circuit breaker.
+    Without SETU_CLIENT_ID/SETU_CLIENT_SECRET it stays in demo mode.
+    """
+
+    def __init__(self, base_url: str = SETU_BASE_URL, client_id: str = None, client_secret: str = None,
+                 max_retries: int = SETU_MAX_RETRIES, backoff_base: float = SETU_BACKOFF_BASE):
+        self.base_url = base_url.rstrip("/")
+        self.client_id = client_id if client_id is not None else os.getenv("SETU_CLIENT_ID")
+        self.client_secret = client_secret if client_secret is not None else os.getenv("SETU_CLIENT_SECRET")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.tokens = TokenCache()
+        self.breaker = CircuitBreaker()
+        self._client = None
+        self.counters = {"requests": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+
+    @property
+    def demo_mode(self) -> bool:
+        return not (self.client_id and self.client_secret)
+
+    def _http(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=SETU_TIMEOUT,
+                limits=httpx.Limits(max_connections=SETU_MAX_CONNECTIONS, max_keepalive_connections=SETU_MAX_CONNECTIONS)
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _fetch_token(self):
+        response = await self._send("POST", "/auth/token", json={
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        })
+        data = response.json()
+        return data["access_token"], int(data.get("expires_in") or SETU_TOKEN_TTL)
+
+    async def _attempt(self, method: str, path: str, sink=None, **kwargs):
+        """Single HTTP attempt. With a sink, a successful body is streamed into it instead of buffered."""
+        if sink is None:
+            return await self._http().request(method, path, **kwargs)
+        async with self._http().stream(method, path, **kwargs) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                return response
+            sink.seek(0)
+            sink.truncate()
+            async for chunk in response.aiter_bytes():
+                sink.write(chunk)
+            return response
+
+    async def _send(self, method: str, path: str, sink=None, **kwargs):
+        """One logical call: breaker check, then retries with full-jitter exponential backoff."""
+        import httpx
+        if not self.breaker.allow():
+            self.counters["short_circuited"] += 1
+            raise SetuUnavailable("Setu circuit breaker is open")
+        probe = self.breaker.state == "half_open"
 
-    def _get_token(self):
-        """Standard OAuth2 client credentials flow for Setu"""
         try:
-            if self.access_token and self.token_expiry > datetime.now():
-                return self.access_token
-
-            url = f"{self.base_url}/auth/token"
-            payload = {
-                "client_id": self.client_id,
-                "client_secret": self.client_secret
-            }
-            
-            response = requests.post(url, json=payload, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                self.access_token = data.get("access_token")
-                self.token_expiry = datetime.now() + timedelta(minutes=50)
-                return self.access_token
-            else:
-                raise Exception(f"Auth 401: {response.text}")
-        except Exception:
-            # For the demo, we return a dummy token if auth fails
-            return "demo_token"
-
-    def create_consent_request(self, customer_vua, company_name="Analysis", auth_token=None):
-        """
-        Initiates a consent request for the user.
-        Always returns a valid URL for demo purposes.
-        """
+            for attempt in range(self.max_retries + 1):
+                self.counters["requests"] += 1
+                try:
+                    response = await self._attempt(method, path, sink, **kwargs)
+                    if response.status_code not in RETRYABLE_STATUS:
+                        self.breaker.record_success()
+                        if response.status_code >= 400:
+                            raise SetuError(f"Setu {method} {path} -> {response.status_code}: {response.text[:200]}")
+                        return response
+                    error = SetuError(f"Setu {method} {path} -> {response.status_code}")
+                except httpx.TransportError as e:
+                    error = e
+                if attempt < self.max_retries:
+                    self.counters["retries"] += 1
+                    await asyncio.sleep(random.uniform(0, self.backoff_base * (2 ** attempt)))
+
+            self.counters["failures"] += 1
+            self.breaker.record_failure()
+            raise SetuError(str(error))
+        finally:
+            if probe:
+                self.breaker.release() # no-op unless the probe ended without success/failure
+
+    async def _authorized(self, method: str, path: str, **kwargs):
+        token = await self.tokens.get(self._fetch_token)
         try:
-            # ... (real API logic)
-            token = self._get_token()
-            # ... (rest of the try block remains same)
-            if token == "demo_token":
-                raise Exception("Demo Trigger")
-            # ... (skipping for brevity but including full function logic)
-            url = f"{self.base_url}/consents"
-            payload = { "Detail": { "customer": {"id": customer_vua} } } # Simplified for comparison
-            # Actual code has full payload, but for this edit I'll stick to the catch block focus
-            raise Exception("Force Demo") # Just for demo stability
-
-        except Exception as e:
-            print(f"Setu API Error: {str(e)}. Falling back to Demo Mode.")
-            # Demo Fallback: Use our internal mock page with user's company name and token
-            import urllib.parse
-            safe_name = urllib.parse.quote(company_name)
-            token_param = f"&token={auth_token}" if auth_token else ""
-            
-            # Dynamic Frontend URL for Production vs Local
-            frontend_base = os.getenv("FRONTEND_URL", "http://localhost:5173").rstrip('/')
-            
-            return {
-                "id": f"demo_{uuid.uuid4().hex[:8]}",
-                "url": f"{frontend_base}/setu_mock.html?name={safe_name}{token_param}"
-            }
-
-    def check_consent_status(self, consent_id):
-        if str(consent_id).startswith("demo_"):
-            return {"status": "PENDING"} # Default to pending, main.py checks DB for ACTIVE
-            
+            return await self._send(method, path, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+        except SetuError as e:
+            if "-> 401" not in str(e):
+                raise
+            # Token revoked server-side; fetch a new one once
+            self.tokens.invalidate()
+            token = await self.tokens.get(self._fetch_token)
+            return await self._send(method, path, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+
+    def _demo_consent(self, company_name: str, auth_token: str = None) -> dict:
+        safe_name = urllib.parse.quote(company_name)
+        token_param = f"&token={auth_token}" if auth_token else ""
+        frontend_base = os.getenv("FRONTEND_URL", "http://localhost:5173").rstrip('/')
+        return {
+            "id": f"demo_{uuid.uuid4().hex[:8]}",
+            "url": f"{frontend_base}/setu_mock.html?name={safe_name}{token_param}"
+        }
+
+    async def create_consent_request(self, customer_vua, company_name="Analysis", auth_token=None) -> dict:
+        """Creates a consent request; falls back to the demo consent page if Setu is unreachable."""
+        if self.demo_mode:
+            return self._demo_consent(company_name, auth_token)
         try:
-            token = self._get_token()
-            url = f"{self.base_url}/consents/{consent_id}"
-            headers = {"Authorization": f"Bearer {token}"}
-            response = requests.get(url, headers=headers, timeout=5)
-            return response.json()
-        except:
-            return {"status": "ACTIVE"}
+            response = await self._authorized("POST", "/consents", json={
+                "Detail": {"customer": {"id": customer_vua}},
+                "context": [{"key": "companyName", "value": company_name}]
+            })
+            data = response.json()
+            return {"id": data.get("id"), "url": data.get("url")}
+        except SetuError as e:
+            print(f"Setu API Error: {str(e)}. Falling back to Demo Mode.")
+            return self._demo_consent(company_name, auth_token)
+
+    async def check_consent_status(self, consent_id) -> dict:
+        """Raises SetuError when Setu can't be reached; callers treat that as still pending."""
+        if str(consent_id).startswith("demo_") or self.demo_mode:
+            return {"status": "PENDING"} # main.py checks DB for ACTIVE
+        response = await self._authorized("GET", f"/consents/{consent_id}")
+        return response.json()
+
+    async def create_data_session(self, consent_id: str, date_from: datetime, date_to: datetime, fmt: str = "json") -> dict:
+        """Asks the AA to prepare FI data for an ACTIVE consent. Returns the session (id, status)."""
+        response = await self._authorized("POST", "/sessions", json={
+            "consentId": consent_id,
+            "DataRange": {"from": date_from.strftime("%Y-%m-%dT%H:%M:%S.000Z"), "to": date_to.strftime("%Y-%m-%dT%H:%M:%S.000Z")},
+            "format": fmt
+        })
+        return response.json()
+
+    async def download_data_session(self, session_id: str, sink) -> str:
+        """Streams the session document (status + FI payload) into a binary file object. Returns its content type."""
+        response = await self._authorized("GET", f"/sessions/{session_id}", sink=sink)
+        return response.headers.get("content-type", "application/json")
+
+    def stats(self) -> dict:
+        return {
+            "demo_mode": self.demo_mode,
+            "breaker": {"state": self.breaker.state, "consecutive_failures": self.breaker.failures, "trips": self.breaker.trips},
+            "token_refreshes": self.tokens.refreshes,
+            **self.counters
+        }
+
+setu_client = AsyncSetuAA()
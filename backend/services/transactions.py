@@ -0,0 +1,124 @@
+"""
+Projection-only bank transaction loading for the engines.
+
+Selects just the columns an engine needs and streams them with yield_per (a server-side
+cursor on PostgreSQL, fetchmany batches on SQLite) into one NumPy array per column.
+No ORM objects or per-row dicts are built, so a 100k-row company costs a few flat arrays
+instead of 100k mapped instances plus their identity-map entries. Text is the expensive
+column: anomaly scoring loads ids and amounts only and describes just the flagged rows,
+and the industry scan consumes descriptions batch by batch without keeping them.
+
+IndustryStore keeps that scan's result in companies.industry: computed on first read,
+cleared whenever bank rows are added or removed (AggregateStore.apply).
+"""
+import os
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+import models
+from engine.industry import IndustryAnalyzer
+from money import rupees
+
+TRANSACTION_CHUNK_ROWS = int(os.getenv("TRANSACTION_CHUNK_ROWS", "20000"))
+
+class TransactionColumns:
+    """Blocking loads; from async routes run them through db.run_sync."""
+
+    # NumPy dtype per loadable column (amounts are int64 paise; NULLs become 0 / NaT)
+    DTYPES = {
+        "id": np.int64,
+        "date": "datetime64[us]",
+        "description": object,
+        "debit": np.int64,
+        "credit": np.int64,
+        "balance": np.int64,
+    }
+
+    @staticmethod
+    def chunks(db: Session, company_id: int, columns=("id", "debit", "credit", "description"),
+               after_id: int = 0, chunk_rows: int = None):
+        """Yields {column: array} per yield_per batch of the company's rows with id > after_id, in id order."""
+        bt = models.BankTransaction
+        stmt = select(*[getattr(bt, c) for c in columns]).where(
+            bt.company_id == company_id, bt.id > after_id
+        ).order_by(bt.id.asc()).execution_options(yield_per=chunk_rows or TRANSACTION_CHUNK_ROWS)
+        with db.execute(stmt) as result: # closes the cursor if the consumer stops early
+            for partition in result.partitions():
+                yield {name: TransactionColumns._array(name, values) for name, values in zip(columns, zip(*partition))}
+
+    @staticmethod
+    def load(db: Session, company_id: int, columns=("id", "debit", "credit", "description"),
+             after_id: int = 0, chunk_rows: int = None) -> dict:
+        """{column: array} for the company's bank rows with id > after_id, in id order."""
+        parts = {c: [] for c in columns}
+        for chunk in TransactionColumns.chunks(db, company_id, columns, after_id, chunk_rows):
+            for name, values in chunk.items():
+                parts[name].append(values)
+        return {
+            name: np.concatenate(arrays) if arrays else np.empty(0, dtype=TransactionColumns.DTYPES[name])
+            for name, arrays in parts.items()
+        }
+
+    @staticmethod
+    def _array(name: str, values: tuple) -> np.ndarray:
+        dtype = TransactionColumns.DTYPES[name]
+        if dtype is np.int64:
+            return np.fromiter((v or 0 for v in values), dtype=np.int64, count=len(values))
+        return np.array(values, dtype=dtype)
+
+    @staticmethod
+    def anomaly_inputs(db: Session, company_id: int, after_id: int = 0) -> dict:
+        """
+        AnomalyDetector columns: id and amount (rupees, debit else credit). Descriptions are
+        left out; describe() fetches them for the few rows that get flagged.
+        """
+        data = TransactionColumns.load(db, company_id, ("id", "debit", "credit"), after_id)
+        return {
+            "id": data["id"],
+            "amount": rupees(np.where(data["debit"] > 0, data["debit"], data["credit"]).astype(np.float64))
+        }
+
+    @staticmethod
+    def describe(db: Session, company_id: int, ids) -> dict:
+        """id -> description for the given bank row ids."""
+        bt = models.BankTransaction
+        ids = [int(i) for i in ids]
+        found = {}
+        for start in range(0, len(ids), 500):
+            found.update(db.execute(select(bt.id, bt.description).where(
+                bt.company_id == company_id, bt.id.in_(ids[start:start + 500])
+            )).all())
+        return found
+
+    @staticmethod
+    def descriptions(db: Session, company_id: int):
+        """Streams every bank row's description, one batch at a time (for IndustryAnalyzer)."""
+        for chunk in TransactionColumns.chunks(db, company_id, ("description",)):
+            yield from chunk["description"]
+
+class IndustryStore:
+
+    @staticmethod
+    def get(db: Session, company_id: int, legal_name: str, data_version: int) -> str:
+        """The company's stored industry, classifying (name, then streamed descriptions) if unset."""
+        industry = db.execute(select(models.Company.industry).where(models.Company.id == company_id)).scalar()
+        if industry:
+            return industry
+        industry = IndustryAnalyzer.identify_industry(legal_name, TransactionColumns.descriptions(db, company_id))
+        # Keep it unless bank rows landed during the scan (their ingest cleared it and bumped the version)
+        current_version = select(models.CompanyAggregate.data_version).where(
+            models.CompanyAggregate.company_id == company_id,
+            models.CompanyAggregate.period == "ALL"
+        ).scalar_subquery()
+        db.execute(update(models.Company).where(
+            models.Company.id == company_id, models.Company.industry.is_(None), current_version == data_version
+        ).values(industry=industry))
+        db.commit()
+        return industry
+
+    @staticmethod
+    def reset(db: Session, company_id: int):
+        """Clears the stored industry; the caller owns the commit (it rides the ingest transaction)."""
+        db.execute(update(models.Company).where(
+            models.Company.id == company_id, models.Company.industry.isnot(None)
+        ).values(industry=None))
@@ -0,0 +1,36 @@
+"""
+Picklable entry points for work dispatched to the execution layer's process pool.
+Each worker process keeps its own DB engine (from DATABASE_URL) and model store.
+"""
+import database
+from engine.anomaly import AnomalyModelStore
+from services.report import ReportRenderer
+from services.transactions import TransactionColumns
+
+_anomaly_store = None
+
+def transaction_loader(db, company_id: int):
+    """Loader for AnomalyModelStore: id/amount columns for rows with id > after_id, in id order."""
+    def load(after_id: int) -> dict:
+        return TransactionColumns.anomaly_inputs(db, company_id, after_id)
+    return load
+
+def detect_anomalies(company_id: int, data_version: int, tx_count: int) -> list:
+    global _anomaly_store
+    if _anomaly_store is None:
+        _anomaly_store = AnomalyModelStore()
+
+    db = database.SessionLocal()
+    try:
+        return _anomaly_store.detect(
+            company_id, data_version, tx_count, transaction_loader(db, company_id),
+            lambda ids: TransactionColumns.describe(db, company_id, ids)
+        )
+    finally:
+        db.close()
+
+def render_company_report(path: str, company_id: int, data_version: int, bank_count: int, metrics: dict,
+                          company_name: str, user_name: str, transactions: list, total_transactions: int) -> dict:
+    """Batch export: anomaly scan + PDF render for one company, in one worker process round trip."""
+    metrics = dict(metrics, anomalies=detect_anomalies(company_id, data_version, bank_count))
+    return ReportRenderer.render_to_file(path, metrics, company_name, user_name, transactions, total_transactions)
@@ -0,0 +1,39 @@
+"""
+Shared test setup. database.py reads DATABASE_URL at import, so it is pointed at a
+scratch SQLite file here, before any app module is imported; the file is removed after
+the session. Tests never touch a DATABASE_URL exported by the shell.
+"""
+import os
+import shutil
+import tempfile
+import pytest
+
+_scratch = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'app.db')}"
+
+@pytest.fixture(scope="session", autouse=True)
+def _remove_scratch():
+    yield
+    import database
+    database.engine.dispose()
+    shutil.rmtree(_scratch, ignore_errors=True)
+
+@pytest.fixture
+def mock_setu():
+    """The mock AA (tools/mock_setu_server.py) with fresh state, served in-process."""
+    from tools import mock_setu_server as mock
+    defaults = dict(mock.settings)
+    for state in (mock.calls, mock.tokens, mock.consents, mock.sessions):
+        state.clear()
+    yield mock
+    mock.settings.clear()
+    mock.settings.update(defaults)
+
+@pytest.fixture
+def setu_client(mock_setu):
+    """AsyncSetuAA wired to the mock, with no backoff sleeps. Use inside asyncio.run()."""
+    import httpx
+    from services.setu import AsyncSetuAA
+    client = AsyncSetuAA(base_url="http://mock-setu", client_id="demo", client_secret="demo", backoff_base=0)
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.ASGITransport(app=mock_setu.app))
+    return client
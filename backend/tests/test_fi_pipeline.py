@@ -0,0 +1,56 @@
+"""FI fetch pipeline against the mock AA: a refetch of the same consent stores nothing twice."""
+import asyncio
+
+import pytest
+import database, migrations, models
+from executor import ExecutionLayer
+from services.fi_pipeline import FIFetchJobs
+
+@pytest.fixture
+def company_id():
+    models.Base.metadata.create_all(bind=database.engine)
+    migrations.run_migrations()
+    db = database.SessionLocal()
+    try:
+        user = models.User(email="fi-test@example.com", hashed_password="x", full_name="FI Test")
+        db.add(user)
+        db.flush()
+        company = models.Company(user_id=user.id, legal_name="FI Test Co", setu_consent_status="ACTIVE")
+        db.add(company)
+        db.commit()
+        yield company.id
+        db.delete(user)
+        db.commit()
+    finally:
+        db.close()
+
+def test_refetch_skips_stored_transactions(setu_client, mock_setu, company_id):
+    mock_setu.settings.update(fi_rows=1200, fi_accounts=2, ready_after_polls=0)
+    execution = ExecutionLayer(cpu_workers=0, io_workers=2)
+    jobs = FIFetchJobs()
+
+    async def fetch():
+        jobs.start(setu_client, execution, company_id, "consent-1")
+        await jobs._tasks[company_id]
+        return jobs.status(company_id)
+
+    async def run():
+        try:
+            return await fetch(), await fetch()
+        finally:
+            await setu_client.aclose()
+            execution.shutdown()
+
+    first, refetch = asyncio.run(run())
+    assert first["status"] == "COMPLETED", first.get("error")
+    assert (first["fetched"], first["inserted"], first["duplicates"]) == (2400, 2400, 0)
+    assert refetch["status"] == "COMPLETED", refetch.get("error")
+    assert (refetch["fetched"], refetch["inserted"], refetch["duplicates"]) == (2400, 0, 2400)
+
+    db = database.SessionLocal()
+    try:
+        stored = db.query(models.BankTransaction).filter(models.BankTransaction.company_id == company_id).count()
+    finally:
+        db.close()
+    assert stored == 2400
+    assert mock_setu.calls["statements_served"] == 2
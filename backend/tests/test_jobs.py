@@ -0,0 +1,57 @@
+"""JobQueue terminal transitions drop the job's spooled upload; retries keep it."""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+import database, migrations, models
+from services.jobs import JobQueue, JOB_STALE_SECONDS
+
+@pytest.fixture
+def db():
+    models.Base.metadata.create_all(bind=database.engine)
+    migrations.run_migrations()
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def spooled_job(db, tmp_path):
+    def make(max_attempts=1):
+        path = tmp_path / f"{uuid.uuid4().hex}_statement.csv"
+        path.write_text("Date,Description,Debit,Credit,Balance\n")
+        job = JobQueue.enqueue(db, 1, "upload", {"kind": "bank", "path": str(path), "filename": "s.csv"},
+                               max_attempts=max_attempts)
+        assert JobQueue.claim(db, "test-worker", ["upload"], 10) == [job.id]
+        return job.id, path
+    return make
+
+def test_succeed_removes_spool(db, spooled_job):
+    job_id, path = spooled_job()
+    JobQueue.succeed(db, job_id, {"total_rows": 0})
+    assert not path.exists()
+
+def test_retry_keeps_spool_final_failure_removes_it(db, spooled_job):
+    job_id, path = spooled_job(max_attempts=2)
+    assert JobQueue.fail(db, job_id, "boom") == "QUEUED"
+    assert path.exists()
+    db.query(models.Job).filter(models.Job.id == job_id).update({"run_after": datetime.utcnow()})
+    db.commit()
+    assert JobQueue.claim(db, "test-worker", ["upload"], 10) == [job_id]
+    assert JobQueue.fail(db, job_id, "boom") == "FAILED"
+    assert not path.exists()
+
+def test_requeue_stale_removes_spool_of_exhausted_jobs(db, spooled_job):
+    exhausted_id, exhausted_path = spooled_job(max_attempts=1)
+    retried_id, retried_path = spooled_job(max_attempts=3)
+    stale = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS + 1)
+    db.query(models.Job).filter(models.Job.id.in_([exhausted_id, retried_id])).update({"heartbeat_at": stale})
+    db.commit()
+
+    assert JobQueue.requeue_stale(db) == 1
+    db.expire_all()
+    assert JobQueue.get(db, exhausted_id).status == "FAILED"
+    assert not exhausted_path.exists()
+    assert JobQueue.get(db, retried_id).status == "QUEUED"
+    assert retried_path.exists()
@@ -0,0 +1,51 @@
+from sqlalchemy import create_engine, inspect, text
+import models, migrations
+
+# Schema as created by the baseline release (create_all on the original models)
+BASELINE_SCHEMA = [
+    """CREATE TABLE users (id INTEGER NOT NULL, email VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL,
+        full_name VARCHAR, is_active BOOLEAN, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (id))""",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+    "CREATE INDEX ix_users_id ON users (id)",
+    """CREATE TABLE companies (id INTEGER NOT NULL, user_id INTEGER, legal_name VARCHAR NOT NULL, tax_id VARCHAR,
+        industry VARCHAR, preferred_language VARCHAR, setu_consent_id VARCHAR, setu_consent_status VARCHAR,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE, UNIQUE (tax_id))""",
+    "CREATE INDEX ix_companies_id ON companies (id)",
+    """CREATE TABLE accounting_records (id INTEGER NOT NULL, company_id INTEGER, type VARCHAR, invoice_no VARCHAR,
+        date DATETIME, name VARCHAR, item_category VARCHAR, qty INTEGER, unit_cost INTEGER, amount INTEGER,
+        status VARCHAR, due_date DATETIME, PRIMARY KEY (id),
+        FOREIGN KEY(company_id) REFERENCES companies (id) ON DELETE CASCADE)""",
+    "CREATE INDEX ix_accounting_records_id ON accounting_records (id)",
+    """CREATE TABLE bank_transactions (id INTEGER NOT NULL, company_id INTEGER, date DATETIME, description VARCHAR,
+        debit INTEGER, credit INTEGER, balance INTEGER, PRIMARY KEY (id),
+        FOREIGN KEY(company_id) REFERENCES companies (id) ON DELETE CASCADE)""",
+    "CREATE INDEX ix_bank_transactions_id ON bank_transactions (id)",
+    """CREATE TABLE gst_returns (id INTEGER NOT NULL, company_id INTEGER, return_period VARCHAR, total_sales INTEGER,
+        total_tax_paid INTEGER, status VARCHAR, filing_date DATETIME, PRIMARY KEY (id),
+        FOREIGN KEY(company_id) REFERENCES companies (id) ON DELETE CASCADE)""",
+    "CREATE INDEX ix_gst_returns_id ON gst_returns (id)",
+]
+
+def test_upgrade_from_baseline(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO users (id, email, hashed_password) VALUES (1, 'a@b.c', 'x')"))
+        conn.execute(text("INSERT INTO companies (id, user_id, legal_name) VALUES (1, 1, 'Acme')"))
+        conn.execute(text("INSERT INTO bank_transactions (company_id, description, debit, credit, balance) VALUES (1, 'rent', 250, 0, 1000)"))
+
+    # What API startup does: create the new tables, then migrate the existing ones
+    models.Base.metadata.create_all(bind=engine)
+    assert migrations.run_migrations(engine) == [migration_id for migration_id, _ in migrations.MIGRATIONS]
+    assert migrations.run_migrations(engine) == []
+
+    inspector = inspect(engine)
+    for table in models.Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= existing, table.name
+    assert "external_id" in {c["name"] for c in inspector.get_columns("bank_transactions")}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT debit, balance FROM bank_transactions")).one() == (25000, 100000)
+    engine.dispose()
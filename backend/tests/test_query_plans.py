@@ -0,0 +1,104 @@
+"""
+Query plan regression tests for the hot dashboard queries: each one must be served by
+an index, not a sequential/full scan of a hot table.
+
+Runs EXPLAIN QUERY PLAN against a seeded scratch SQLite file by default. To check
+PostgreSQL plans instead, point PLAN_CHECK_DATABASE_URL at an empty scratch database.
+Either way the seeded tables (and the SQLite file) are removed afterwards.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select, text
+import models, migrations
+
+COMPANIES = 20
+ROWS_PER_COMPANY = 2000
+COMPANY_ID = USER_ID = COMPANIES // 2
+
+HOT_TABLES = {"users", "companies", "bank_transactions", "accounting_records", "gst_returns", "company_aggregates"}
+
+bt, ar, gst, agg = models.BankTransaction, models.AccountingRecord, models.GSTReturn, models.CompanyAggregate
+HOT_QUERIES = {
+    "user by email": select(models.User).where(models.User.email == f"user{USER_ID}@example.com"),
+    "company by user": select(models.Company).where(models.Company.user_id == USER_ID),
+    "aggregate row": select(agg).where(agg.company_id == COMPANY_ID, agg.period == "ALL"),
+    "latest balance": select(bt.balance).where(bt.company_id == COMPANY_ID).order_by(bt.date.desc()).limit(1),
+    "balance history": select(bt.balance).where(bt.company_id == COMPANY_ID).order_by(bt.date.asc()),
+    "new transactions": select(bt.id, bt.debit, bt.credit).where(bt.company_id == COMPANY_ID, bt.id > 1000).order_by(bt.id),
+    "sales total": select(func.sum(ar.amount)).where(ar.company_id == COMPANY_ID, ar.type == "SALE"),
+    "expense categories": select(ar.item_category, func.sum(ar.amount)).where(
+        ar.company_id == COMPANY_ID, ar.type == "EXPENSE").group_by(ar.item_category),
+    "has gst": select(gst.id).where(gst.company_id == COMPANY_ID).limit(1),
+}
+
+def seed(engine):
+    models.Base.metadata.create_all(bind=engine)
+    migrations.run_migrations(engine)
+    start = datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": i, "email": f"user{i}@example.com", "hashed_password": "x", "full_name": f"User {i}"}
+            for i in range(1, COMPANIES + 1)
+        ])
+        conn.execute(insert(models.Company), [
+            {"id": i, "user_id": i, "legal_name": f"Company {i}", "tax_id": f"TAX{i}"} for i in range(1, COMPANIES + 1)
+        ])
+        for cid in range(1, COMPANIES + 1):
+            conn.execute(insert(models.BankTransaction), [
+                {"company_id": cid, "date": start + timedelta(hours=j), "description": f"Txn {j}",
+                 "debit": j % 7 * 100, "credit": j % 5 * 100, "balance": 10000 + j}
+                for j in range(ROWS_PER_COMPANY)
+            ])
+            conn.execute(insert(models.AccountingRecord), [
+                {"company_id": cid, "type": ("SALE", "EXPENSE", "INVENTORY")[j % 3], "date": start + timedelta(days=j),
+                 "item_category": ("Rent", "Electricity", "Widgets", "Salary")[j % 4], "amount": 100 + j}
+                for j in range(ROWS_PER_COMPANY // 4)
+            ])
+            conn.execute(insert(models.GSTReturn), [
+                {"company_id": cid, "return_period": f"P{j}", "total_sales": j, "status": "Filed"} for j in range(12)
+            ])
+            conn.execute(insert(models.CompanyAggregate), [{"company_id": cid, "period": "ALL"}])
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+def full_scans(conn, stmt) -> list:
+    """Returns human-readable plan lines that scan a hot table sequentially."""
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    bad = []
+    if conn.dialect.name == "postgresql":
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        stack = [plan[0]["Plan"]]
+        while stack:
+            node = stack.pop()
+            if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in HOT_TABLES:
+                bad.append(f"Seq Scan on {node['Relation Name']}")
+            stack.extend(node.get("Plans", []))
+    else:
+        for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")):
+            words = row[-1].split()
+            if len(words) >= 2 and words[0] == "SCAN" and words[1] in HOT_TABLES:
+                bad.append(row[-1])
+    return bad
+
+@pytest.fixture(scope="module")
+def plan_conn(tmp_path_factory):
+    scratch = tmp_path_factory.mktemp("plans") / "plan_check.db"
+    url = os.getenv("PLAN_CHECK_DATABASE_URL") or f"sqlite:///{scratch}"
+    engine = create_engine(url)
+    seed(engine)
+    try:
+        with engine.connect() as conn:
+            yield conn
+    finally:
+        models.Base.metadata.drop_all(bind=engine)
+        migrations.schema_migrations.drop(bind=engine, checkfirst=True)
+        engine.dispose()
+        scratch.unlink(missing_ok=True)
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_index(plan_conn, name):
+    assert full_scans(plan_conn, HOT_QUERIES[name]) == []
@@ -0,0 +1,117 @@
+"""AsyncSetuAA against the mock AA: retries, token caching/refresh and the circuit breaker."""
+import asyncio
+
+import pytest
+from services.setu import CircuitBreaker, SetuError, SetuUnavailable
+
+def test_retries_5xx_then_succeeds(setu_client, mock_setu):
+    async def run():
+        consent = await setu_client.create_consent_request("9999999999@onemoney", "Acme")
+        mock_setu.settings["fail_next"] = 2
+        status = await setu_client.check_consent_status(consent["id"])
+        await setu_client.aclose()
+        return status
+
+    assert asyncio.run(run())["status"] == "PENDING"
+    assert mock_setu.calls["consent_status"] == 3
+    assert setu_client.counters["retries"] == 2
+    assert setu_client.counters["failures"] == 0
+    assert setu_client.breaker.state == "closed"
+
+def test_gives_up_after_max_retries(setu_client, mock_setu):
+    setu_client.max_retries = 2
+
+    async def run():
+        consent = await setu_client.create_consent_request("9999999999@onemoney", "Acme")
+        mock_setu.settings["fail_rate"] = 1.0
+        try:
+            with pytest.raises(SetuError):
+                await setu_client.check_consent_status(consent["id"])
+        finally:
+            await setu_client.aclose()
+
+    asyncio.run(run())
+    assert mock_setu.calls["consent_status"] == 3
+    assert setu_client.counters["failures"] == 1
+
+def test_token_fetched_once_for_concurrent_calls(setu_client, mock_setu):
+    async def run():
+        consent = await setu_client.create_consent_request("9999999999@onemoney", "Acme")
+        await asyncio.gather(*(setu_client.check_consent_status(consent["id"]) for _ in range(20)))
+        await setu_client.aclose()
+
+    asyncio.run(run())
+    assert mock_setu.calls["token"] == 1
+    assert setu_client.tokens.refreshes == 1
+
+def test_token_refreshed_before_expiry(setu_client, mock_setu):
+    mock_setu.settings["token_ttl"] = setu_client.tokens.margin # already inside the refresh margin
+
+    async def run():
+        consent = await setu_client.create_consent_request("9999999999@onemoney", "Acme")
+        await setu_client.check_consent_status(consent["id"])
+        await setu_client.aclose()
+
+    asyncio.run(run())
+    assert mock_setu.calls["token"] == 2
+
+def test_revoked_token_refreshed_once(setu_client, mock_setu):
+    async def run():
+        consent = await setu_client.create_consent_request("9999999999@onemoney", "Acme")
+        mock_setu.tokens.clear() # revoked server-side
+        status = await setu_client.check_consent_status(consent["id"])
+        await setu_client.aclose()
+        return status
+
+    assert asyncio.run(run())["status"] == "PENDING"
+    assert mock_setu.calls["token"] == 2
+    assert mock_setu.calls["consent_status"] == 2
+
+def test_half_open_lets_one_probe_through(setu_client, mock_setu):
+    setu_client.max_retries = 0
+    setu_client.breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+
+    async def run():
+        consent = await setu_client.create_consent_request("9999999999@onemoney", "Acme")
+        mock_setu.settings["fail_next"] = 1
+        with pytest.raises(SetuError):
+            await setu_client.check_consent_status(consent["id"])
+        assert setu_client.breaker.state == "open"
+        with pytest.raises(SetuUnavailable):
+            await setu_client.check_consent_status(consent["id"])
+        calls_while_open = mock_setu.calls["consent_status"]
+
+        await asyncio.sleep(0.06)
+        assert setu_client.breaker.state == "half_open"
+        mock_setu.settings["latency_ms"] = 50 # keep the probe in flight while the others arrive
+        results = await asyncio.gather(
+            *(setu_client.check_consent_status(consent["id"]) for _ in range(5)), return_exceptions=True
+        )
+        await setu_client.aclose()
+        return calls_while_open, results
+
+    calls_while_open, results = asyncio.run(run())
+    assert calls_while_open == 1
+    assert sum(isinstance(r, dict) for r in results) == 1
+    assert sum(isinstance(r, SetuUnavailable) for r in results) == 4
+    assert mock_setu.calls["consent_status"] == 2
+    assert setu_client.breaker.state == "closed"
+
+def test_failed_probe_reopens(setu_client, mock_setu):
+    setu_client.max_retries = 0
+    setu_client.breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+
+    async def run():
+        consent = await setu_client.create_consent_request("9999999999@onemoney", "Acme")
+        mock_setu.settings["fail_next"] = 1
+        with pytest.raises(SetuError):
+            await setu_client.check_consent_status(consent["id"])
+        await asyncio.sleep(0.06)
+        mock_setu.settings["fail_next"] = 1
+        with pytest.raises(SetuError):
+            await setu_client.check_consent_status(consent["id"])
+        await setu_client.aclose()
+
+    asyncio.run(run())
+    assert setu_client.breaker.state == "open"
+    assert setu_client.breaker.probing is False
@@ -0,0 +1,73 @@
+"""
+FI fetch throughput against the local mock AA (tools/mock_setu_server.py).
+
+Runs the full pipeline (session -> poll -> stream decode -> batched upsert) for one
+company, then runs it again to measure the all-duplicates path.
+
+Usage (from backend/):
+    python tools/mock_setu_server.py --fi-rows 100000 &
+    python tools/bench_fi_fetch.py --base-url http://127.0.0.1:8099
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchdb import add_url_argument, use_scratch_database
+use_scratch_database("bench_fi_fetch")
+os.environ.setdefault("FI_POLL_INTERVAL", "0.2")
+
+import models, database, migrations
+from executor import ExecutionLayer
+from services.fi_pipeline import FIFetchJobs
+from services.setu import AsyncSetuAA
+
+def make_company() -> int:
+    db = database.SessionLocal()
+    try:
+        user = models.User(email=f"fi-bench-{os.getpid()}@example.com", hashed_password="x", full_name="FI Bench")
+        db.add(user)
+        db.flush()
+        company = models.Company(user_id=user.id, legal_name="FI Bench Co", setu_consent_status="ACTIVE")
+        db.add(company)
+        db.commit()
+        return company.id
+    finally:
+        db.close()
+
+async def fetch(jobs: FIFetchJobs, client, execution, company_id: int, consent_id: str, label: str):
+    jobs.start(client, execution, company_id, consent_id)
+    await jobs._tasks[company_id]
+    run = jobs.status(company_id)
+    if run["status"] != "COMPLETED":
+        print(f"{label}: {run['status']} {run.get('error')}")
+        return
+    print(f"{label:>10}: {run['fetched']} rows, {run['inserted']} new, {run['duplicates']} duplicate, "
+          f"{run['bytes'] / 1e6:.1f} MB, download {run['download_seconds']:.2f}s, total {run['seconds']:.2f}s "
+          f"-> {run['rows_per_sec']:.0f} rows/s")
+
+async def main_async(args):
+    client = AsyncSetuAA(args.base_url, "bench", "bench")
+    execution = ExecutionLayer(cpu_workers=0, io_workers=4)
+    company_id = make_company()
+    jobs = FIFetchJobs()
+    consent_id = args.consent_id or f"bench-{company_id}"
+    await fetch(jobs, client, execution, company_id, consent_id, "first")
+    await fetch(jobs, client, execution, company_id, consent_id, "refetch")
+    await client.aclose()
+    execution.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_url_argument(parser)
+    parser.add_argument("--base-url", default=os.getenv("SETU_BASE_URL", "http://127.0.0.1:8099"))
+    parser.add_argument("--consent-id", default=None)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    migrations.run_migrations()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
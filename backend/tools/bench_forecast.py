@@ -0,0 +1,122 @@
+"""
+Cash flow forecast: SQL bucketing + model selection on long histories.
+
+Seeds one company with YEARS of daily bank rows (trend + yearly seasonality + noise),
+holds out the last HORIZON months, and compares the balance forecast for those months
+from the bucketed engine against the previous straight-line fit over raw per-row
+balances. Also times the SQL resample and the engine for monthly and weekly buckets, and
+the dashboard path: a full ForecastStore refit vs the O(1) read of the stored state and
+the ingest-time update for an appended month.
+
+Usage (from backend/):
+    python tools/bench_forecast.py --years 10 --per-day 20
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchdb import add_url_argument, use_scratch_database
+use_scratch_database("bench_forecast")
+
+import models, database, migrations
+from engine.forecaster import Forecaster
+from services.forecast import CashFlowHistory, ForecastStore
+
+def seed(db, years: int, per_day: int) -> int:
+    rng = np.random.default_rng(11)
+    user = models.User(email=f"forecast-bench-{os.getpid()}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    company = models.Company(user_id=user.id, legal_name="Forecast Bench")
+    db.add(company)
+    db.flush()
+
+    days = pd.date_range(date.today() - timedelta(days=365 * years), date.today(), freq="D")
+    day_index = np.repeat(np.arange(len(days)), per_day)
+    season = np.sin(2 * np.pi * days.dayofyear.to_numpy() / 365.25)[day_index]
+    growth = 1 + day_index / len(days) # business doubles over the period
+    credit = np.where(rng.random(len(day_index)) < 0.45, rng.integers(50_000, 900_000, len(day_index)) * growth * (1 + 0.4 * season), 0)
+    debit = np.where(credit == 0, rng.integers(50_000, 700_000, len(day_index)) * growth, 0)
+    credit, debit = credit.astype(np.int64), debit.astype(np.int64)
+    balance = 100_000_000 + np.cumsum(credit - debit)
+    rows = pd.DataFrame({
+        "company_id": company.id, "date": days[day_index].to_pydatetime(), "description": "Bench",
+        "debit": debit, "credit": credit, "balance": balance
+    })
+    for start in range(0, len(rows), 20000):
+        db.execute(models.BankTransaction.__table__.insert(), rows.iloc[start:start + 20000].astype(object).to_dict("records"))
+    db.commit()
+    return company.id
+
+def legacy_projection(balances: np.ndarray, ahead: int) -> np.ndarray:
+    """The previous Forecaster.project_cash_flow: a line over per-row balances, x = row index."""
+    x = np.arange(len(balances))
+    m, c = np.linalg.lstsq(np.vstack([x, np.ones(len(x))]).T, balances, rcond=None)[0]
+    return m * (len(balances) + np.arange(ahead)) + c
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_url_argument(parser)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--per-day", type=int, default=20, help="bank rows per day")
+    parser.add_argument("--horizon", type=int, default=6, help="held-out months")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    migrations.run_migrations()
+    db = database.SessionLocal()
+    try:
+        company_id = seed(db, args.years, args.per_day)
+        print(f"{args.years} years, {args.years * 365 * args.per_day:,} bank rows")
+        for freq in ("month", "week"):
+            start = time.perf_counter()
+            history = CashFlowHistory.load(db, company_id, freq)
+            loaded = time.perf_counter()
+            result = Forecaster.forecast(history["inflow"] - history["outflow"], int(history["balance"][-1]), freq, 6)
+            print(f"{freq:>5}: {len(history['periods'])} buckets, SQL resample {loaded - start:.3f}s, "
+                  f"engine {(time.perf_counter() - loaded) * 1000:.1f} ms -> {result['model']} {result['params']}")
+
+        # Holdout: forecast the last `horizon` month-end balances from everything before them
+        history = CashFlowHistory.load(db, company_id, "month")
+        h = args.horizon
+        train_flow = (history["inflow"] - history["outflow"])[:-h]
+        actual = history["balance"][-h:] / 100
+        result = Forecaster.forecast(train_flow, int(history["balance"][-h - 1]), "month", h)
+        bucketed = result["balance"]["mid"] / 100
+
+        cutoff = history["periods"][-h].to_pydatetime()
+        balances = np.array([r[0] for r in db.query(models.BankTransaction.balance).filter(
+            models.BankTransaction.company_id == company_id, models.BankTransaction.date < cutoff
+        ).order_by(models.BankTransaction.date.asc())], dtype=np.float64) / 100
+        legacy = legacy_projection(balances, h)
+
+        mape = lambda forecast: float(np.mean(np.abs(forecast - actual) / np.abs(actual)) * 100)
+        print(f"holdout {h} months: bucketed {result['model']} MAPE {mape(bucketed):.1f}%, "
+              f"per-row line MAPE {mape(legacy):.1f}%  (backtest MAE {result['backtest']})")
+
+        # Dashboard path: refit (history reload) vs stored-state read vs ingest-time update
+        last_balance = int(history["balance"][-1])
+        start = time.perf_counter()
+        ForecastStore.refit(db, company_id, 1)
+        refit = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(100):
+            ForecastStore.forecast(db, company_id, last_balance, 1, 3)
+        read = (time.perf_counter() - start) / 100
+        next_month = (history["periods"][-1] + pd.offsets.MonthBegin(1)).strftime("%Y-%m")
+        start = time.perf_counter()
+        ForecastStore.apply(db, company_id, {next_month: 5_000_000}, 2)
+        db.commit()
+        update = time.perf_counter() - start
+        print(f"dashboard forecast: refit {refit * 1000:.0f} ms, state read + forecast {read * 1000:.2f} ms, "
+              f"append-month update {update * 1000:.2f} ms")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Industry identification: compiled KeywordMatcher scan vs the previous joined-string scan.
+
+Times IndustryAnalyzer.identify_industry on N synthetic bank descriptions, with no
+keyword (full scan) and with a top-priority keyword at a given position (early exit),
+against the previous approach: one " ".join over every description, then a substring
+search per keyword. Also checks both agree on random names and description sets.
+
+Usage (from backend/):
+    python tools/bench_industry.py --descriptions 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.industry import IndustryAnalyzer
+
+def legacy_identify(company_name: str, descriptions: list) -> str:
+    """The previous identify_industry: a name rule chain, then one joined string."""
+    name = company_name.lower()
+    for industry, keywords, refine in IndustryAnalyzer.NAME_RULES:
+        if any(k in name for k in keywords):
+            return refine[0] if refine and any(k in name for k in refine[1]) else industry
+    all_desc = " ".join([str(d).lower() for d in descriptions if d])
+    for industry, keywords in IndustryAnalyzer.DESCRIPTION_RULES:
+        if any(k in all_desc for k in keywords):
+            return industry
+    return "Default"
+
+def timed(fn, *args, repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--descriptions", type=int, default=200000)
+    parser.add_argument("--hit-at", type=float, default=0.1, help="position of the keyword, as a fraction")
+    parser.add_argument("--cases", type=int, default=20000, help="random agreement cases")
+    args = parser.parse_args()
+
+    descriptions = [f"UPI/{i}/vendor payment ref {i * 7919}" for i in range(args.descriptions)]
+    for label, hit in (("no keyword", None), (f"'server' at {args.hit_at:.0%}", int(args.hit_at * args.descriptions))):
+        rows = list(descriptions)
+        if hit is not None:
+            rows[hit] = "AWS SERVER invoice"
+        new, new_time = timed(IndustryAnalyzer.identify_industry, "Acme Pvt Ltd", rows)
+        old, old_time = timed(legacy_identify, "Acme Pvt Ltd", rows)
+        print(f"{label:>18}: matcher {new_time * 1000:.0f} ms ({new}), joined string {old_time * 1000:.0f} ms ({old})")
+
+    rng = random.Random(7)
+    words = [k for _, keywords, refine in IndustryAnalyzer.NAME_RULES for k in keywords + (refine[1] if refine else [])]
+    words += [k for _, keywords in IndustryAnalyzer.DESCRIPTION_RULES for k in keywords] + ["acme", "pvt", "ltd", "upi"] * 5
+    mismatches = 0
+    for _ in range(args.cases):
+        name = "".join(rng.choice(words) for _ in range(rng.randint(0, 3)))
+        rows = ["".join(rng.choice(words) for _ in range(rng.randint(0, 3))) for _ in range(rng.randint(0, 5))]
+        mismatches += IndustryAnalyzer.identify_industry(name, rows) != legacy_identify(name, rows)
+    print(f"{args.cases} random cases, mismatches: {mismatches}")
+
+if __name__ == "__main__":
+    main()
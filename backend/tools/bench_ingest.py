@@ -0,0 +1,117 @@
+"""
+Ingestion benchmark: legacy iterrows/ORM path vs BulkIngestor.
+
+Usage (from backend/):
+    python tools/bench_ingest.py --rows 200000
+    python tools/bench_ingest.py --rows 200000 --url postgresql://.../scratch
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchdb import add_url_argument, use_scratch_database
+use_scratch_database("bench_ingest")
+
+from sqlalchemy import delete
+import models, database
+from services.ingest import BulkIngestor
+
+def make_statement(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    debit = np.where(rng.random(rows) < 0.6, rng.integers(1, 50000, rows), 0)
+    credit = np.where(debit == 0, rng.integers(1, 80000, rows), 0)
+    return pd.DataFrame({
+        "date": pd.date_range("2020-01-01", periods=rows, freq="min").strftime("%Y-%m-%d %H:%M"),
+        "description": [f"NEFT/Vendor {i % 977}" for i in range(rows)],
+        "debit": debit.astype(float),
+        "credit": credit.astype(float),
+        "balance": np.cumsum(credit - debit).astype(float),
+    })
+
+def legacy_ingest(db, company_id: int, df: pd.DataFrame) -> int:
+    """The pre-BulkIngestor /api/upload loop, kept here for comparison."""
+    df = df.where(pd.notnull(df), None)
+
+    def safe_int(val):
+        try:
+            if val is None or (isinstance(val, float) and pd.isna(val)):
+                return 0
+            return int(float(val))
+        except:
+            return 0
+
+    def safe_date(val):
+        try:
+            if val is None or (isinstance(val, float) and pd.isna(val)) or str(val).lower() == 'nan':
+                return None
+            dt = pd.to_datetime(val)
+            if pd.isna(dt):
+                return None
+            return dt
+        except:
+            return None
+
+    def safe_str(val):
+        if val is None or (isinstance(val, float) and pd.isna(val)) or str(val).lower() == 'nan':
+            return ''
+        return str(val)
+
+    saved = 0
+    for _, row in df.iterrows():
+        debit = safe_int(row.get('debit'))
+        credit = safe_int(row.get('credit'))
+        amt = safe_int(row.get('amount'))
+        if debit == 0 and credit == 0 and amt != 0:
+            if amt < 0: debit = abs(amt)
+            else: credit = amt
+        db.add(models.BankTransaction(
+            company_id=company_id,
+            date=safe_date(row.get('date')),
+            description=safe_str(row.get('description')),
+            debit=debit,
+            credit=credit,
+            balance=safe_int(row.get('balance'))
+        ))
+        saved += 1
+    return saved
+
+def run(label: str, fn, rows: int):
+    db = database.SessionLocal()
+    try:
+        company = models.Company(legal_name=f"bench-{label}")
+        db.add(company)
+        db.commit()
+        start = time.perf_counter()
+        saved = fn(db, company.id)
+        db.commit()
+        elapsed = time.perf_counter() - start
+        print(f"{label:>8}: {saved:>8} rows in {elapsed:7.2f}s  -> {saved / elapsed:>10,.0f} rows/s")
+        db.execute(delete(models.BankTransaction).where(models.BankTransaction.company_id == company.id))
+        db.delete(company)
+        db.commit()
+        return elapsed
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_url_argument(parser)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    df = make_statement(args.rows)
+    print(f"engine: {database.engine.url.drivername}, rows: {args.rows}")
+
+    bulk = run("bulk", lambda db, cid: BulkIngestor(db, cid).ingest("bank", df), args.rows)
+    if not args.skip_legacy:
+        legacy = run("legacy", lambda db, cid: legacy_ingest(db, cid, df), args.rows)
+        print(f" speedup: {legacy / bulk:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Batch insight throughput against the local OpenAI stub (tools/stub_openai_server.py).
+
+Seeds N companies with random aggregate totals, then runs the insights batch twice:
+the first run calls the LLM for every company (paced and bounded), the second should
+find nothing stale. Prints companies/s, LLM calls and 429s absorbed by the pacer.
+
+Usage (from backend/):
+    python tools/stub_openai_server.py --latency-ms 300 --rpm 600 &
+    python tools/bench_insights.py --companies 200 --concurrency 8 --rpm 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchdb import add_url_argument, use_scratch_database
+use_scratch_database("bench_insights")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("OPENAI_BASE_URL", "http://127.0.0.1:8098/v1")
+
+import models, database, migrations
+from executor import ExecutionLayer
+from services.bookkeeper import BookkeeperAgent
+from services.insights import BatchInsightGenerator
+
+def seed(n: int) -> list:
+    db = database.SessionLocal()
+    try:
+        ids = []
+        for i in range(n):
+            user = models.User(email=f"insights-bench-{os.getpid()}-{i}@example.com", hashed_password="x", full_name="Bench")
+            db.add(user)
+            db.flush()
+            company = models.Company(user_id=user.id, legal_name=f"Insights Bench {i}")
+            db.add(company)
+            db.flush()
+            db.add(models.CompanyAggregate(
+                company_id=company.id, period="ALL",
+                total_sales=random.randint(1, 500) * 10_000,
+                total_expenses=random.randint(1, 500) * 10_000,
+                total_inventory=random.randint(0, 100) * 10_000,
+                latest_balance=random.randint(-50, 500) * 10_000,
+                expense_categories={}, data_version=1
+            ))
+            ids.append(company.id)
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+async def main_async(args):
+    execution = ExecutionLayer(cpu_workers=0, io_workers=4)
+    ids = seed(args.companies)
+    generator = BatchInsightGenerator(BookkeeperAgent(), execution, concurrency=args.concurrency, rpm=args.rpm)
+    first = await generator.run(limit=len(ids) + 1000)
+    print(f"{'first':>8}: {first}")
+    second = await generator.run(limit=len(ids) + 1000)
+    print(f"{'rerun':>8}: {second}")
+    print(f"{'pacer':>8}: {generator.pacer.stats()}")
+    print(f"{'cache':>8}: {generator.bookkeeper.cache.stats()}")
+    execution.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_url_argument(parser)
+    parser.add_argument("--companies", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=600)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    migrations.run_migrations()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Transaction loading: full ORM rows + per-row dicts vs TransactionColumns projections.
+
+Seeds one company with N bank rows, then loads what the anomaly and industry engines
+need both ways (the previous `db.query(BankTransaction).all()` + tx_list of dicts, and
+TransactionColumns.anomaly_inputs + the streamed descriptions) and prints the time and
+the tracemalloc peak of each.
+
+Usage (from backend/):
+    python tools/bench_loader.py --rows 200000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchdb import add_url_argument, use_scratch_database
+use_scratch_database("bench_loader")
+
+import models, database, migrations
+from money import rupees
+from engine.industry import IndustryAnalyzer
+from services.transactions import TransactionColumns
+
+def seed(db, rows: int) -> int:
+    rng = np.random.default_rng(3)
+    user = models.User(email=f"loader-bench-{os.getpid()}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    company = models.Company(user_id=user.id, legal_name="Loader Bench")
+    db.add(company)
+    db.flush()
+    start = datetime(2020, 1, 1)
+    debit = rng.integers(0, 500_000, rows)
+    for offset in range(0, rows, 20000):
+        db.execute(models.BankTransaction.__table__.insert(), [{
+            "company_id": company.id, "date": start + timedelta(minutes=i), "description": f"UPI/{i}/vendor payment ref {i * 7919}",
+            "debit": int(debit[i]), "credit": 0, "balance": 0
+        } for i in range(offset, min(offset + 20000, rows))])
+    db.commit()
+    return company.id
+
+def orm_rows(db, company_id: int):
+    """The previous path: mapped instances, then dicts for each engine."""
+    txns = db.query(models.BankTransaction).filter(models.BankTransaction.company_id == company_id).all()
+    anomaly = [{"id": t.id, "amount": rupees(t.debit if t.debit > 0 else t.credit), "description": t.description} for t in txns]
+    industry = [{"description": t.description} for t in txns]
+    return anomaly, industry
+
+def columns(db, company_id: int):
+    industry = IndustryAnalyzer.identify_industry("Loader Bench", TransactionColumns.descriptions(db, company_id))
+    return TransactionColumns.anomaly_inputs(db, company_id), industry
+
+def measure(label: str, fn, company_id: int):
+    """Time of an untraced run, then the tracemalloc peak of a second one."""
+    db = database.SessionLocal()
+    try:
+        start = time.perf_counter()
+        fn(db, company_id)
+        elapsed = time.perf_counter() - start
+        db.expunge_all()
+        tracemalloc.start()
+        result = fn(db, company_id)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        db.close()
+    print(f"{label:>22}: {elapsed:.2f}s, peak {peak / 2**20:.1f} MiB")
+    return result, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_url_argument(parser)
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    migrations.run_migrations()
+    db = database.SessionLocal()
+    try:
+        company_id = seed(db, args.rows)
+    finally:
+        db.close()
+    print(f"{args.rows:,} bank rows")
+    (legacy, _), legacy_peak = measure("ORM rows + dicts", orm_rows, company_id)
+    (arrays, _), column_peak = measure("TransactionColumns", columns, company_id)
+    same = len(legacy) == len(arrays["id"]) and all(
+        tx["id"] == i and tx["amount"] == a for tx, i, a in zip(legacy, arrays["id"].tolist(), arrays["amount"].tolist())
+    )
+    print(f"peak memory ratio {legacy_peak / column_peak:.1f}x, same anomaly inputs: {same}")
+
+if __name__ == "__main__":
+    main()
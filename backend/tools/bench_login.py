@@ -0,0 +1,69 @@
+"""
+Login throughput benchmark: inline pbkdf2 on the event loop vs the PasswordHasher pool.
+
+Fires --concurrency simultaneous verifications in waves while a probe coroutine
+measures how late the event loop wakes up (the latency every other request would see).
+
+Usage (from backend/):
+    python tools/bench_login.py --logins 400 --concurrency 50
+    PASSWORD_HASH_ROUNDS=100000 PASSWORD_HASH_WORKERS=8 python tools/bench_login.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchdb import add_url_argument, use_scratch_database
+use_scratch_database("bench_login")
+
+import auth
+
+async def loop_lag_probe(stop: asyncio.Event, interval: float = 0.005) -> list:
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+    return lags
+
+async def run(label: str, verify, logins: int, concurrency: int, stored_hash: str):
+    stop = asyncio.Event()
+    probe = asyncio.create_task(loop_lag_probe(stop))
+    start = time.perf_counter()
+    for offset in range(0, logins, concurrency):
+        wave = min(concurrency, logins - offset)
+        results = await asyncio.gather(*(verify("correct horse", stored_hash) for _ in range(wave)))
+        assert all(valid for valid, _ in results)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lags = sorted(await probe) or [0.0]
+    p99 = lags[min(int(len(lags) * 0.99), len(lags) - 1)]
+    print(f"{label:>8}: {logins / elapsed:8.1f} logins/s   loop lag p99 {p99 * 1000:7.1f} ms   max {lags[-1] * 1000:7.1f} ms")
+    return elapsed
+
+async def inline_verify(plain: str, hashed: str):
+    """The pre-PasswordHasher behaviour: verification directly on the event loop."""
+    return auth.verify_and_update_password(plain, hashed)
+
+async def main_async(args):
+    stored_hash = auth.get_password_hash("correct horse")
+    print(f"rounds: {auth.PASSWORD_HASH_ROUNDS}, hash workers: {auth.password_hasher.workers}, "
+          f"logins: {args.logins}, concurrency: {args.concurrency}")
+    pooled = await run("pool", auth.password_hasher.verify_and_update, args.logins, args.concurrency, stored_hash)
+    if not args.skip_inline:
+        inline = await run("inline", inline_verify, args.logins, args.concurrency, stored_hash)
+        print(f" speedup: {inline / pooled:.1f}x")
+    auth.password_hasher.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_url_argument(parser)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--skip-inline", action="store_true")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+PDF report render time with large transaction appendices.
+
+Renders the report for synthetic metrics plus N bank transactions (10k by default) and
+reports pages, size and seconds per render, then times a ReportCache hit plus streaming
+the cached file in chunks (what a repeat /api/report/download costs).
+
+Usage (from backend/):
+    python tools/bench_report.py --rows 10000 --anomalies 200 --insights 20
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.report import ReportRenderer, ReportCache
+
+def synthetic_inputs(rows: int, anomalies: int, insights: int):
+    start = date(2024, 1, 1)
+    balance = 50_000_000 # paise
+    transactions = []
+    for i in range(rows):
+        debit = random.randint(1_000, 900_000) if random.random() < 0.6 else 0
+        credit = 0 if debit else random.randint(1_000, 1_200_000)
+        balance += credit - debit
+        transactions.append((start + timedelta(days=i // 30), f"UPI/{100000 + i}/Vendor payment {i % 97}", debit, credit, balance))
+    metrics = {
+        "health_score": {"value": 78, "label": "Strong"},
+        "ratios": {"z_score": 3.4, "dscr": 1.8, "net_margin": 0.21},
+        "insights": [f"Insight {i}: review vendor {i} terms; a long line to exercise paragraph wrapping in the advice section." for i in range(insights)],
+        "cash_flow": {"net": 125000, "survival_months": 7.5},
+        "anomalies": [{"date": str(start + timedelta(days=i)), "description": f"Large transfer {i}", "amount": 75000 + i, "severity": "high"}
+                      for i in range(anomalies)],
+    }
+    return metrics, transactions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--anomalies", type=int, default=100)
+    parser.add_argument("--insights", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    metrics, transactions = synthetic_inputs(args.rows, args.anomalies, args.insights)
+    directory = tempfile.mkdtemp(prefix="bench_report_")
+    cache = ReportCache(directory, max_files=10)
+    try:
+        key = ReportCache.key(1, 1, "bench")
+        for i in range(args.repeat):
+            path = cache.path(key) if i == 0 else cache.scratch_path()
+            result = ReportRenderer.render_to_file(path, metrics, "Bench Co", "Bench User", transactions, args.rows * 2)
+            print(f"render {i + 1}: {result['pages']} pages, {result['bytes'] / 1e6:.2f} MB, {result['seconds']:.2f}s "
+                  f"({args.rows / result['seconds']:.0f} rows/s)")
+
+        start = time.perf_counter()
+        path = cache.get(key)
+        streamed = sum(len(chunk) for chunk in ReportCache.iter_file(path))
+        print(f"cache hit + stream: {streamed / 1e6:.2f} MB in {(time.perf_counter() - start) * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Portfolio ZIP export throughput (reports per minute).
+
+Seeds N companies with bank transactions, then streams the admin export twice through
+ReportExporter: cold (every PDF rendered in the process pool) and warm (all from the
+report cache). Also counts the SQL statements the batched loader issues in this process.
+
+Usage (from backend/):
+    python tools/bench_report_export.py --companies 50 --rows 2000 --max-transactions 1000
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchdb import add_url_argument, use_scratch_database
+use_scratch_database("bench_report_export")
+
+from sqlalchemy import event
+import models, database, migrations
+from executor import ExecutionLayer
+from services.aggregates import AggregateStore
+from services.report import ReportCache, ReportStats
+from services.report_export import ReportExporter
+
+def seed(companies: int, rows: int) -> list:
+    db = database.SessionLocal()
+    try:
+        ids = []
+        for i in range(companies):
+            user = models.User(email=f"export-bench-{os.getpid()}-{i}@example.com", hashed_password="x", full_name=f"Owner {i}")
+            db.add(user)
+            db.flush()
+            company = models.Company(user_id=user.id, legal_name=f"Export Bench {i}")
+            db.add(company)
+            db.flush()
+            balance = 20_000_000 # paise
+            txns = []
+            for j in range(rows):
+                debit = random.randint(1_000, 500_000) if random.random() < 0.6 else 0
+                credit = 0 if debit else random.randint(1_000, 700_000)
+                balance += credit - debit
+                txns.append({"company_id": company.id, "date": date(2024, 1, 1) + timedelta(days=j // 20),
+                             "description": f"Txn {j}", "debit": debit, "credit": credit, "balance": balance})
+            db.execute(models.BankTransaction.__table__.insert(), txns)
+            AggregateStore.rebuild(db, company.id)
+            ids.append(company.id)
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+async def export(exporter: ReportExporter, ids: list, max_transactions: int, label: str):
+    size = 0
+    async for chunk in exporter.stream(ids, max_transactions):
+        size += len(chunk)
+    run = exporter.last_export
+    print(f"{label:>5}: {run['reports']} reports ({run['cached']} cached, {run['failed']} failed), "
+          f"{size / 1e6:.1f} MB zip in {run['seconds']:.2f}s -> {run['reports_per_minute']} reports/min")
+
+async def main_async(args):
+    ids = seed(args.companies, args.rows)
+    statements = []
+    event.listen(database.engine, "before_cursor_execute", lambda *a: statements.append(1))
+
+    execution = ExecutionLayer(cpu_workers=args.workers)
+    directory = tempfile.mkdtemp(prefix="bench_export_")
+    exporter = ReportExporter(execution, ReportCache(directory, max_files=args.companies * 2), ReportStats(),
+                              concurrency=args.workers or 1)
+    try:
+        await export(exporter, ids, args.max_transactions, "cold")
+        print(f"       {len(statements)} SQL statements in the API process for {len(ids)} companies")
+        await export(exporter, ids, args.max_transactions, "warm")
+    finally:
+        shutil.rmtree(directory)
+        execution.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_url_argument(parser)
+    parser.add_argument("--companies", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=2000, help="bank transactions per company")
+    parser.add_argument("--max-transactions", type=int, default=1000, help="appendix rows per report")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="render processes")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    migrations.run_migrations()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
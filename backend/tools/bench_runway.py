@@ -0,0 +1,62 @@
+"""
+Runway simulation: RunwaySimulator timings and convergence by path count.
+
+Builds a synthetic monthly history (seasonal inflow, slowly rising outflow), runs the
+same shocked scenario at each path count and prints the best-of-N time alongside the
+runway percentiles and probability of going negative, plus the dashboard's single-point
+balance / burn figure for comparison. The endpoint target is 100k paths under 200 ms.
+
+Usage (from backend/):
+    python tools/bench_runway.py --months 60 --paths 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.simulation import RunwaySimulator
+from money import paise
+
+SCENARIO = [
+    {"type": "revenue_drop", "pct": 0.2, "start_month": 3},
+    {"type": "expense_change", "pct": 0.15, "category": "Rent"},
+    {"type": "fixed_outflow", "amount": paise(150_000), "months": 24}
+]
+CATEGORIES = {"Rent": paise(1_200_000), "Salaries": paise(4_800_000), "Utilities": paise(600_000)}
+
+def history(months: int) -> tuple:
+    rng = np.random.default_rng(5)
+    t = np.arange(months)
+    inflow = paise(1_000_000) * (1 + 0.3 * np.sin(2 * np.pi * t / 12)) + rng.normal(0, paise(120_000), months)
+    outflow = paise(950_000) * (1 + t / months * 0.2) + rng.normal(0, paise(80_000), months)
+    return np.maximum(inflow, 0).astype(np.int64), np.maximum(outflow, 0).astype(np.int64)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=60, help="months of history")
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--paths", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--balance", type=float, default=3_000_000, help="starting balance, rupees")
+    args = parser.parse_args()
+
+    inflow, outflow = history(args.months)
+    balance = paise(args.balance)
+    burn = outflow[-12:].mean()
+    print(f"{args.months} months history, balance {args.balance:,.0f}, "
+          f"balance / burn = {balance / burn:.1f} months (dashboard-style point estimate)")
+    for paths in args.paths:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = RunwaySimulator.simulate(inflow, outflow, balance, args.horizon, paths, SCENARIO, CATEGORIES)
+            timings.append(time.perf_counter() - start)
+        print(f"{paths:>7} paths: best {min(timings) * 1000:.1f} ms, median {np.median(timings) * 1000:.1f} ms | "
+              f"P(negative) {result['probability_negative']:.3f}, runway {result['runway']} "
+              f"({result['models']['inflow']}/{result['models']['outflow']})")
+
+if __name__ == "__main__":
+    main()
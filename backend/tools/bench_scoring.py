@@ -0,0 +1,104 @@
+"""
+Portfolio scoring: vectorized PortfolioScorer vs the per-company scalar engines.
+
+Scores N random companies both ways, checks every output column matches, and prints
+timings. With --db it also seeds N company_aggregates rows and times the endpoint's
+load + score path (main._score_portfolio).
+
+Usage (from backend/):
+    python tools/bench_scoring.py --companies 100000
+    python tools/bench_scoring.py --companies 100000 --db
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.metrics import FinancialMetrics
+from engine.lender import LendingEngine
+from engine.scoring import PortfolioScorer
+from money import paise
+from benchdb import add_url_argument, use_scratch_database
+
+def random_portfolio(n: int) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    return pd.DataFrame({
+        "company_id": np.arange(1, n + 1),
+        "sales": rng.integers(0, 5_000_000, n),
+        "expenses": rng.integers(0, 5_000_000, n),
+        "inventory": rng.integers(0, 1_000_000, n),
+        "balance": rng.integers(-500_000, 3_000_000, n),
+    })
+
+def scalar_scores(frame: pd.DataFrame) -> pd.DataFrame:
+    rows = []
+    for sales, expenses, inventory, balance in frame[["sales", "expenses", "inventory", "balance"]].itertuples(index=False):
+        ratios = FinancialMetrics.headline_ratios(sales, expenses, inventory, balance)
+        net_margin = (ratios["ebit"] / sales) if sales > 0 else 0
+        health = FinancialMetrics.health_score(ratios["z_score"])
+        rows.append({
+            "z_score": ratios["z_score"],
+            "dscr": ratios["dscr"],
+            "net_margin": round(net_margin, 2),
+            "credit_score": LendingEngine.calculate_credit_score({"dscr": ratios["dscr"], "z_score": ratios["z_score"], "net_margin": net_margin}),
+            "health_score": health["value"],
+            "health_label": health["label"],
+        })
+    return pd.DataFrame(rows)
+
+def seed_and_load(frame: pd.DataFrame):
+    use_scratch_database("bench_scoring")
+    import models, database, migrations, main
+    models.Base.metadata.create_all(bind=database.engine)
+    migrations.run_migrations()
+    db = database.SessionLocal()
+    try:
+        start_id = (db.query(models.User.id).order_by(models.User.id.desc()).limit(1).scalar() or 0) + 1
+        ids = range(start_id, start_id + len(frame))
+        db.execute(models.User.__table__.insert(), [{"id": i, "email": f"score-{i}@example.com", "hashed_password": "x"} for i in ids])
+        db.execute(models.Company.__table__.insert(), [{"id": i, "user_id": i, "legal_name": f"Scored {i}"} for i in ids])
+        db.execute(models.CompanyAggregate.__table__.insert(), [
+            {"company_id": i, "period": "ALL", "total_sales": paise(r.sales), "total_expenses": paise(r.expenses),
+             "total_inventory": paise(r.inventory), "latest_balance": paise(r.balance), "data_version": 1}
+            for i, r in zip(ids, frame.itertuples(index=False))
+        ])
+        db.commit()
+        start = time.perf_counter()
+        scored, timing = main._score_portfolio(db)
+        print(f"endpoint path: {len(scored)} companies, load {timing['load_seconds']:.2f}s + "
+              f"score {timing['score_seconds']:.3f}s (total {time.perf_counter() - start:.2f}s)")
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_url_argument(parser)
+    parser.add_argument("--companies", type=int, default=100000)
+    parser.add_argument("--db", action="store_true", help="also time loading from company_aggregates")
+    args = parser.parse_args()
+
+    frame = random_portfolio(args.companies)
+
+    start = time.perf_counter()
+    vectorized = PortfolioScorer.score(frame)
+    vector_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scalar = scalar_scores(frame)
+    scalar_seconds = time.perf_counter() - start
+
+    mismatches = {col: int((vectorized[col].to_numpy() != scalar[col].to_numpy()).sum()) for col in scalar.columns}
+    print(f"vectorized: {vector_seconds * 1000:.1f} ms  scalar loop: {scalar_seconds:.2f}s  "
+          f"({scalar_seconds / vector_seconds:.0f}x) for {args.companies} companies")
+    print(f"mismatches per column: {mismatches}")
+    print(PortfolioScorer.summary(vectorized))
+
+    if args.db:
+        seed_and_load(frame)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Scratch database for the bench_* scripts.
+
+database.py reads DATABASE_URL at import, so a bench calls use_scratch_database() before
+importing any app module. By default that is a fresh SQLite file in a temporary directory,
+removed when the bench exits. An exported DATABASE_URL is deliberately ignored so a bench
+never writes into a real database; pass --url to benchmark a database of your choice
+(e.g. a scratch PostgreSQL). add_url_argument() registers that flag on the bench's parser.
+"""
+import atexit
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+def _url_from_argv(argv: list) -> str:
+    for i, arg in enumerate(argv):
+        if arg == "--url" and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith("--url="):
+            return arg.split("=", 1)[1]
+    return None
+
+def _remove(scratch: str):
+    database = sys.modules.get("database")
+    if database is not None:
+        database.engine.dispose()
+    shutil.rmtree(scratch, ignore_errors=True)
+
+def use_scratch_database(name: str) -> str:
+    """Points DATABASE_URL at --url or a temporary SQLite file (deleted at exit). Returns the URL."""
+    if multiprocessing.parent_process() is not None:
+        return os.environ["DATABASE_URL"] # pool worker re-importing the bench: use the parent's database
+    url = _url_from_argv(sys.argv[1:])
+    if url is None:
+        scratch = tempfile.mkdtemp(prefix=f"{name}-")
+        url = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+        atexit.register(_remove, scratch)
+    os.environ["DATABASE_URL"] = url
+    return url
+
+def add_url_argument(parser):
+    parser.add_argument("--url", help="benchmark this database instead of a temporary SQLite file "
+                                      "(use a scratch one: bench rows are left in it)")
@@ -0,0 +1,184 @@
+"""
+Local stand-in for the Setu AA sandbox, for exercising services.setu.AsyncSetuAA
+without network access or credentials.
+
+Implements POST /auth/token, POST /consents, GET /consents/{id} and the FI data
+session endpoints (POST /sessions, GET /sessions/{id}), and can inject latency and
+transient 503s to exercise retries and the circuit breaker. Sessions turn COMPLETED
+after a few polls and stream a synthetic statement (JSON or ReBIT-style XML) whose
+txnIds are stable per consent, so repeated fetches exercise deduplication.
+GET /_stats reports call counts (token calls should stay at 1 per token lifetime).
+tests/ mounts the app in-process (httpx.ASGITransport) and drives `settings` directly.
+
+Usage (from backend/):
+    python tools/mock_setu_server.py --port 8099 --fail-rate 0.2 --latency-ms 30
+    python tools/mock_setu_server.py --fi-rows 200000 --fi-accounts 2 --fi-format xml
+    SETU_BASE_URL=http://127.0.0.1:8099 SETU_CLIENT_ID=demo SETU_CLIENT_SECRET=demo uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from xml.sax.saxutils import escape
+
+app = FastAPI(title="Mock Setu AA")
+settings = {"fail_rate": 0.0, "latency_ms": 0, "token_ttl": 3000,
+            "fi_rows": 5000, "fi_accounts": 1, "fi_format": "json", "ready_after_polls": 2,
+            "fail_next": 0} # fail_next: the next N calls answer 503 (set directly by in-process tests)
+calls = Counter()
+tokens = set()
+consents = {}
+sessions = {}
+
+async def _simulate(endpoint: str):
+    calls[endpoint] += 1
+    if settings["latency_ms"]:
+        await asyncio.sleep(settings["latency_ms"] / 1000)
+    if settings["fail_next"] > 0 or random.random() < settings["fail_rate"]:
+        settings["fail_next"] = max(settings["fail_next"] - 1, 0)
+        calls["injected_failures"] += 1
+        return JSONResponse(status_code=503, content={"detail": "injected failure"})
+    return None
+
+def _check_token(authorization: str):
+    if not authorization or authorization.removeprefix("Bearer ") not in tokens:
+        raise HTTPException(status_code=401, detail="invalid token")
+
+@app.post("/auth/token")
+async def token(payload: dict):
+    if (failure := await _simulate("token")) is not None:
+        return failure
+    if not payload.get("client_id") or not payload.get("client_secret"):
+        raise HTTPException(status_code=401, detail="missing client credentials")
+    access_token = uuid.uuid4().hex
+    tokens.add(access_token)
+    return {"access_token": access_token, "expires_in": settings["token_ttl"]}
+
+@app.post("/consents")
+async def create_consent(payload: dict, authorization: str = Header(None)):
+    if (failure := await _simulate("create_consent")) is not None:
+        return failure
+    _check_token(authorization)
+    consent_id = str(uuid.uuid4())
+    consents[consent_id] = {"id": consent_id, "status": "PENDING", "vua": payload.get("Detail", {}).get("customer", {}).get("id")}
+    return {"id": consent_id, "url": f"http://127.0.0.1/consent/{consent_id}", "status": "PENDING"}
+
+@app.get("/consents/{consent_id}")
+async def consent_status(consent_id: str, authorization: str = Header(None)):
+    if (failure := await _simulate("consent_status")) is not None:
+        return failure
+    _check_token(authorization)
+    consent = consents.get(consent_id)
+    if consent is None:
+        raise HTTPException(status_code=404, detail="unknown consent")
+    return consent
+
+@app.post("/_consents/{consent_id}/approve")
+async def approve(consent_id: str):
+    """Test hook: flip a consent to ACTIVE as if the customer approved it."""
+    consents[consent_id]["status"] = "ACTIVE"
+    return consents[consent_id]
+
+@app.post("/sessions")
+async def create_session(payload: dict, authorization: str = Header(None)):
+    if (failure := await _simulate("create_session")) is not None:
+        return failure
+    _check_token(authorization)
+    session_id = str(uuid.uuid4())
+    sessions[session_id] = {"consent_id": payload.get("consentId"), "polls": 0,
+                            "format": payload.get("format") if settings["fi_format"] == "request" else settings["fi_format"]}
+    return {"id": session_id, "status": "PENDING"}
+
+def _transactions(consent_id: str, account: int):
+    rng = random.Random(f"{consent_id}:{account}")
+    balance = 500000.0
+    start = datetime(2024, 1, 1)
+    for i in range(settings["fi_rows"]):
+        is_debit = rng.random() < 0.55
+        amount = round(rng.uniform(100, 60000), 2)
+        balance += -amount if is_debit else amount
+        yield {
+            "txnId": f"T{account}{i:09d}",
+            "type": "DEBIT" if is_debit else "CREDIT",
+            "mode": "UPI",
+            "amount": amount,
+            "currentBalance": round(balance, 2),
+            "transactionTimestamp": (start + timedelta(minutes=7 * i)).strftime("%Y-%m-%dT%H:%M:%S"),
+            "narration": f"UPI/{'PAY' if is_debit else 'RCV'}/Vendor {rng.randint(1, 400)}",
+        }
+
+def _json_statement(session_id: str, consent_id: str):
+    yield f'{{"id": "{session_id}", "status": "COMPLETED", "fips": [{{"fipID": "MOCK-FIP", "accounts": ['.encode()
+    for account in range(settings["fi_accounts"]):
+        prefix = "," if account else ""
+        yield f'{prefix}{{"maskedAccNumber": "XXXX{account:04d}", "FIstatus": "READY", "data": {{"account": {{"transactions": {{"transaction": ['.encode()
+        chunk = []
+        for i, txn in enumerate(_transactions(consent_id, account)):
+            chunk.append(("," if i else "") + json.dumps(txn))
+            if len(chunk) >= 1000:
+                yield "".join(chunk).encode()
+                chunk = []
+        yield ("".join(chunk) + "]}}}}").encode()
+    yield b"]}]}"
+
+def _xml_statement(session_id: str, consent_id: str):
+    yield f'<FISession id="{session_id}" status="COMPLETED">'.encode()
+    for account in range(settings["fi_accounts"]):
+        yield f'<Account maskedAccNumber="XXXX{account:04d}"><Transactions>'.encode()
+        chunk = []
+        for txn in _transactions(consent_id, account):
+            attrs = " ".join(f'{k}="{escape(str(v), {chr(34): "&quot;"})}"' for k, v in txn.items())
+            chunk.append(f"<Transaction {attrs}/>")
+            if len(chunk) >= 1000:
+                yield "".join(chunk).encode()
+                chunk = []
+        yield ("".join(chunk) + "</Transactions></Account>").encode()
+    yield b"</FISession>"
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str, authorization: str = Header(None)):
+    if (failure := await _simulate("get_session")) is not None:
+        return failure
+    _check_token(authorization)
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="unknown session")
+    session["polls"] += 1
+    if session["polls"] <= settings["ready_after_polls"]:
+        return {"id": session_id, "status": "PENDING"}
+    calls["statements_served"] += 1
+    if session["format"] == "xml":
+        return StreamingResponse(_xml_statement(session_id, session["consent_id"]), media_type="application/xml")
+    return StreamingResponse(_json_statement(session_id, session["consent_id"]), media_type="application/json")
+
+@app.get("/_stats")
+async def stats():
+    return dict(calls)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of calls answered with 503")
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--token-ttl", type=int, default=3000)
+    parser.add_argument("--fi-rows", type=int, default=5000, help="transactions per account in each statement")
+    parser.add_argument("--fi-accounts", type=int, default=1)
+    parser.add_argument("--fi-format", choices=["json", "xml", "request"], default="json",
+                        help="statement format; 'request' honours the format asked for in POST /sessions")
+    parser.add_argument("--ready-after-polls", type=int, default=2)
+    args = parser.parse_args()
+    settings.update(fail_rate=args.fail_rate, latency_ms=args.latency_ms, token_ttl=args.token_ttl,
+                    fi_rows=args.fi_rows, fi_accounts=args.fi_accounts, fi_format=args.fi_format,
+                    ready_after_polls=args.ready_after_polls)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
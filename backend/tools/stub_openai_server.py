@@ -0,0 +1,103 @@
+"""
+Local OpenAI-compatible stub for exercising the LLM paths (services.bookkeeper,
+services.insights) without network access or an API key.
+
+Implements POST /v1/chat/completions with canned CFO-style alerts derived from the prompt.
+Can inject latency, a requests-per-minute limit answered with 429 + Retry-After (like the
+real API), and transient 500s. GET /_stats reports call counts and peak concurrency.
+
+Usage (from backend/):
+    python tools/stub_openai_server.py --port 8098 --latency-ms 400 --rpm 120
+    OPENAI_BASE_URL=http://127.0.0.1:8098/v1 OPENAI_API_KEY=stub uvicorn main:app
+"""
+import argparse
+import asyncio
+import random
+import re
+import time
+import uuid
+from collections import Counter, deque
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Stub OpenAI")
+settings = {"latency_ms": 0, "rpm": 0, "fail_rate": 0.0}
+calls = Counter()
+recent = deque() # request start times inside the last minute, for the rpm limit
+state = {"in_flight": 0, "peak_in_flight": 0}
+
+def _alerts(prompt: str) -> list:
+    numbers = {k: float(v) for k, v in re.findall(r"'(\w+)': (-?[\d.]+)", prompt)}
+    alerts = []
+    if numbers.get("ebit", 0) < 0:
+        alerts.append("Cut discretionary spend: operations are running at a loss.")
+    else:
+        alerts.append("Protect margin: operating profit is positive, keep overhead flat.")
+    if numbers.get("bank_balance", 0) < numbers.get("expenses", 0):
+        alerts.append("Build a cash buffer: balance is below one period of expenses.")
+    else:
+        alerts.append("Cash covers expenses; consider prepaying expensive debt.")
+    if numbers.get("z_score", 0) < 1.8:
+        alerts.append("Balance sheet stress: talk to your lender before covenants tighten.")
+    else:
+        alerts.append("Healthy Z-score: negotiate better supplier terms.")
+    return alerts
+
+@app.post("/v1/chat/completions")
+async def chat_completions(payload: dict):
+    calls["requests"] += 1
+    now = time.monotonic()
+    while recent and recent[0] < now - 60:
+        recent.popleft()
+    if settings["rpm"] and len(recent) >= settings["rpm"]:
+        calls["rate_limited"] += 1
+        retry_after = max(recent[0] + 60 - now, 0.05)
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": f"{retry_after:.2f}", "retry-after-ms": str(int(retry_after * 1000))},
+            content={"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}}
+        )
+    recent.append(now)
+
+    state["in_flight"] += 1
+    state["peak_in_flight"] = max(state["peak_in_flight"], state["in_flight"])
+    try:
+        if settings["latency_ms"]:
+            await asyncio.sleep(settings["latency_ms"] / 1000 * random.uniform(0.8, 1.2))
+        if random.random() < settings["fail_rate"]:
+            calls["injected_failures"] += 1
+            return JSONResponse(status_code=500, content={"error": {"message": "injected failure", "type": "server_error"}})
+    finally:
+        state["in_flight"] -= 1
+
+    calls["completions"] += 1
+    prompt = " ".join(str(m.get("content", "")) for m in payload.get("messages", []))
+    content = "\n".join(f"{i}. {a}" for i, a in enumerate(_alerts(prompt), 1))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4, "total_tokens": (len(prompt) + len(content)) // 4}
+    }
+
+@app.get("/_stats")
+async def stats():
+    return {**calls, **state}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute before answering 429 (0 = unlimited)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of calls answered with 500")
+    args = parser.parse_args()
+    settings.update(latency_ms=args.latency_ms, rpm=args.rpm, fail_rate=args.fail_rate)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -32,7 +32,7 @@ CREATE TABLE IF NOT EXISTS transactions (
     id SERIAL PRIMARY KEY,
     company_id INTEGER REFERENCES companies(id),
     transaction_date DATE NOT NULL,
-    amount DECIMAL(15, 2) NOT NULL,
+    amount BIGINT NOT NULL, -- paise (1 rupee = 100 paise)
     description TEXT,
     raw_category VARCHAR(255),
     normalized_category VARCHAR(255), -- 'Travel', 'Meals', 'Rent'
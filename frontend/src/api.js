@@ -21,12 +21,32 @@ api.interceptors.request.use(
     }
 );
 
-export const uploadFile = async (file, type) => {
+// Polls a background job until it finishes. Resolves with the job, rejects if it failed.
+export const waitForJob = async (jobId, onProgress, intervalMs = 1000) => {
+    for (;;) {
+        const job = (await api.get(`/jobs/${jobId}`)).data;
+        if (onProgress) onProgress(job);
+        if (job.status === 'SUCCEEDED') return job;
+        if (job.status === 'FAILED') {
+            const error = new Error(job.error || 'Job failed');
+            error.response = { data: { detail: job.error || 'Job failed' } };
+            throw error;
+        }
+        await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+};
+
+export const uploadFile = async (file, type, onProgress) => {
     const formData = new FormData();
     formData.append('file', file);
     const response = await api.post(`/upload?type=${type}`, formData, {
         headers: { 'Content-Type': 'multipart/form-data' },
     });
+    // Large files are ingested in the background (202 + job id)
+    if (response.status === 202 && response.data.job_id) {
+        const job = await waitForJob(response.data.job_id, onProgress);
+        return job.result;
+    }
     return response.data;
 };
 
@@ -42,7 +62,9 @@ export const connectBank = async (bankName) => {
 
 export const downloadReport = async () => {
     try {
-        const response = await api.get('/report/download', {
+        const queued = await api.post('/report/jobs');
+        await waitForJob(queued.data.job_id);
+        const response = await api.get(`/jobs/${queued.data.job_id}/result`, {
             responseType: 'blob',
             headers: {
                 'Accept': 'application/pdf'
@@ -9,17 +9,17 @@ const SetuSync = ({ lang, t }) => {
     const [status, setStatus] = useState('NONE'); // NONE, PENDING, ACTIVE
     const [consentUrl, setConsentUrl] = useState(null);
 
-    // Check status on mount and poll if pending
+    // Read status once, then let the server push changes (consent webhook -> SSE)
     useEffect(() => {
-        let interval;
+        let source;
+        let fallback;
+        const applyStatus = (data) => {
+            setStatus(data.status);
+            if (data.url) setConsentUrl(data.url);
+        };
         const checkStatus = async () => {
             try {
-                const data = await api.get('/banking/setu/status').then(r => r.data);
-                setStatus(data.status);
-                if (data.url) setConsentUrl(data.url);
-                if (data.status === 'ACTIVE') {
-                    clearInterval(interval);
-                }
+                applyStatus(await api.get('/banking/setu/status').then(r => r.data));
             } catch (e) {
                 console.error("Status check failed", e);
             }
@@ -28,10 +28,19 @@ const SetuSync = ({ lang, t }) => {
         checkStatus();
 
         if (status === 'PENDING' || status === 'NONE') {
-            interval = setInterval(checkStatus, 3000);
+            const token = sessionStorage.getItem('token');
+            if (window.EventSource && token) {
+                source = new EventSource(`/api/banking/setu/events?token=${encodeURIComponent(token)}`);
+                source.addEventListener('status', (e) => applyStatus(JSON.parse(e.data)));
+            } else {
+                fallback = setInterval(checkStatus, 30000);
+            }
         }
 
-        return () => clearInterval(interval);
+        return () => {
+            if (source) source.close();
+            clearInterval(fallback);
+        };
     }, [status]);
 
     const handleConnect = async () => {